@@ -1,11 +1,9 @@
-import glob
-import time
 import uuid
-import random
 import os
 
 # --- FastAPI ---
-from fastapi import APIRouter, Depends, Body, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, Body, UploadFile, File, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 
 # --- 데이터베이스 및 인증 ---
 from sqlalchemy.orm import Session
@@ -14,14 +12,14 @@ from app.dependencies.db import get_db
 from app.dependencies.auth import get_current_student_uid
 from app.services.auth_service import get_current_student
 
-# --- Firebase Admin SDK ---
-import firebase_admin
+# --- 세션 저장소 (Firebase RTDB / 로컬 대체 구현) ---
+from app.core import session_store
 
 # --- 스키마 (Schemas) ---
 from app.schemas.drowsiness import (
     DrowsinessStartRequest, DrowsinessStartResponse,
     DrowsinessVerifyRequest, DrowsinessVerifyResponse,
-    DrowsinessFinishRequest, DrowsinessFinishResponse, DrowsinessPrediction
+    DrowsinessFinishRequest, DrowsinessJobResponse
 )
 from app.schemas.lecture import LectureListResponse
 from app.schemas.student import (
@@ -41,20 +39,23 @@ from app.models.enrollment import Enrollment
 from app.models.watch_history import WatchHistory
 from app.models.student import Student
 from app.models.drowsiness_level import DrowsinessLevel
-from app.services.hrv_analyzer import compute_hrv_and_features_from_firebase
 
 # --- 서비스 (Business Logic) ---
 from app.services.student import (
     get_enrolled_lectures_for_student, get_lecture_videos_for_student, get_video_link_for_student, get_student_profile,
     update_student_name, cancel_enrollment, enroll_student_in_lecture, upload_profile_image_to_s3
 )
+from app.services.drowsiness_job_service import enqueue_drowsiness_job, get_job_for_student, to_job_response
+from app.services.drowsiness_pipeline import BASE_DIR as DROWSINESS_BASE_DIR
+from app.services.hrv_stream import start_hrv_stream
+from app.services.auth_code_service import activity_record, allocate_auth_code, consume_auth_code
+from app.services.session_registry import (
+    ACTIVITY_PATH, FORWARDED_HEADER, forward_to_owner, get_session_owner, is_local_owner
+)
+from app.core.config import Settings
 
-# --- 머신러닝 및 데이터 처리 ---
+# --- 데이터 처리 ---
 import pandas as pd
-import torch
-from app.utils.drowsiness_data_utils import make_shard_and_pt
-from app.ml.data_loader import SessionSequenceDataset
-from app.ml.pipeline import MultimodalFatigueModel
 
 # APIRouter에서 전역 dependencies 제거
 router = APIRouter()
@@ -208,7 +209,7 @@ def get_recent_incomplete_videos(
 
 @router.post("/drowsiness/start", response_model=DrowsinessStartResponse, summary="졸음 탐지 세션 시작",
              dependencies=[Depends(get_current_student)])
-def start_drowsiness_detection(
+async def start_drowsiness_detection(
         req: DrowsinessStartRequest = Body(...),
         student_uid: str = Depends(get_current_student_uid)
 ):
@@ -217,35 +218,37 @@ def start_drowsiness_detection(
     생성된 6자리 인증코드를 클라이언트에 반환합니다.
     """
     session_id = str(uuid.uuid4())
-    auth_code = f"{random.randint(0, 999999):06d}"
 
     try:
-        from firebase_admin import db
-
-        ref = db.reference(f"{session_id}")
-        ref.set({
-            "pairing": {
+        # 인증코드는 인덱스 transaction 으로 겹치지 않게 발급하고(AUTH_CODE_TTL_SECONDS 후 만료),
+        # pairing 과 활동 기록(비활성 세션 정리용)을 한 번에 기록합니다. (PPG_Data 는 웨어러블이 채움)
+        auth_code = await session_store.run_io(allocate_auth_code, session_id)
+        await session_store.async_reference().update({
+            f"{session_id}/pairing": {
                 "paired": False,
                 "stop": False,
                 "auth_code": auth_code,
                 "student_uid": student_uid,
                 "video_id": req.video_id
             },
-            "PPG_Data": {}
+            f"{ACTIVITY_PATH}/{session_id}": activity_record(),
         })
 
-        index_ref = db.reference(f"auth_code_index/{auth_code}")
-        index_ref.set(session_id)
-
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Firebase 세션 생성에 실패했습니다: {e}")
 
+    # 웨어러블이 올리는 PPG 를 받는 대로 2분 단위 HRV 지표를 미리 계산합니다. (실패 시 종료 후 일괄 분석)
+    if Settings.STREAMING_HRV:
+        await session_store.run_io(start_hrv_stream, session_id, os.path.join(DROWSINESS_BASE_DIR, session_id))
+
     return DrowsinessStartResponse(session_id=session_id, auth_code=auth_code,
                                    message="세션이 시작되었습니다. 웨어러블에 인증코드를 입력하세요.")
 
 
 @router.post("/drowsiness/verify", response_model=DrowsinessVerifyResponse, summary="[웨어러블용] 인증코드로 검증")
-def verify_drowsiness_from_wearable(
+async def verify_drowsiness_from_wearable(
         req: DrowsinessVerifyRequest,
 ):
     """
@@ -253,56 +256,83 @@ def verify_drowsiness_from_wearable(
     이 API는 로그인 토큰이 필요 없습니다.
     """
     try:
-        from firebase_admin import db
-
-        index_ref = db.reference(f"auth_code_index/{req.code}")
-        session_id = index_ref.get()
+        # 유효한 코드면 인덱스에서 원자적으로 지우고 세션을 돌려받습니다. (같은 코드로 두 번 연동되지 않음)
+        session_id = await session_store.run_io(consume_auth_code, req.code)
 
         if not session_id:
             raise HTTPException(status_code=404, detail="인증코드가 유효하지 않거나 만료되었습니다.")
 
-        session_ref = db.reference(f"{session_id}/pairing")
-        session_data = session_ref.get()
+        session_data = await session_store.async_reference(f"{session_id}/pairing").get()
 
         if not session_data:
             raise HTTPException(status_code=404, detail="인덱스는 존재하지만, 해당 세션 데이터가 존재하지 않습니다.")
 
-        session_ref.update({"paired": True})
-
-        index_ref.delete()
+        await session_store.async_reference().update({
+            f"{session_id}/pairing/paired": True,
+            f"{ACTIVITY_PATH}/{session_id}": activity_record(),
+        })
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Firebase 데이터 검증/업데이트 중 오류가 발생했습니다: {e}")
 
     return DrowsinessVerifyResponse(session_id=session_id, verified=True, message="웨어러블 연동이 완료되었습니다.")
 
 
-@router.post("/drowsiness/finish", response_model=DrowsinessFinishResponse, summary="졸음 탐지 세션 종료 및 분석",
-             dependencies=[Depends(get_current_student)])
-def finish_drowsiness_detection(
+@router.post("/drowsiness/finish", response_model=DrowsinessJobResponse, status_code=202,
+             summary="졸음 탐지 세션 종료 및 분석 작업 등록", dependencies=[Depends(get_current_student)])
+async def finish_drowsiness_detection(
         req: DrowsinessFinishRequest,
+        request: Request,
         student_uid: str = Depends(get_current_student_uid),
         db_session: Session = Depends(get_db)
 ):
+    """
+    세션을 종료하고 졸음 분석 작업을 등록한 뒤 바로 job_id 를 반환합니다.
+    분석 진행 상태와 결과는 GET /drowsiness/jobs/{job_id} 로 조회합니다.
+    랜드마크를 받은 노드(세션 소유 노드)가 다른 노드이면 그 노드로 요청을 전달합니다.
+    """
     session_id = req.session_id
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../drowsiness_data'))
-    session_dir = os.path.join(base_dir, session_id)
-
-    from firebase_admin import db as firebase_db
+    # 인증 조회로 열린 읽기 트랜잭션을 끝내, 세션 저장소 호출과 요청 전달 동안 DB 커넥션을 풀에 돌려줍니다.
+    await run_in_threadpool(db_session.rollback)
+
+    # --- 0. 세션 소유 노드 확인 (분석 작업은 랜드마크 파일이 있는 노드에서 실행) ---
+    if not request.headers.get(FORWARDED_HEADER):
+        try:
+            owner = await session_store.run_io(get_session_owner, session_id)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"세션 소유 노드 조회 중 오류 발생: {e}")
+        if not is_local_owner(owner):
+            print(f"[{session_id}] ↪️ 세션 소유 노드({owner.get('node_id')})로 종료 요청 전달")
+            response = await run_in_threadpool(forward_to_owner, owner, request.url.path, req.model_dump(),
+                                               request.headers.get("Authorization"))
+            if response.status_code >= 400:
+                try:
+                    detail = response.json().get("detail", response.text)
+                except ValueError:
+                    detail = response.text
+                raise HTTPException(status_code=response.status_code, detail=detail)
+            return DrowsinessJobResponse(**response.json())
 
     try:
-        session_ref = firebase_db.reference(f"{session_id}")
-        pairing_ref = session_ref.child("pairing")
-        pairing_data = pairing_ref.get()
+        pairing_ref = session_store.async_reference(f"{session_id}/pairing")
+        pairing_data = await pairing_ref.get()
         if not pairing_data:
             raise HTTPException(status_code=404, detail="세션 정보를 찾을 수 없습니다.")
         if pairing_data.get("student_uid") != student_uid:
             raise HTTPException(status_code=403, detail="본인의 세션이 아닙니다.")
-        pairing_ref.update({"stop": True})
+        await pairing_ref.update({"stop": True})
         video_id = pairing_data.get("video_id")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Firebase 세션 종료 처리 중 오류 발생: {e}")
-    
+
+    # DB 조회/커밋은 동기 세션이므로 HTTP 스레드풀에서 실행합니다.
+    job = await run_in_threadpool(_register_finish_job, db_session, session_id, student_uid, video_id)
+    return to_job_response(job)
+
+
+def _register_finish_job(db_session: Session, session_id: str, student_uid: str, video_id: int):
     # --- 1.5. 중복 분석 방지: 이미 분석된 데이터가 있는지 확인 ---
     print(f"[{session_id}] 🔍 중복 분석 확인 중...")
     existing_analysis = db_session.query(DrowsinessLevel).filter(
@@ -318,214 +348,21 @@ def finish_drowsiness_detection(
         )
     print(f"[{session_id}] ✅ 중복 분석 확인 완료 (분석 이력 없음)")
 
-    # --- 2. PPG 데이터 수신 완료 대기 (Polling) ---
-    try:
-        polling_timeout = 180  # 최대 3분 대기
-        polling_interval = 5   # 5초 간격으로 확인
-        stability_threshold = 10 # 10초 동안 데이터 개수 변화 없으면 완료로 간주
-
-        last_data_count = -1
-        stable_time = 0
-        waited_time = 0
-
-        while waited_time < polling_timeout:
-            ppg_node = session_ref.child("PPG_Data").get() or {}
-            current_data_count = len(ppg_node)
-
-            if current_data_count > last_data_count:
-                # 데이터가 여전히 수신 중
-                last_data_count = current_data_count
-                stable_time = 0
-            elif last_data_count > 0:
-                # 데이터 개수 변화 없음
-                stable_time += polling_interval
-
-            if stable_time >= stability_threshold:
-                # 업로드가 안정화되었으므로 완료로 판단
-                print(f"✅ PPG 데이터 수신 완료. (총 {current_data_count}개)")
-                break
-
-            time.sleep(polling_interval)
-            waited_time += polling_interval
-        else:
-            # 타임아웃 발생
-            raise HTTPException(status_code=504, detail="PPG 데이터 수신 대기 시간을 초과했습니다.")
+    # --- 2. 분석 작업 등록 (PPG 대기 ~ 모델 예측은 백그라운드 워커에서 수행) ---
+    job = enqueue_drowsiness_job(db_session, session_id, student_uid, video_id)
+    print(f"[{session_id}] 📨 분석 작업 등록 완료 (job_id={job.id}, status={job.status})")
+    return job
 
-    except HTTPException as e:
-        raise e # 타임아웃 예외는 그대로 전달
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PPG 데이터 수신 확인 중 오류 발생: {e}")
 
-
-    # --- 3. 웨어러블 특징(HRV) 데이터 생성 ---
-    try:
-        df_wearable = compute_hrv_and_features_from_firebase(session_id)
-        # 분석 결과를 디버깅용으로 저장 (선택 사항)
-        os.makedirs(session_dir, exist_ok=True)
-        wearable_csv_path = os.path.join(session_dir, 'wearable_features.csv')
-        df_wearable.to_csv(wearable_csv_path, index=False)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=f"HRV 분석 실패: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"HRV 분석 중 서버 오류 발생: {e}")
-
-    # --- 4. 랜드마크 데이터 로드 (파일 쓰기 완료 대기 포함) ---
-    print(f"[{session_id}] 📂 Step 4: 랜드마크 데이터 로드 시작")
-    if not os.path.isdir(session_dir):
-        raise HTTPException(status_code=404, detail="Landmark 데이터 디렉토리가 존재하지 않습니다.")
-
-    # WebSocket을 통한 파일 쓰기가 완료될 때까지 대기 (최대 2분)
-    print(f"[{session_id}] ⏳ 랜드마크 파일 쓰기 완료 대기 중...")
-    timeout, interval, waited = 120, 1, 0
-    while waited < timeout:
-        landmark_files = glob.glob(os.path.join(session_dir, 'landmarks_*.csv'))
-        if not landmark_files:  # 파일이 아직 생성되지 않았으면 대기
-            if waited % 10 == 0:  # 10초마다 로그 출력
-                print(f"[{session_id}] ⏳ 랜드마크 파일 대기 중... ({waited}초 경과)")
-            time.sleep(interval)
-            waited += interval
-            continue
-
-        last_modified = max(os.path.getmtime(f) for f in landmark_files)
-        # 마지막 파일 수정 후 2초 이상 지났으면 쓰기가 완료된 것으로 간주
-        if time.time() - last_modified >= 2:
-            print(f"[{session_id}] ✅ 랜드마크 파일 쓰기 완료 확인 (총 {len(landmark_files)}개 파일)")
-            break
-        time.sleep(interval)
-        waited += interval
-    else:
-        raise HTTPException(status_code=500, detail="Landmark 데이터 저장 대기 시간을 초과했습니다.")
-
-    # 랜드마크 파일 개수 확인 (병합은 PT 파일 생성 시 자동으로 수행됨)
-    print(f"[{session_id}] ✅ 랜드마크 데이터 확인 완료 (총 {len(landmark_files)}개 파일)")
-    
-    # --- 5. 데이터 검증 ---
-    print(f"[{session_id}] ✅ Step 5: 데이터 검증 완료")
-    print(f"[{session_id}] 📊 HRV 세그먼트: {len(df_wearable)}개 (2분 단위)")
-    print(f"[{session_id}] 📊 랜드마크 파일: {len(landmark_files)}개")
-    
-    # HRV 특징 차원 확인
-    num_hrv_features = len([col for col in df_wearable.columns if col != 'timestamp'])
-    print(f"[{session_id}] 📊 HRV 특징 차원: {num_hrv_features}개")
-    if num_hrv_features != 39:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"HRV 특징 차원 불일치: {num_hrv_features}개 (기대값: 39개)"
-        )
-
-    # --- 6. AI 모델 예측 수행 및 DB 저장 (1분 단위) ---
-    print(f"[{session_id}] 🤖 Step 6: AI 모델 예측 수행 시작 (1분 단위)")
-    try:
-        print(f"[{session_id}] 📦 PT 파일 생성 중...")
-        pt_path = make_shard_and_pt(session_id, base_dir=base_dir, shard_size=150)
-        if not (pt_path and os.path.exists(pt_path)):
-            raise FileNotFoundError("PT 파일이 생성되지 않았습니다.")
-        print(f"[{session_id}] ✅ PT 파일 생성 완료: {os.path.basename(pt_path)}")
-        
-        # 모델 로드
-        print(f"[{session_id}] 🧠 AI 모델 로드 중...")
-        edge_index_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../ml/edge_index_core.pt'))
-        edge_index = torch.load(edge_index_path, map_location='cpu')
-        model_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../ml/best_model.pt'))
-        model = MultimodalFatigueModel(num_classes=5)
-        checkpoint = torch.load(model_path, map_location='cpu')
-        model.load_state_dict(checkpoint.get('model', checkpoint))
-        model.eval()
-        print(f"[{session_id}] ✅ AI 모델 로드 완료")
-        
-        # 2분 단위로 예측 수행 (HRV 데이터와 동기화)
-        # SEQ_LEN=12 shards × 150 frames/shard × (1/30) sec/frame = 60초 = 1분
-        # 2분 = 24 shards
-        SEQ_LEN = 24  # 2분에 해당하는 윈도우 개수
-        STRIDE = 24   # 2분씩 이동 (2분 = 24 shards)
-        
-        print(f"[{session_id}] 📊 데이터셋 생성 중 (SEQ_LEN={SEQ_LEN}, STRIDE={STRIDE})...")
-        dataset = SessionSequenceDataset(session_dir, seq_len=SEQ_LEN, stride=STRIDE)
-        if len(dataset) == 0:
-            raise ValueError("2분 이상 시청하지 않아 분석이 불가능합니다.")
-        print(f"[{session_id}] ✅ 데이터셋 생성 완료 (총 {len(dataset)}개 시퀀스)")
-        
-        # HRV 데이터 개수 확인 (2분마다 1개)
-        num_hrv_segments = len(df_wearable)
-        
-        # 랜드마크 데이터로 만들 수 있는 2분 단위 예측 개수
-        num_landmark_2min_segments = len(dataset)
-        
-        # 실제 예측 가능한 개수는 랜드마크 데이터와 HRV 데이터 중 작은 값
-        num_predictions = min(num_landmark_2min_segments, num_hrv_segments)
-        
-        print(f"[{session_id}] 📈 예측 정보: HRV 세그먼트={num_hrv_segments}, 랜드마크 세그먼트={num_landmark_2min_segments} (모두 2분 단위)")
-        print(f"[{session_id}] 🎯 총 {num_predictions}개의 2분 단위 세그먼트 예측 시작")
-        
-        if num_predictions == 0:
-            raise ValueError("예측 가능한 2분 단위 세그먼트가 없습니다.")
-        
-        all_preds = []
-        with torch.no_grad():
-            for idx in range(num_predictions):
-                print(f"[{session_id}] 🔮 예측 중... [{idx+1}/{num_predictions}] (시간: {idx*2}~{(idx+1)*2}분)")
-                
-                # 랜드마크 데이터 (2분 단위)
-                face, _, _ = dataset[idx]
-                face = face.unsqueeze(0)  # [1, 24, 150, 478, 3]
-                
-                # HRV 데이터 (2분 단위, 1:1 매칭)
-                hrv_row = df_wearable.iloc[idx]
-                
-                # HRV 특징 벡터 생성 (timestamp 제외한 39개 특징)
-                feature_cols = [col for col in df_wearable.columns if col != 'timestamp']
-                hrv_vector = hrv_row[feature_cols].values.astype(float).tolist()
-                
-                # 차원 검증
-                if len(hrv_vector) != 39:
-                    raise ValueError(f"HRV 특징 차원 오류: {len(hrv_vector)}개 (기대값: 39개)")
-                
-                wear = torch.tensor(hrv_vector, dtype=torch.float32).unsqueeze(0).unsqueeze(0)  # [1, 1, 39]
-                # 24개 윈도우에 동일한 HRV 데이터 복제
-                wear = wear.repeat(1, 24, 1)  # [1, 24, 39]
-                
-                pred, aux = model(face, wear, edge_index)
-                drowsiness_score = float(pred.item())
-                all_preds.append(drowsiness_score)
-                print(f"[{session_id}] 📊 예측 결과: 졸음 점수 = {drowsiness_score:.4f}")
-                
-                # DB에 저장 (timestamp는 0부터 시작, 2분 단위)
-                drowsiness_record = DrowsinessLevel(
-                    video_id=video_id,
-                    student_uid=student_uid,
-                    timestamp=idx * 2,  # 0 = 0~2분, 2 = 2~4분, 4 = 4~6분, ...
-                    drowsiness_score=drowsiness_score
-                )
-                db_session.add(drowsiness_record)
-        
-        print(f"[{session_id}] 💾 DB에 예측 결과 저장 중...")
-        db_session.commit()
-        print(f"[{session_id}] ✅ DB 저장 완료 (총 {len(all_preds)}개 레코드)")
-        
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=404, detail=str(e))
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"모델 예측 실패: {e}")
-
-    if not all_preds:
-        raise HTTPException(status_code=400, detail="분석 결과가 없습니다.")
-
-    print(f"[{session_id}] 🎉 졸음 탐지 분석 완료!")
-    print(f"[{session_id}] 📊 최종 결과: 총 {len(all_preds)}개 세그먼트 (2분 단위), 마지막 졸음 점수 = {all_preds[-1]:.4f}")
-    
-    prediction = DrowsinessPrediction(
-        session_id=session_id,
-        drowsiness_level=all_preds[-1],
-        confidence=1.0,
-        details={"total_segments": len(all_preds), "all_preds": all_preds}
-    )
-    return DrowsinessFinishResponse(
-        session_id=session_id,
-        prediction=prediction,
-        message=f"졸음 예측이 완료되었습니다. 총 {len(all_preds)}개의 2분 단위 세그먼트가 분석되었습니다."
-    )
+@router.get("/drowsiness/jobs/{job_id}", response_model=DrowsinessJobResponse, summary="졸음 분석 작업 상태/결과 조회",
+            dependencies=[Depends(get_current_student)])
+def get_drowsiness_job(
+        job_id: str,
+        student_uid: str = Depends(get_current_student_uid),
+        db_session: Session = Depends(get_db)
+):
+    job = get_job_for_student(db_session, job_id, student_uid)
+    return to_job_response(job)
 
 
 # =========================
@@ -544,8 +381,7 @@ def test_finish_drowsiness_detection(
     session_id = req.session_id
 
     try:
-        from firebase_admin import db
-        session_ref = db.reference(f"{session_id}")
+        session_ref = session_store.reference(f"{session_id}")
 
         # 데이터가 존재하는지 간단히 확인
         if not session_ref.get():
@@ -554,8 +390,7 @@ def test_finish_drowsiness_detection(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Firebase 세션 조회 중 오류 발생: {e}")
 
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../drowsiness_data'))
-    session_dir = os.path.join(base_dir, session_id)
+    session_dir = os.path.join(DROWSINESS_BASE_DIR, session_id)
 
     try:
         ppg_data_ref = session_ref.child("PPG_Data")
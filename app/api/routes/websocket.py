@@ -1,72 +1,95 @@
 # /ws/drowsiness/landmarks/{session_id} 수정 코드
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-import os, pandas as pd, json, traceback
-import itertools
+from starlette.concurrency import run_in_threadpool
+import os, json, traceback
+
+from app.core import metrics
+from app.core.config import Settings
+from app.services.landmark_completion import mark_landmarks_closed, mark_landmarks_open
+from app.services.landmark_writer import get_landmark_writer
+from app.services.session_registry import register_session_owner
+from app.services.websocket_service import (
+    LandmarkRingBuffer, LandmarkFrameError, decode_binary_frames, decode_json_frame,
+    SUBPROTOCOL_BINARY, SUBPROTOCOL_JSON
+)
 
 websocket_router = APIRouter()
 
+FRAMES_RECEIVED = metrics.counter(
+    "landmark_frames_received_total", "수신한 랜드마크 프레임 수", ["format"])
+BYTES_RECEIVED = metrics.counter(
+    "landmark_bytes_received_total", "수신한 랜드마크 메시지 크기(bytes)", ["format"])
+
+
 @websocket_router.websocket("/ws/drowsiness/landmarks/{session_id}")
 async def websocket_landmarks(websocket: WebSocket, session_id: str):
-    await websocket.accept()
-    base_dir    = os.path.abspath(os.path.join(os.path.dirname(__file__),
-                                               "../../../drowsiness_data"))
-    session_dir = os.path.join(base_dir, session_id)
+    # 클라이언트가 바이너리 서브프로토콜을 제안하면 수락하고, 아니면 기존 JSON 텍스트 프레임으로 동작합니다.
+    # (수신 루프는 메시지 종류를 보고 처리하므로, 협상 없이 바이너리 메시지를 보내도 됩니다)
+    offered = websocket.scope.get("subprotocols", [])
+    if SUBPROTOCOL_BINARY in offered:
+        await websocket.accept(subprotocol=SUBPROTOCOL_BINARY)
+    elif SUBPROTOCOL_JSON in offered:
+        await websocket.accept(subprotocol=SUBPROTOCOL_JSON)
+    else:
+        await websocket.accept()
+    session_dir = os.path.join(Settings.DROWSINESS_DATA_DIR, session_id)
     os.makedirs(session_dir, exist_ok=True)
+    # 랜드마크를 이 노드의 디스크에 쓰므로, finish 가 다른 워커/노드에 도착해도 이 노드로 전달되도록 기록합니다.
+    try:
+        await run_in_threadpool(register_session_owner, session_id)
+    except Exception as e:
+        print(f"⚠️  session owner register fail [{session_id}] → {e}")
+    # finish 는 이 세션의 "closed" 상태가 기록될 때까지 기다립니다.
+    mark_landmarks_open(session_id, session_dir)
 
-    all_rows = []
-    # 약 10초 분량(30fps 기준 300 프레임)을 하나의 청크로 설정
+    # 약 5초 분량(30fps 기준 150 프레임)을 하나의 청크로 설정
     chunk_size = 150
+    # 수신 프레임은 미리 할당된 링 버퍼에 바로 복사됩니다.
+    buffer = LandmarkRingBuffer(capacity=chunk_size * 2)
 
-    # --- 👇 핵심 수정 부분 (1) ---
-    # 파일 번호와 현재 파일에 저장된 청크 수를 추적하는 변수 추가
-    file_index = 1
-    chunk_count = 0
-    # 파일 하나당 30개의 청크를 저장 (300 프레임/청크 * 30 청크 = 9000 프레임 ≈ 5분)
-    chunks_per_file = 60
-
-    # 첫 번째 파일 경로를 생성
-    csv_path = os.path.join(session_dir, f"landmarks_{file_index:03}.csv")
-    print(f"📂 Start saving to: {csv_path}")
-    # --- 👆 핵심 수정 부분 (1) ---
+    # 청크가 찰 때마다 백그라운드 writer 에 넘겨 바이너리 랜드마크 저장소(landmarks.bin + timestamp 인덱스)에 이어 씁니다.
+    # 수신 루프에서는 디스크 I/O 를 직접 하지 않습니다.
+    writer = get_landmark_writer()
+    frames_received = 0
+    print(f"📂 Start saving to: {session_dir}")
 
     try:
         while True:
-            data = await websocket.receive_text()
-            try:
-                msg = json.loads(data)
-            except json.JSONDecodeError:
-                print(f"⚠️  JSON decode fail → {data[:50]}...")
-                continue
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
 
-            if msg.get("type") == "ping" or "frame" not in msg:
+            try:
+                if message.get("bytes") is not None:
+                    payload = message["bytes"]
+                    timestamps, frames = decode_binary_frames(payload)
+                    fmt = "binary"
+                else:
+                    data = message.get("text") or ""
+                    try:
+                        msg = json.loads(data)
+                    except json.JSONDecodeError:
+                        print(f"⚠️  JSON decode fail → {data[:50]}...")
+                        continue
+                    if msg.get("type") == "ping" or "frame" not in msg:
+                        continue
+                    payload = data
+                    timestamps, frames = decode_json_frame(msg)
+                    fmt = "json"
+            except (LandmarkFrameError, KeyError, ValueError) as e:
+                print(f"⚠️  invalid landmark frame [{session_id}] → {e}")
                 continue
+            FRAMES_RECEIVED.inc(len(timestamps), format=fmt)
+            BYTES_RECEIVED.inc(len(payload), format=fmt)
 
-            timestamp = msg["timestamp"]
-            landmarks = msg["frame"]
-
-            flattened_landmarks = list(itertools.chain.from_iterable(landmarks))
-            all_rows.append([timestamp] + flattened_landmarks)
-
-            # 메모리 버퍼(all_rows)가 가득 차면 파일에 추가합니다.
-            if len(all_rows) >= chunk_size:
-                df = pd.DataFrame(all_rows)
-                df.to_csv(csv_path, mode='a', header=False, index=False)
-
-                print(f"✅ Appended {len(all_rows)} rows to {os.path.basename(csv_path)}")
-                all_rows.clear()  # 버퍼 비우기
-
-                # --- 👇 핵심 수정 부분 (2) ---
-                chunk_count += 1 # 현재 파일에 청크가 하나 더 저장되었음을 기록
-
-                # 현재 파일에 저장된 청크 수가 5분 분량(30개)에 도달하면
-                if chunk_count >= chunks_per_file:
-                    file_index += 1 # 다음 파일 번호로 증가
-                    chunk_count = 0 # 청크 카운터 초기화
-                    # 새 파일 경로 생성
-                    csv_path = os.path.join(session_dir, f"landmarks_{file_index:03}.csv")
-                    print(f"🔄 Switched to new file: {csv_path}")
-                # --- 👆 핵심 수정 부분 (2) ---
+            # 링 버퍼에 넣고, 청크(150 프레임)가 찰 때마다 파일에 추가합니다.
+            offset = 0
+            while offset < len(timestamps):
+                offset += buffer.append(timestamps[offset:], frames[offset:])
+                while buffer.count >= chunk_size:
+                    await writer.append(session_id, session_dir, *buffer.pop(chunk_size))
+                    frames_received += chunk_size
 
     except WebSocketDisconnect:
         print(f"🔌 disconnect [{session_id}]")
@@ -74,8 +97,13 @@ async def websocket_landmarks(websocket: WebSocket, session_id: str):
         print("❗ unexpected error")
         traceback.print_exc()
     finally:
-        # 연결이 끊어지기 직전, 버퍼에 남아있는 데이터를 마지막 파일에 마저 저장합니다.
-        if all_rows:
-            df = pd.DataFrame(all_rows)
-            df.to_csv(csv_path, mode='a', header=False, index=False)
-            print(f"✅ Appended final {len(all_rows)} rows to {os.path.basename(csv_path)}")
\ No newline at end of file
+        # 연결이 끊어지기 직전, 버퍼에 남아있는 데이터를 마저 넘기고 세션 파일이 닫힐 때까지 기다린 뒤
+        # 저장이 끝났음을 알립니다. (finish 쪽 대기가 바로 풀립니다)
+        try:
+            if buffer.count:
+                frames_received += buffer.count
+                await writer.append(session_id, session_dir, *buffer.pop())
+            await writer.close_session(session_id)
+        finally:
+            mark_landmarks_closed(session_id, session_dir, frames_received)
+        print(f"✅ Saved {frames_received} frames [{session_id}]")
@@ -1,11 +1,21 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
 
+_ML_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../ml"))
+
 
 class Settings:
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+    # DB 커넥션 풀 (sqlite 는 SQLAlchemy 기본 풀 사용, pre-ping / recycle 만 적용)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 30))
+    # MySQL wait_timeout 보다 짧게 두어 서버가 끊은 커넥션("server has gone away")을 쓰지 않게 합니다.
+    DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
     AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY","accesskey")
     AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY", "supersecret")
     AWS_REGION = os.getenv("AWS_REGION","ap-northeast-2")
@@ -14,5 +24,62 @@ class Settings:
     JWT_ALGORITHM = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
     REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
+    FATIGUE_MODEL_PATH = os.getenv("FATIGUE_MODEL_PATH", os.path.join(_ML_DIR, "best_model.pt"))
+    FATIGUE_EDGE_INDEX_PATH = os.getenv("FATIGUE_EDGE_INDEX_PATH", os.path.join(_ML_DIR, "edge_index_core.pt"))
+    # 0 이면 가용 메모리에 맞춰 자동으로 배치 크기를 정합니다.
+    INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 0)) or None
+    INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", 20))
+    # 추론 대기열에 쌓을 수 있는 세그먼트 수. 가득 차면 제출하는 쪽(작업 워커)이 자리가 날 때까지 기다립니다.
+    INFERENCE_MAX_QUEUE_SIZE = int(os.getenv("INFERENCE_MAX_QUEUE_SIZE", 256))
+    DROWSINESS_JOB_WORKERS = int(os.getenv("DROWSINESS_JOB_WORKERS", 4))
+    DROWSINESS_JOB_STALE_SECONDS = int(os.getenv("DROWSINESS_JOB_STALE_SECONDS", 900))
+    PPG_UPLOAD_TIMEOUT_SECONDS = float(os.getenv("PPG_UPLOAD_TIMEOUT_SECONDS", 180))
+    # 완료 마커가 없을 때, 이 시간 동안 새 PPG 키가 없으면 업로드 완료로 간주
+    PPG_UPLOAD_QUIET_SECONDS = float(os.getenv("PPG_UPLOAD_QUIET_SECONDS", 5))
+    # 랜드마크 저장 dtype (float32 / float16)
+    LANDMARK_STORE_DTYPE = os.getenv("LANDMARK_STORE_DTYPE", "float32")
+    # 백그라운드 writer 큐에 쌓아 둘 수 있는 최대 청크 수 (150 프레임 × float32 ≈ 860KB/청크)
+    LANDMARK_WRITE_QUEUE_SIZE = int(os.getenv("LANDMARK_WRITE_QUEUE_SIZE", 256))
+    # 종료(finish) 시 랜드마크 WebSocket 이 닫히고 저장이 끝나기를 기다리는 최대 시간(초)
+    LANDMARK_CLOSE_TIMEOUT_SECONDS = float(os.getenv("LANDMARK_CLOSE_TIMEOUT_SECONDS", 120))
+    # 종료 상태 기록이 없는 이전 세션은 마지막 파일 수정 후 이 시간이 지나면 저장 완료로 간주
+    LANDMARK_QUIET_SECONDS = float(os.getenv("LANDMARK_QUIET_SECONDS", 2))
+    # 세션 진행 중 150 프레임 윈도우마다 얼굴 임베딩(ST-GCN)을 미리 계산 (종료 시에는 BiLSTM 만 수행)
+    ONLINE_FACE_EMBEDDING = os.getenv("ONLINE_FACE_EMBEDDING", "false").lower() in ("1", "true", "yes")
+    # 윈도우 임베딩을 세션 디렉토리에 캐시해 재분석(head/stride 변경) 시 ST-GCN 을 다시 돌리지 않음.
+    # 켜면 종료 시 빠진 윈도우의 ST-GCN 을 작업 스레드에서 직접 돌려 추론 스케줄러의 배치를 거치지 않으므로,
+    # 재분석을 하는 오프라인 환경에서만 켭니다.
+    FACE_EMBEDDING_CACHE = os.getenv("FACE_EMBEDDING_CACHE", "false").lower() in ("1", "true", "yes")
+    # 세션 중 임베딩 대기열 최대 윈도우 수. 넘치면 건너뛰고 종료 시 계산합니다.
+    ONLINE_FACE_EMBED_BACKLOG = int(os.getenv("ONLINE_FACE_EMBED_BACKLOG", 48))
+    # HRV 세그먼트 계산 프로세스 수 (0 이면 CPU 코어 수)
+    HRV_PROCESS_WORKERS = int(os.getenv("HRV_PROCESS_WORKERS", 0))
+    # 세션 진행 중 PPG 를 구독해 2분 HRV 세그먼트를 바로 계산 (종료 시 마지막 세그먼트 + PCA 만 수행)
+    STREAMING_HRV = os.getenv("STREAMING_HRV", "true").lower() in ("1", "true", "yes")
+    # 이 시간(초) 동안 새 PPG 가 없는 실시간 HRV 스트림은 리스너를 닫습니다. (종료 시 저장된 세그먼트에서 이어 계산)
+    HRV_STREAM_IDLE_SECONDS = float(os.getenv("HRV_STREAM_IDLE_SECONDS", 600))
+    # 세션 데이터(pairing / PPG_Data / 인증코드 인덱스) 저장소: firebase / memory / sqlite (로컬 실행, 부하 테스트)
+    SESSION_STORE = os.getenv("SESSION_STORE", "firebase").lower()
+    SESSION_STORE_SQLITE_PATH = os.getenv("SESSION_STORE_SQLITE_PATH", "./session_store.db")
+    # async 라우트의 세션 저장소 호출(Firebase HTTP 요청)을 실행하는 전용 스레드 수
+    SESSION_STORE_IO_WORKERS = int(os.getenv("SESSION_STORE_IO_WORKERS", 32))
+    # 웨어러블 인증코드 유효 시간(초). 만료된 코드와 끝내 연동되지 않은 세션은 주기적으로 정리합니다.
+    AUTH_CODE_TTL_SECONDS = float(os.getenv("AUTH_CODE_TTL_SECONDS", 600))
+    AUTH_CODE_SWEEP_INTERVAL_SECONDS = float(os.getenv("AUTH_CODE_SWEEP_INTERVAL_SECONDS", 60))
+    # 연동 후 이 시간(초) 동안 새 PPG 가 없고 종료(finish)되지 않은 세션은 세션 데이터(PPG_Data 포함)를 정리합니다.
+    SESSION_INACTIVE_TTL_SECONDS = float(os.getenv("SESSION_INACTIVE_TTL_SECONDS", 7200))
+    # 분석 단계 span 을 OpenTelemetry 로도 내보냄 (opentelemetry 설치 필요, 메트릭은 항상 /metrics 로 노출)
+    OTEL_TRACING = os.getenv("OTEL_TRACING", "false").lower() in ("1", "true", "yes")
+    OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "zzzcoach-api")
+    # 세션 데이터(랜드마크 / PPG / 샤드) 디렉토리. 여러 노드가 같은 공유 스토리지(NFS 등)를 마운트했다면
+    # SHARED_SESSION_DATA=true 로 두어 어느 노드에서든 finish 를 처리합니다.
+    DROWSINESS_DATA_DIR = os.path.abspath(
+        os.getenv("DROWSINESS_DATA_DIR", os.path.join(os.path.dirname(__file__), "../../drowsiness_data")))
+    SHARED_SESSION_DATA = os.getenv("SHARED_SESSION_DATA", "false").lower() in ("1", "true", "yes")
+    # 세션 소유 노드 식별자 (기본: 호스트 이름). 같은 호스트의 워커(uvicorn --workers)는 로컬 디스크를 공유하므로 같은 노드입니다.
+    NODE_ID = os.getenv("NODE_ID") or socket.gethostname()
+    # 다른 노드가 이 노드로 finish 를 전달할 때 쓰는 내부 주소 (예: http://10.0.0.5:8000)
+    NODE_URL = os.getenv("NODE_URL", "")
+    SESSION_FORWARD_TIMEOUT_SECONDS = float(os.getenv("SESSION_FORWARD_TIMEOUT_SECONDS", 10))
 
 settings = Settings()
\ No newline at end of file
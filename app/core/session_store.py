@@ -0,0 +1,452 @@
+import asyncio
+import copy
+import functools
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core import metrics
+from app.core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# 졸음 탐지 세션 데이터(pairing, PPG_Data, auth_code_index) 저장소.
+# 라우트/서비스는 firebase_admin.db 대신 reference(path) 로 접근하고, 구현은 Settings.SESSION_STORE 로 고릅니다.
+#   firebase : firebase_admin.db.reference 를 그대로 반환 (운영)
+#   memory   : 프로세스 메모리 트리 (테스트, 리플레이/부하 테스트)
+#   sqlite   : 리프 값을 경로별 행으로 저장하는 SQLite 파일 (프로세스를 재시작해도 유지되는 로컬 실행)
+# memory / sqlite 는 코드에서 쓰는 Reference 기능(get/set/update/delete/transaction/child, order_by_key 범위 조회, listen)만
+# Firebase RTDB 와 같은 의미로 흉내 냅니다. 키 정렬은 문자열 순서입니다. (push 키/UUID 기준으로는 Firebase 와 같음)
+# async 라우트는 async_reference(path) 로 접근해, 블로킹 호출을 HTTP 스레드풀이 아닌 전용 스레드풀에서 실행합니다.
+
+IO_SECONDS = metrics.histogram(
+    "session_store_io_seconds", "async 세션 저장소 호출 시간 (전용 스레드풀 대기 포함)", ["op"])
+
+
+class StoreEvent:
+    """firebase_admin.db.Event 와 같은 속성(event_type, path, data)을 가진 리스너 이벤트."""
+
+    def __init__(self, event_type: str, path: str, data: Any):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+class _Registration:
+    def __init__(self, store: "_TreeStore", parts: tuple, callback: Callable):
+        self._store = store
+        self.parts = parts
+        self.callback = callback
+
+    def close(self):
+        self._store._remove_listener(self)
+
+
+def _split(path: str) -> tuple:
+    return tuple(p for p in (path or "").strip("/").split("/") if p)
+
+
+def _prune(value):
+    """Firebase 처럼 None 과 빈 dict 는 저장하지 않습니다."""
+    if isinstance(value, dict):
+        pruned = {str(k): _prune(v) for k, v in value.items()}
+        pruned = {k: v for k, v in pruned.items() if v is not None}
+        return pruned or None
+    return value
+
+
+class _Query:
+    def __init__(self, ref: "StoreReference"):
+        self._ref = ref
+        self._start = self._end = None
+        self._first = self._last = None
+
+    def _copy(self, **changes) -> "_Query":
+        query = copy.copy(self)
+        for name, value in changes.items():
+            setattr(query, name, value)
+        return query
+
+    def start_at(self, key: str) -> "_Query":
+        return self._copy(_start=key)
+
+    def end_at(self, key: str) -> "_Query":
+        return self._copy(_end=key)
+
+    def limit_to_first(self, limit: int) -> "_Query":
+        return self._copy(_first=limit)
+
+    def limit_to_last(self, limit: int) -> "_Query":
+        return self._copy(_last=limit)
+
+    def get(self) -> "OrderedDict":
+        node = self._ref.get()
+        if not isinstance(node, dict):
+            return OrderedDict()
+        keys = sorted(k for k in node
+                      if (self._start is None or k >= self._start) and (self._end is None or k <= self._end))
+        if self._first is not None:
+            keys = keys[:self._first]
+        if self._last is not None:
+            keys = keys[-self._last:] if self._last else []
+        return OrderedDict((k, node[k]) for k in keys)
+
+
+class StoreReference:
+    """firebase_admin.db.Reference 의 부분 구현 (memory / sqlite 저장소용)."""
+
+    def __init__(self, store: "_TreeStore", parts: tuple):
+        self._store = store
+        self._parts = parts
+
+    @property
+    def key(self) -> Optional[str]:
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self) -> str:
+        return "/" + "/".join(self._parts)
+
+    def child(self, path: str) -> "StoreReference":
+        return StoreReference(self._store, self._parts + _split(path))
+
+    def get(self):
+        return self._store._read(self._parts)
+
+    def set(self, value):
+        value = _prune(value)
+        with self._store._write_lock:
+            self._store._write(self._parts, value)
+        self._store._notify(self._parts, "put", value)
+
+    def update(self, value: Dict):
+        if not isinstance(value, dict) or not value:
+            raise ValueError("update 값은 비어 있지 않은 dict 여야 합니다.")
+        changes = {_split(k): _prune(v) for k, v in value.items()}
+        with self._store._write_lock:
+            self._store._write_many([(self._parts + k, v) for k, v in changes.items()])
+        self._store._notify(self._parts, "patch", {"/".join(k): v for k, v in changes.items()},
+                            changed=[self._parts + k for k in changes])
+
+    def delete(self):
+        self.set(None)
+
+    def transaction(self, transaction_update: Callable[[Any], Any]):
+        """
+        현재 값을 받아 새 값을 돌려주는 함수로 원자적으로 갱신하고 새 값을 반환합니다.
+        Firebase 처럼 함수가 예외를 던지면 아무것도 쓰지 않고 그 예외가 전달됩니다.
+        """
+        with self._store._write_lock:
+            value = _prune(transaction_update(self.get()))
+            self._store._write(self._parts, value)
+        self._store._notify(self._parts, "put", value)
+        return value
+
+    def order_by_key(self) -> _Query:
+        return _Query(self)
+
+    def listen(self, callback: Callable[[StoreEvent], None]) -> _Registration:
+        return self._store._add_listener(self._parts, callback)
+
+
+class _TreeStore:
+    """리스너 관리와 이벤트 전달을 담당하는 memory / sqlite 저장소 공통 부분."""
+
+    def __init__(self):
+        self._listeners: List[_Registration] = []
+        self._listeners_lock = threading.Lock()
+        self._events: "queue.Queue" = queue.Queue()
+        self._dispatcher: Optional[threading.Thread] = None
+        # 쓰기와 transaction 의 읽기-수정-쓰기를 직렬화합니다.
+        self._write_lock = threading.RLock()
+
+    def reference(self, path: str = "") -> StoreReference:
+        return StoreReference(self, _split(path))
+
+    # 하위 클래스 구현 -------------------------------------------------------------------------------
+    def _read(self, parts: tuple):
+        raise NotImplementedError
+
+    def _write_many(self, items: List[tuple]):
+        raise NotImplementedError
+
+    def _write(self, parts: tuple, value):
+        self._write_many([(parts, value)])
+
+    # 리스너 --------------------------------------------------------------------------------------
+    def _add_listener(self, parts: tuple, callback: Callable) -> _Registration:
+        registration = _Registration(self, parts, callback)
+        with self._listeners_lock:
+            self._listeners.append(registration)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="session-store-events", daemon=True)
+                self._dispatcher.start()
+        # Firebase 처럼 등록 직후 현재 값 전체를 "/" 경로의 put 이벤트로 한 번 전달합니다.
+        self._events.put((registration, StoreEvent("put", "/", self._read(parts))))
+        return registration
+
+    def _remove_listener(self, registration: _Registration):
+        with self._listeners_lock:
+            if registration in self._listeners:
+                self._listeners.remove(registration)
+
+    def _notify(self, parts: tuple, event_type: str, data, changed: Optional[List[tuple]] = None):
+        changed = changed or [parts]
+        with self._listeners_lock:
+            listeners = list(self._listeners)
+        for registration in listeners:
+            target = registration.parts
+            if parts[:len(target)] == target:
+                # 리스너 경로 아래(또는 같은 경로)가 바뀜 → 상대 경로로 전달
+                event = StoreEvent(event_type, "/" + "/".join(parts[len(target):]), copy.deepcopy(data))
+            elif target[:len(parts)] == parts and any(
+                    c[:len(target)] == target or target[:len(c)] == c for c in changed):
+                # 리스너 경로나 그 상위/하위 값이 바뀜 → 리스너 경로의 새 값을 put 으로 전달
+                event = StoreEvent("put", "/", self._read(target))
+            else:
+                continue
+            self._events.put((registration, event))
+
+    def _dispatch(self):
+        # Firebase SDK 처럼 콜백은 쓰기 호출자와 다른 전용 스레드에서 순서대로 호출합니다.
+        while True:
+            registration, event = self._events.get()
+            with self._listeners_lock:
+                active = registration in self._listeners
+            if not active:
+                continue
+            try:
+                registration.callback(event)
+            except Exception:
+                logger.exception(f"세션 저장소 리스너 처리 실패: /{'/'.join(registration.parts)}")
+
+
+class MemorySessionStore(_TreeStore):
+    """프로세스 메모리의 dict 트리에 세션 데이터를 보관합니다."""
+
+    def __init__(self):
+        super().__init__()
+        self._root: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _read(self, parts: tuple):
+        with self._lock:
+            node = self._root
+            for part in parts:
+                if not isinstance(node, dict) or part not in node:
+                    return None
+                node = node[part]
+            return copy.deepcopy(node)
+
+    def _write_many(self, items: List[tuple]):
+        with self._lock:
+            for parts, value in items:
+                self._write_locked(parts, copy.deepcopy(value))
+
+    def _write_locked(self, parts: tuple, value):
+        if not parts:
+            self._root = value if isinstance(value, dict) else {}
+            return
+        node, path = self._root, []
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                if value is None:
+                    return
+                child = node[part] = {}
+            path.append((node, part))
+            node = child
+        if value is None:
+            node.pop(parts[-1], None)
+            # 비게 된 상위 노드는 Firebase 처럼 함께 사라집니다.
+            for parent, part in reversed(path):
+                if parent[part]:
+                    break
+                del parent[part]
+        else:
+            node[parts[-1]] = value
+
+
+class SQLiteSessionStore(_TreeStore):
+    """
+    리프 값을 (경로, JSON 값) 행으로 저장하는 SQLite 저장소.
+    하위 트리 조회/삭제는 경로 접두사 범위("a/b/" 이상 "a/b0" 미만)로 처리합니다.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS nodes (path TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    @staticmethod
+    def _subtree(parts: tuple) -> tuple:
+        prefix = "/".join(parts)
+        # '/' 다음 문자는 '0' 이므로 [prefix/, prefix0) 범위가 정확히 하위 경로입니다.
+        return ("", "\uffff") if not parts else (prefix + "/", prefix + "0")
+
+    def _read(self, parts: tuple):
+        prefix = "/".join(parts)
+        low, high = self._subtree(parts)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, value FROM nodes WHERE path = ? OR (path >= ? AND path < ?)",
+                (prefix, low, high)).fetchall()
+        if not rows:
+            return None
+        tree: Dict[str, Any] = {}
+        for path, value in rows:
+            if path == prefix:
+                return json.loads(value)
+            node = tree
+            rest = path[len(low):].split("/")
+            for part in rest[:-1]:
+                node = node.setdefault(part, {})
+            node[rest[-1]] = json.loads(value)
+        return tree
+
+    @staticmethod
+    def _leaves(parts: tuple, value, out: List[tuple]):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                SQLiteSessionStore._leaves(parts + (k,), v, out)
+        elif value is not None:
+            out.append(("/".join(parts), json.dumps(value)))
+
+    def _write_many(self, items: List[tuple]):
+        with self._lock, self._conn:
+            for parts, value in items:
+                low, high = self._subtree(parts)
+                self._conn.execute("DELETE FROM nodes WHERE path = ? OR (path >= ? AND path < ?)",
+                                   ("/".join(parts), low, high))
+                if value is None:
+                    continue
+                # 상위 경로에 리프 값이 있었다면 dict 로 바뀌므로 지웁니다.
+                for i in range(1, len(parts)):
+                    self._conn.execute("DELETE FROM nodes WHERE path = ?", ("/".join(parts[:i]),))
+                leaves: List[tuple] = []
+                self._leaves(parts, value, leaves)
+                self._conn.executemany("INSERT OR REPLACE INTO nodes (path, value) VALUES (?, ?)", leaves)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FirebaseSessionStore:
+    """firebase_admin.db 를 그대로 사용하는 운영용 저장소."""
+
+    def reference(self, path: str = ""):
+        from firebase_admin import db
+        return db.reference(path or "/")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def create_session_store(kind: str = Settings.SESSION_STORE):
+    if kind == "firebase":
+        return FirebaseSessionStore()
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore(Settings.SESSION_STORE_SQLITE_PATH)
+    raise ValueError(f"지원하지 않는 SESSION_STORE: {kind} (firebase / memory / sqlite)")
+
+
+def get_session_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = create_session_store()
+        return _store
+
+
+def set_session_store(store):
+    """저장소를 교체합니다. (테스트, 리플레이 도구)"""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def reference(path: str = ""):
+    """현재 세션 저장소의 Reference. firebase_admin.db.reference(path) 대신 사용합니다."""
+    return get_session_store().reference(path)
+
+
+_io_executor: Optional[ThreadPoolExecutor] = None
+_io_lock = threading.Lock()
+
+
+def _get_io_executor() -> ThreadPoolExecutor:
+    global _io_executor
+    with _io_lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(max_workers=Settings.SESSION_STORE_IO_WORKERS,
+                                              thread_name_prefix="session-store-io")
+        return _io_executor
+
+
+async def run_io(fn: Callable, *args, op: Optional[str] = None, **kwargs):
+    """블로킹 세션 저장소 작업을 전용 스레드풀(SESSION_STORE_IO_WORKERS)에서 실행하고 결과를 기다립니다."""
+    started = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _get_io_executor(), functools.partial(fn, *args, **kwargs))
+    finally:
+        IO_SECONDS.observe(time.perf_counter() - started, op=op or getattr(fn, "__name__", "call"))
+
+
+def shutdown_session_store_io():
+    global _io_executor
+    with _io_lock:
+        executor, _io_executor = _io_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+class AsyncReference:
+    """Reference 의 get/set/update/delete 를 run_io 로 실행하는 async 래퍼."""
+
+    def __init__(self, ref):
+        self._ref = ref
+
+    @property
+    def key(self) -> Optional[str]:
+        return self._ref.key
+
+    def child(self, path: str) -> "AsyncReference":
+        return AsyncReference(self._ref.child(path))
+
+    async def get(self):
+        return await run_io(self._ref.get, op="get")
+
+    async def set(self, value):
+        await run_io(self._ref.set, value, op="set")
+
+    async def update(self, value: Dict):
+        """
+        여러 경로를 한 번에 씁니다. 키에 "/" 가 들어간 다중 경로 update 도 한 요청으로 처리되고,
+        값이 None 인 경로는 삭제됩니다.
+        """
+        await run_io(self._ref.update, value, op="update")
+
+    async def delete(self):
+        await run_io(self._ref.delete, op="delete")
+
+    async def transaction(self, transaction_update: Callable[[Any], Any]):
+        return await run_io(self._ref.transaction, transaction_update, op="transaction")
+
+
+def async_reference(path: str = "") -> AsyncReference:
+    """현재 세션 저장소의 async Reference. async 라우트에서 reference(path) 대신 사용합니다."""
+    return AsyncReference(reference(path))
@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from app.core import metrics
+from app.core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# 분석 파이프라인 단계별 span.
+# span 이 끝날 때마다 실행 시간 / 입력 크기 / RSS 를 app.core.metrics 에 기록하고(/metrics 로 노출),
+# 한 줄짜리 JSON 로그를 남깁니다. Settings.OTEL_TRACING 이 켜져 있고 opentelemetry 가 설치되어 있으면
+# 같은 span 을 OpenTelemetry 로도 내보냅니다. (SDK + OTLP exporter 가 있으면 OTEL_EXPORTER_OTLP_* 환경 변수로 전송)
+
+STAGE_SECONDS = metrics.histogram(
+    "pipeline_stage_seconds", "분석 파이프라인 단계별 실행 시간", ["pipeline", "stage"])
+STAGE_ITEMS = metrics.histogram(
+    "pipeline_stage_items", "분석 파이프라인 단계별 입력 크기 (프레임 / 샘플 / 세그먼트 수 등)", ["pipeline", "stage"],
+    buckets=(1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000))
+STAGE_RSS_BYTES = metrics.gauge(
+    "pipeline_stage_rss_bytes", "단계가 끝난 시점의 프로세스 RSS (마지막 실행 기준)", ["pipeline", "stage"])
+STAGE_RSS_GROWTH_BYTES = metrics.histogram(
+    "pipeline_stage_rss_growth_bytes", "단계 실행 전후 프로세스 RSS 증가량", ["pipeline", "stage"],
+    buckets=(2 ** 20, 16 * 2 ** 20, 64 * 2 ** 20, 256 * 2 ** 20, 2 ** 30, 4 * 2 ** 30))
+STAGE_FAILURES_TOTAL = metrics.counter(
+    "pipeline_stage_failures_total", "예외로 끝난 분석 파이프라인 단계 수", ["pipeline", "stage"])
+
+
+def rss_bytes() -> int:
+    """현재 프로세스 RSS(bytes). /proc 이 없으면 프로세스 최대 RSS 로 대신합니다."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+_otel_tracer = None
+_otel_checked = False
+_otel_lock = threading.Lock()
+
+
+def _get_otel_tracer():
+    global _otel_tracer, _otel_checked
+    if not Settings.OTEL_TRACING:
+        return None
+    with _otel_lock:
+        if _otel_checked:
+            return _otel_tracer
+        _otel_checked = True
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            logger.warning("OTEL_TRACING 이 켜져 있지만 opentelemetry 가 설치되어 있지 않아 메트릭만 기록합니다.")
+            return None
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+            provider = TracerProvider(resource=Resource.create({"service.name": Settings.OTEL_SERVICE_NAME}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+        except ImportError:
+            # API 만 있으면 다른 곳(opentelemetry-instrument 등)에서 설정한 provider 로 보냅니다.
+            logger.info("opentelemetry SDK/OTLP exporter 가 없어 기존 tracer provider 를 사용합니다.")
+        _otel_tracer = trace.get_tracer("app.drowsiness")
+        return _otel_tracer
+
+
+class Span:
+    """파이프라인 단계 하나. set() 으로 입력 크기(items) 등 속성을 붙입니다."""
+
+    def __init__(self, name: str, pipeline: str, **attributes):
+        self.name = name
+        self.pipeline = pipeline
+        self.attributes = dict(attributes)
+        self.seconds: Optional[float] = None
+        self._started = 0.0
+        self._rss_before = 0
+        self._otel_cm = None
+        self._otel_span = None
+
+    def set(self, **attributes) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def start(self) -> "Span":
+        tracer = _get_otel_tracer()
+        if tracer is not None:
+            self._otel_cm = tracer.start_as_current_span(f"{self.pipeline}.{self.name}")
+            self._otel_span = self._otel_cm.__enter__()
+        self._rss_before = rss_bytes()
+        self._started = time.perf_counter()
+        return self
+
+    def end(self, error: Optional[BaseException] = None):
+        self.seconds = time.perf_counter() - self._started
+        rss_after = rss_bytes()
+        labels = {"pipeline": self.pipeline, "stage": self.name}
+        STAGE_SECONDS.observe(self.seconds, **labels)
+        if "items" in self.attributes:
+            STAGE_ITEMS.observe(float(self.attributes["items"]), **labels)
+        STAGE_RSS_BYTES.set(rss_after, **labels)
+        STAGE_RSS_GROWTH_BYTES.observe(max(0, rss_after - self._rss_before), **labels)
+        if error is not None:
+            STAGE_FAILURES_TOTAL.inc(**labels)
+
+        record = {"span": f"{self.pipeline}.{self.name}", "seconds": round(self.seconds, 4),
+                  "rss_mb": round(rss_after / 2 ** 20, 1),
+                  "rss_growth_mb": round((rss_after - self._rss_before) / 2 ** 20, 1),
+                  **self.attributes}
+        if error is not None:
+            record["error"] = type(error).__name__
+        logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+        if self._otel_cm is not None:
+            for key, value in self.attributes.items():
+                if isinstance(value, (str, bool, int, float)):
+                    self._otel_span.set_attribute(key, value)
+            self._otel_span.set_attribute("rss_bytes", rss_after)
+            exc_info = (type(error), error, error.__traceback__) if error is not None else (None, None, None)
+            self._otel_cm.__exit__(*exc_info)
+            self._otel_cm = self._otel_span = None
+
+
+@contextmanager
+def span(name: str, pipeline: str = "drowsiness_finish", **attributes):
+    current = Span(name, pipeline, **attributes).start()
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    current.end()
+
+
+class StageSpans:
+    """
+    순서대로 이어지는 단계 span. enter() 가 이전 단계를 끝내고 다음 단계를 시작합니다.
+    with 블록을 빠져나갈 때 마지막 단계를 (예외가 있으면 실패로) 끝냅니다.
+    """
+
+    def __init__(self, pipeline: str = "drowsiness_finish", **attributes):
+        self.pipeline = pipeline
+        self.attributes = attributes
+        self.current: Optional[Span] = None
+
+    def enter(self, name: str, **attributes) -> Span:
+        self.close()
+        self.current = Span(name, self.pipeline, **self.attributes, **attributes).start()
+        return self.current
+
+    def set(self, **attributes):
+        if self.current is not None:
+            self.current.set(**attributes)
+
+    def close(self, error: Optional[BaseException] = None):
+        if self.current is not None:
+            current, self.current = self.current, None
+            current.end(error)
+
+    def __enter__(self) -> "StageSpans":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(exc)
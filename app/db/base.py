@@ -12,3 +12,4 @@ import app.models.token
 import app.models.instructor_refresh_token
 import app.models.admin_refresh_token
 import app.models.drowsiness_session
+import app.models.drowsiness_job
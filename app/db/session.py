@@ -1,6 +1,61 @@
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app.core import metrics
 from app.core.config import Settings
 
-engine = create_engine(Settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+POOL_CHECKOUT_WAIT_SECONDS = metrics.histogram(
+    "db_pool_checkout_wait_seconds", "DB 커넥션 풀에서 커넥션을 얻기까지 기다린 시간",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60))
+POOL_TIMEOUTS_TOTAL = metrics.counter(
+    "db_pool_timeouts_total", "DB_POOL_TIMEOUT_SECONDS 안에 커넥션을 얻지 못한 횟수 (QueuePool limit)")
+POOL_CONNECTIONS_IN_USE = metrics.gauge(
+    "db_pool_connections_in_use", "풀에서 꺼내 사용 중인 DB 커넥션 수")
+
+
+class InstrumentedQueuePool(QueuePool):
+    """커넥션을 얻기까지의 대기 시간과 타임아웃 횟수를 기록하는 QueuePool."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS_TOTAL.inc()
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+
+def create_db_engine(url: str = Settings.DATABASE_URL, **overrides) -> Engine:
+    """
+    풀 설정(Settings.DB_POOL_*)을 적용한 엔진을 만듭니다. overrides 는 create_engine 인자를 덮어씁니다.
+    sqlite 는 SQLAlchemy 가 고르는 기본 풀을 그대로 쓰고 pre-ping / recycle 만 적용합니다.
+    """
+    kwargs = dict(pool_pre_ping=Settings.DB_POOL_PRE_PING, pool_recycle=Settings.DB_POOL_RECYCLE_SECONDS)
+    if make_url(url).get_backend_name() != "sqlite":
+        kwargs.update(poolclass=InstrumentedQueuePool,
+                      pool_size=Settings.DB_POOL_SIZE,
+                      max_overflow=Settings.DB_MAX_OVERFLOW,
+                      pool_timeout=Settings.DB_POOL_TIMEOUT_SECONDS)
+    kwargs.update(overrides)
+    engine = create_engine(url, **kwargs)
+
+    @event.listens_for(engine.pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CONNECTIONS_IN_USE.inc()
+
+    @event.listens_for(engine.pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        POOL_CONNECTIONS_IN_USE.dec()
+
+    return engine
+
+
+engine = create_db_engine()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -12,6 +12,16 @@ from contextlib import asynccontextmanager # Lifespan 사용 위해 import
 
 # --- Core / Config ---
 from app.core.firebase import initialize_firebase # Firebase 초기화 함수 import
+from app.core.config import Settings
+from app.core.session_store import shutdown_session_store_io
+from app.ml.model_registry import get_model_registry
+from app.ml.inference_scheduler import get_inference_scheduler
+from app.ml.online_embedding import get_online_embedder
+from app.services.auth_code_service import get_auth_code_sweeper
+from app.services.drowsiness_job_service import resume_pending_jobs, shutdown_job_workers
+from app.services.landmark_writer import get_landmark_writer
+from app.services.hrv_parallel import shutdown_hrv_pool
+from app.services.hrv_stream import close_all_hrv_streams
 
 # --- API Routers ---
 from app.api.routes import auth as auth_router
@@ -20,6 +30,7 @@ from app.api.routes import instructor_auth as instructor_auth_router # instructo
 from app.api.routes import instructor as instructor_router # instructor 라우터 import
 from app.api.routes import student as student_router # student 라우터 import
 from app.api.routes import admin as admin_router # admin 라우터 import
+from app.api.routes import metrics as metrics_router
 
 
 # --- 미들웨어 import ---
@@ -40,11 +51,40 @@ logging.basicConfig(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 애플리케이션 시작 시 실행될 코드
-    initialize_firebase() # <<<--- 여기에서 Firebase 초기화 함수를 호출합니다!
+    # 세션 저장소를 로컬 구현(memory / sqlite)으로 띄운 경우에는 Firebase 를 초기화하지 않습니다.
+    if Settings.SESSION_STORE == "firebase":
+        initialize_firebase() # <<<--- 여기에서 Firebase 초기화 함수를 호출합니다!
     # 다른 시작 시 필요한 작업들 (예: DB 커넥션 풀 생성 등)
 
+    # 졸음 예측 모델은 프로세스당 한 번만 로드해 모든 요청이 공유합니다.
+    # 실패해도 서버는 뜨고, 첫 예측 요청 시 다시 로드를 시도합니다.
+    try:
+        get_model_registry().load()
+    except Exception as e:
+        logging.warning(f"졸음 예측 모델 사전 로드 실패 (첫 요청 시 재시도): {e}")
+    # WebSocket 랜드마크를 디스크에 쓰는 백그라운드 writer
+    get_landmark_writer().start()
+    # 여러 세션의 세그먼트를 한 배치로 묶어 추론하는 스케줄러
+    await get_inference_scheduler().start()
+    # 만료된 인증코드와 연동되지 않은 세션 정리
+    get_auth_code_sweeper().start()
+    # 재시작 전에 끝나지 않은 졸음 분석 작업 재개
+    try:
+        resume_pending_jobs()
+    except Exception as e:
+        logging.warning(f"졸음 분석 작업 재개 실패: {e}")
+
     yield
 
+    shutdown_job_workers()
+    get_auth_code_sweeper().stop()
+    await get_inference_scheduler().stop()
+    get_landmark_writer().stop()
+    get_online_embedder().shutdown()
+    shutdown_hrv_pool()
+    close_all_hrv_streams()
+    shutdown_session_store_io()
+
 # --- FastAPI App Instance ---
 app = FastAPI(
     title="ZzzCoach API",
@@ -120,4 +160,10 @@ app.include_router(
     student_router.router,
     prefix="/api/v1/students",
     tags=["students"]
-)
\ No newline at end of file
+)
+
+app.include_router(
+    metrics_router.router,
+    prefix="",
+    tags=["metrics"]
+)
@@ -2,41 +2,75 @@
 import os, glob, torch, re
 from torch.utils.data import Dataset
 
+from app.utils.drowsiness_data_utils import SHARD_META_SUFFIX, open_shard_windows, read_shard_meta
+
 class SessionSequenceDataset(Dataset):
     """
     세션별 윈도우를 모아 S(≥2)개씩 시퀀스로 반환
     Args:
-      shard_dir : shards 가 모여있는 폴더
+      shard_dir : shards 가 모여있는 폴더 (여러 폴더면 리스트)
       seq_len   : 윈도우 몇 개를 한 시퀀스로 묶을지
       stride    : 슬라이딩 보폭(윈도우 수)
+
+    make_shard_and_pt 샤드(*_shards.json)는 생성 시 메타(윈도우 수)만 읽고, 샤드 파일은 처음 접근할 때
+    프로세스마다 memmap 으로 엽니다. 시퀀스는 연속된 윈도우의 뷰이므로 복사/stack 없이 반환되고,
+    pickle 시 열린 memmap 은 빼고 보내므로 DataLoader(num_workers>0) 워커도 각자 파일을 다시 엽니다.
+    이전 형식(*_shard_*.pt)은 기존처럼 생성 시 전부 불러옵니다.
     """
     _pat = re.compile(r'(.+?)_shard_\d+\.pt')   # session id 추출용
 
     def __init__(self, shard_dir, seq_len=12, stride=3):
         self.seq_len = seq_len
         self.stride  = stride
+        shard_dirs = [shard_dir] if isinstance(shard_dir, (str, os.PathLike)) else list(shard_dir)
 
-        # --- 1) 세션별 윈도우 로드 ---
-        sessions = {}  # {session_id: [dict, ...]}
-        for path in sorted(glob.glob(os.path.join(shard_dir, '*_shard_*.pt'))):
-            sess_id = self._pat.match(os.path.basename(path)).group(1)
-            windows = torch.load(path)  # list of dicts
-            sessions.setdefault(sess_id, []).extend(windows)
+        # --- 1) 세션별 윈도우 수 확인 ---
+        self.shard_paths = {}    # {session_id: *_shards.json 경로}
+        self.legacy = {}         # {session_id: [dict, ...]} 이전 형식
+        num_windows = {}
+        for d in shard_dirs:
+            for path in sorted(glob.glob(os.path.join(d, '*' + SHARD_META_SUFFIX))):
+                sid = os.path.basename(path)[:-len(SHARD_META_SUFFIX)]
+                self.shard_paths[sid] = path
+                num_windows[sid] = read_shard_meta(path)["num_windows"]
+            for path in sorted(glob.glob(os.path.join(d, '*_shard_*.pt'))):
+                sid = self._pat.match(os.path.basename(path)).group(1)
+                if sid in self.shard_paths:
+                    continue
+                windows = torch.load(path)  # list of dicts
+                self.legacy.setdefault(sid, []).extend(windows)
+        for sid, win_list in self.legacy.items():
+            num_windows[sid] = len(win_list)
 
         # --- 2) 세션 내부 슬라이딩 인덱스 구성 ---
         self.index_map = []  # [(sess_id, start_idx)]
-        for sid, win_list in sessions.items():
-            n = len(win_list)
+        for sid, n in num_windows.items():
             for s in range(0, n - seq_len + 1, stride):
                 self.index_map.append((sid, s))
-        self.sessions = sessions  # keep
+        self._windows = {}   # {session_id: Tensor[W,T,N,3]} 이 프로세스에서 연 memmap 뷰
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_windows"] = {}
+        return state
+
+    def windows(self, sid):
+        """세션의 전체 윈도우 [W, T, N, 3] 뷰 (처음 호출 시 memmap 으로 엶)"""
+        view = self._windows.get(sid)
+        if view is None:
+            view = self._windows[sid] = open_shard_windows(self.shard_paths[sid])
+        return view
 
     def __len__(self):
         return len(self.index_map)
 
     def __getitem__(self, idx):
         sid, start = self.index_map[idx]
-        wins = self.sessions[sid][start : start + self.seq_len]   # list length S
+        if sid in self.shard_paths:
+            # 연속된 윈도우를 잘라 복사 없이 반환 (HRV/label 은 기존 샤드와 같이 0)
+            face = self.windows(sid)[start : start + self.seq_len]   # [S,T,N,3]
+            return face, torch.zeros(self.seq_len, 39), torch.tensor(0.)
+        wins = self.legacy[sid][start : start + self.seq_len]   # list length S
         # stack: face → [S, T, N, 3], wear → [S, 36], label → [S] (혹은 마지막)
         face = torch.stack([w['face_seq'] for w in wins])  # [S,T,N,3]
         wear = torch.stack([w['wear_seq'] for w in wins])  # [S,39]
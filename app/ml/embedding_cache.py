@@ -0,0 +1,53 @@
+import os
+import re
+import threading
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+# 세션별 얼굴 임베딩(hF) 캐시
+#   {session_dir}/face_embeddings/{embedding_version}.bin : (window_idx * 2 + lead : int64, hF : float32[64]) 레코드를 이어 붙인 파일
+# 랜드마크 저장소처럼 append 만 하며, 중간에 끊긴 마지막 레코드는 읽을 때 무시하고 다음 쓰기 전에 잘라냅니다.
+# embedding_version 은 ST-GCN 가중치 + edge_index 지문이므로, head(BiLSTM/회귀)만 바뀐 모델은 캐시를 그대로 씁니다.
+CACHE_DIR = "face_embeddings"
+EMBED_DIM = 64
+RECORD_DTYPE = np.dtype([("key", "<i8"), ("emb", "<f4", (EMBED_DIM,))])
+
+WindowKey = Tuple[int, bool]
+
+_lock = threading.Lock()
+
+
+def cache_path(session_dir: str, embedding_version: str) -> str:
+    tag = re.sub(r"[^0-9A-Za-z_.-]", "_", embedding_version)
+    return os.path.join(session_dir, CACHE_DIR, f"{tag}.bin")
+
+
+def load_embeddings(session_dir: str, embedding_version: str) -> Dict[WindowKey, np.ndarray]:
+    """저장된 {(window_idx, lead): [64] 임베딩} 을 반환합니다. 캐시가 없으면 빈 dict."""
+    path = cache_path(session_dir, embedding_version)
+    if not os.path.exists(path):
+        return {}
+    with _lock:
+        with open(path, "rb") as f:
+            data = f.read()
+    records = np.frombuffer(data, dtype=RECORD_DTYPE, count=len(data) // RECORD_DTYPE.itemsize)
+    # 같은 키가 여러 번 저장됐으면 마지막 값을 사용
+    return {(int(r["key"]) // 2, bool(r["key"] % 2)): r["emb"] for r in records}
+
+
+def append_embeddings(session_dir: str, embedding_version: str,
+                      items: Iterable[Tuple[WindowKey, np.ndarray]]):
+    """(window_idx, lead) 별 임베딩을 캐시 파일에 이어 씁니다."""
+    items = list(items)
+    if not items:
+        return
+    records = np.empty(len(items), dtype=RECORD_DTYPE)
+    records["key"] = [w * 2 + int(lead) for (w, lead), _ in items]
+    records["emb"] = np.stack([emb for _, emb in items])
+    path = cache_path(session_dir, embedding_version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _lock:
+        with open(path, "ab") as f:
+            f.truncate(f.tell() - f.tell() % RECORD_DTYPE.itemsize)
+            f.write(records.tobytes())
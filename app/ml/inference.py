@@ -0,0 +1,135 @@
+import os
+from typing import Callable, List, Optional
+
+import numpy as np
+import torch
+
+from app.ml.pipeline import MultimodalFatigueModel
+
+# ST-GCN 활성값(64ch)이 윈도우×프레임×노드 단위로 여러 벌 생기므로, 입력 크기 대비 대략적인 배수로 잡습니다.
+# (실측: [1, 24, 150, 478, 3] 세그먼트 1개 forward 시 약 2GB)
+_ACTIVATION_FACTOR = 4 * 64 + 3
+_DEFAULT_MEMORY_FRACTION = 0.5
+
+
+def available_memory_bytes() -> Optional[int]:
+    """현재 사용 가능한 물리 메모리(bytes). 알 수 없으면 None."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def estimate_segment_bytes(seq_len: int, frames: int, nodes: int) -> int:
+    """세그먼트 1개([S, T, N, 3]) forward 에 필요한 대략적인 메모리."""
+    return seq_len * frames * nodes * _ACTIVATION_FACTOR * 4
+
+
+def adaptive_micro_batch_size(seq_len: int, frames: int, nodes: int, max_batch: int = 8,
+                              memory_fraction: float = _DEFAULT_MEMORY_FRACTION) -> int:
+    """가용 메모리에 맞춰 한 번의 forward 에 넣을 세그먼트 수를 정합니다. (최소 1)"""
+    available = available_memory_bytes()
+    if available is None:
+        return 1
+    per_segment = estimate_segment_bytes(seq_len, frames, nodes)
+    return int(max(1, min(max_batch, (available * memory_fraction) // per_segment)))
+
+
+def batched_edge_index(edge_index: torch.Tensor, batch_size: int, nodes_per_sample: int) -> torch.Tensor:
+    """
+    FaceSTGCNModel 은 [B*S*T*N] 개의 노드를 하나의 그래프로 펼쳐 GCNConv 를 적용하므로,
+    edge_index 가 가리키는 노드(첫 프레임)는 배치 전체에서 단 하나의 샘플에만 해당됩니다.
+    배치 크기 1로 돌렸을 때와 같은 결과가 나오도록 샘플마다 노드 오프셋을 더한 edge_index 를 만듭니다.
+    """
+    if batch_size == 1:
+        return edge_index
+    offsets = torch.arange(batch_size, dtype=edge_index.dtype) * nodes_per_sample
+    return (edge_index.unsqueeze(0) + offsets.view(-1, 1, 1)).permute(1, 0, 2).reshape(2, -1)
+
+
+@torch.no_grad()
+def forward_segments(model: MultimodalFatigueModel, edge_index: torch.Tensor,
+                     face: torch.Tensor, hrv: torch.Tensor) -> torch.Tensor:
+    """
+    여러 세그먼트를 한 번에 forward 합니다.
+      face : [B, S, T, N, 3]
+      hrv  : [B, 39]  (세그먼트당 HRV 벡터 1개, S개 윈도우에 동일하게 복제)
+    반환  : [B] 졸음 점수
+    """
+    B, S, T, N, _ = face.shape
+    wear = hrv.unsqueeze(1).expand(B, S, hrv.shape[-1]).contiguous()  # [B, S, 39]
+    pred, _ = model(face, wear, batched_edge_index(edge_index, B, S * T * N))
+    return pred.view(-1)
+
+
+def predict_segments(model: MultimodalFatigueModel, edge_index: torch.Tensor,
+                     get_face: Callable[[int], torch.Tensor], hrv_vectors: np.ndarray,
+                     micro_batch_size: Optional[int] = None) -> List[float]:
+    """
+    세그먼트 P개를 마이크로배치 단위로 묶어 추론합니다.
+      get_face    : idx -> [S, T, N, 3] 얼굴 텐서 (예: dataset[idx][0])
+      hrv_vectors : [P, 39] HRV 특징 행렬
+    """
+    num_segments = len(hrv_vectors)
+    if num_segments == 0:
+        return []
+    hrv_all = torch.as_tensor(np.asarray(hrv_vectors, dtype=np.float32))
+
+    preds: List[float] = []
+    start = 0
+    while start < num_segments:
+        first = get_face(start)
+        if micro_batch_size is None:
+            S, T, N, _ = first.shape
+            micro_batch_size = adaptive_micro_batch_size(S, T, N)
+        end = min(num_segments, start + micro_batch_size)
+        face = torch.stack([first] + [get_face(i) for i in range(start + 1, end)])
+        preds.extend(forward_segments(model, edge_index, face, hrv_all[start:end]).tolist())
+        start = end
+    return preds
+
+
+def window_edge_index(edge_index: torch.Tensor, lead: torch.Tensor, nodes_per_window: int) -> torch.Tensor:
+    """
+    윈도우 단위 임베딩용 edge_index. 전체 forward 와 같은 결과가 나오도록
+    시퀀스의 첫 윈도우(lead=True)에만 그래프 간선을 두고, 나머지 윈도우는 self-loop 만 적용되게 합니다.
+    """
+    lead_idx = torch.nonzero(lead, as_tuple=False).view(-1)
+    if lead_idx.numel() == 0:
+        return edge_index.new_empty((2, 0))
+    offsets = lead_idx.to(edge_index.dtype) * nodes_per_window
+    return (edge_index.unsqueeze(0) + offsets.view(-1, 1, 1)).permute(1, 0, 2).reshape(2, -1)
+
+
+@torch.no_grad()
+def embed_windows(model: MultimodalFatigueModel, edge_index: torch.Tensor,
+                  windows: torch.Tensor, lead: torch.Tensor) -> torch.Tensor:
+    """
+    150 프레임 윈도우 W개를 ST-GCN 으로 임베딩합니다. (추론에서 가장 비싼 단계)
+      windows : [W, T, N, 3]
+      lead    : [W] bool, 시퀀스의 첫 윈도우 여부
+    반환     : [W, 64]
+    """
+    W, T, N, _ = windows.shape
+    return model.face_embed(windows, window_edge_index(edge_index, lead, T * N))
+
+
+@torch.no_grad()
+def score_segments(model: MultimodalFatigueModel, hF_seq: torch.Tensor, hrv: torch.Tensor) -> torch.Tensor:
+    """
+    윈도우 임베딩 시퀀스로 세그먼트 점수를 계산합니다. (fusion + BiLSTM, 가벼운 단계)
+      hF_seq : [B, S, 64]
+      hrv    : [B, 39]
+    반환    : [B]
+    """
+    B, S, _ = hF_seq.shape
+    wear = hrv.unsqueeze(1).expand(B, S, hrv.shape[-1]).contiguous()
+    pred, _ = model.score_sequence(hF_seq, wear)
+    return pred.view(-1)
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+import torch
+
+from app.core import metrics
+from app.core.config import Settings
+from app.ml.inference import adaptive_micro_batch_size, forward_segments
+from app.ml.model_registry import ModelRegistry, get_model_registry
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH = metrics.gauge(
+    "inference_queue_depth", "추론 대기열에 쌓인 세그먼트 수")
+BATCH_SIZE = metrics.histogram(
+    "inference_batch_size", "한 번의 forward 에 묶인 세그먼트 수",
+    buckets=(1, 2, 4, 8, 16, 32, 64))
+REQUEST_LATENCY = metrics.histogram(
+    "inference_request_latency_seconds", "세그먼트 제출부터 결과 수신까지 걸린 시간")
+FORWARD_SECONDS = metrics.histogram(
+    "inference_forward_seconds", "배치 forward 1회에 걸린 시간")
+
+
+class _Request:
+    __slots__ = ("face", "hrv", "future", "enqueued_at")
+
+    def __init__(self, face: torch.Tensor, hrv: torch.Tensor, future: asyncio.Future):
+        self.face = face
+        self.hrv = hrv
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceScheduler:
+    """
+    여러 세션(요청)의 세그먼트를 한 배치로 모아 MultimodalFatigueModel 에 넣는 프로세스 내 스케줄러.
+
+    - 요청은 크기가 제한된 asyncio.Queue(max_queue_size)에 쌓이고, 디스패처가 max_batch_size 개 또는 max_wait 초 중 먼저 도달하는 시점에 배치를 만듭니다.
+    - forward 는 전용 스레드 1개에서 실행되어 여러 요청이 CPU 코어를 두고 경쟁하지 않습니다.
+    - 동기 코드(스레드풀 엔드포인트, 작업 워커)는 predict_segments_threadsafe() 로 제출합니다.
+    - stop() 은 대기열과 처리 중인 배치의 요청을 모두 예외로 끝내, 기다리던 쪽이 멈춰 있지 않게 합니다.
+    """
+
+    def __init__(self, registry: ModelRegistry, max_batch_size: Optional[int] = None, max_wait: float = 0.02,
+                 max_queue_size: int = 256):
+        self.registry = registry
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        # 대기열에서 꺼내 배치로 모으거나 forward 중인 요청
+        self._batch: List[_Request] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self._task = asyncio.create_task(self._dispatch_loop())
+        logger.info(f"추론 스케줄러 시작 (max_batch_size={self.max_batch_size or 'auto'}, max_wait={self.max_wait * 1000:.0f}ms)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        pending, self._batch = self._batch, []
+        if self._queue is not None:
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            QUEUE_DEPTH.set(0)
+        for req in pending:
+            _fail_stopped(req.future)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def predict(self, face: torch.Tensor, hrv: torch.Tensor) -> float:
+        """세그먼트 1개([S, T, N, 3] + [39])의 졸음 점수를 반환합니다."""
+        if not self.running:
+            raise RuntimeError("추론 스케줄러가 실행 중이 아닙니다.")
+        future = self._loop.create_future()
+        await self._queue.put(_Request(face, hrv, future))
+        if not self.running:
+            # 대기열 자리를 기다리는 사이 stop() 이 대기열을 비운 경우
+            _fail_stopped(future)
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return await future
+
+    def predict_segments_threadsafe(self, get_face: Callable[[int], torch.Tensor],
+                                    hrv_vectors: np.ndarray, max_in_flight: Optional[int] = None) -> List[float]:
+        """
+        이벤트 루프 밖(워커 스레드)에서 세그먼트 P개를 제출하고 순서대로 결과를 돌려받습니다.
+        메모리를 위해 동시에 대기열에 올리는 세그먼트 수는 max_in_flight 로 제한합니다.
+        """
+        hrv_all = torch.as_tensor(np.asarray(hrv_vectors, dtype=np.float32))
+        num_segments = len(hrv_all)
+        in_flight_limit = max_in_flight or self.max_batch_size or 4
+
+        results: List[float] = [0.0] * num_segments
+        pending = deque()
+        for idx in range(num_segments):
+            if len(pending) >= in_flight_limit:
+                done_idx, fut = pending.popleft()
+                results[done_idx] = fut.result()
+            fut = asyncio.run_coroutine_threadsafe(self.predict(get_face(idx), hrv_all[idx]), self._loop)
+            pending.append((idx, fut))
+        while pending:
+            done_idx, fut = pending.popleft()
+            results[done_idx] = fut.result()
+        return results
+
+    async def _collect_batch(self) -> List[_Request]:
+        first = await self._queue.get()
+        batch = self._batch = [first]
+        S, T, N, _ = first.face.shape
+        limit = self.max_batch_size or adaptive_micro_batch_size(S, T, N)
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < limit:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    def _forward(self, batch: List[_Request]) -> List[float]:
+        model, edge_index = self.registry.get()
+        face = torch.stack([req.face for req in batch])
+        hrv = torch.stack([req.hrv for req in batch])
+        started = time.perf_counter()
+        preds = forward_segments(model, edge_index, face, hrv).tolist()
+        FORWARD_SECONDS.observe(time.perf_counter() - started)
+        return preds
+
+    async def _dispatch_loop(self):
+        while True:
+            batch = await self._collect_batch()
+            # 입력 크기가 다른 세그먼트는 같은 배치로 쌓을 수 없으므로 모양별로 나눠 처리합니다.
+            groups = {}
+            for req in batch:
+                groups.setdefault(tuple(req.face.shape), []).append(req)
+            for group in groups.values():
+                BATCH_SIZE.observe(len(group))
+                try:
+                    preds = await self._loop.run_in_executor(self._executor, self._forward, group)
+                except Exception as e:
+                    logger.exception("배치 추론 실패")
+                    for req in group:
+                        if not req.future.done():
+                            req.future.set_exception(e)
+                    continue
+                now = time.perf_counter()
+                for req, pred in zip(group, preds):
+                    REQUEST_LATENCY.observe(now - req.enqueued_at)
+                    if not req.future.done():
+                        req.future.set_result(pred)
+            self._batch = []
+
+
+def _fail_stopped(future: asyncio.Future):
+    if not future.done():
+        future.set_exception(RuntimeError("추론 스케줄러가 종료되었습니다."))
+
+
+_scheduler: Optional[InferenceScheduler] = None
+
+
+def get_inference_scheduler() -> InferenceScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = InferenceScheduler(
+            get_model_registry(),
+            max_batch_size=Settings.INFERENCE_MAX_BATCH_SIZE,
+            max_wait=Settings.INFERENCE_MAX_WAIT_MS / 1000,
+            max_queue_size=Settings.INFERENCE_MAX_QUEUE_SIZE,
+        )
+    return _scheduler
@@ -0,0 +1,121 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+import torch
+
+from app.core import metrics
+from app.core.config import Settings
+from app.ml.pipeline import MultimodalFatigueModel
+
+logger = logging.getLogger(__name__)
+
+MODEL_LOAD_SECONDS = metrics.gauge(
+    "fatigue_model_load_seconds", "마지막 모델 로드에 걸린 시간(초)")
+MODEL_MEMORY_BYTES = metrics.gauge(
+    "fatigue_model_memory_bytes", "로드된 모델 파라미터/버퍼 + edge_index 메모리(bytes)")
+MODEL_LOADS_TOTAL = metrics.counter(
+    "fatigue_model_loads_total", "모델 로드 횟수 (최초 로드 + 핫 리로드)", ["reason"])
+MODEL_CHECKPOINT_MTIME = metrics.gauge(
+    "fatigue_model_checkpoint_mtime_seconds", "현재 로드된 체크포인트 파일의 mtime")
+
+
+def _tensor_bytes(t: torch.Tensor) -> int:
+    return t.numel() * t.element_size()
+
+
+def embedding_fingerprint(model: MultimodalFatigueModel, edge_index: torch.Tensor) -> str:
+    """얼굴 임베딩(ST-GCN) 결과를 결정하는 가중치 + edge_index 의 지문. head 만 바뀌면 그대로입니다."""
+    digest = hashlib.sha1()
+    for name, tensor in model.face_embed.state_dict().items():
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    digest.update(edge_index.cpu().contiguous().numpy().tobytes())
+    return f"stgcn-{digest.hexdigest()[:16]}"
+
+
+class ModelRegistry:
+    """
+    MultimodalFatigueModel 과 edge_index 를 프로세스당 한 번만 로드해 공유하는 레지스트리.
+
+    - lifespan 에서 load() 를 호출하거나, 처음 get() 할 때 지연 로드합니다.
+    - 모델은 eval 모드 + requires_grad=False 상태로 요청 간에 읽기 전용으로 공유됩니다.
+    - 체크포인트 파일의 mtime 이 바뀌면 다음 get() 에서 새 모델을 만들어 교체합니다.
+      (이미 이전 모델을 받아간 요청은 그 모델로 끝까지 추론합니다)
+    """
+
+    def __init__(self, model_path: str, edge_index_path: str, num_classes: int = 5):
+        self.model_path = model_path
+        self.edge_index_path = edge_index_path
+        self.num_classes = num_classes
+        self._lock = threading.Lock()
+        self._model: Optional[MultimodalFatigueModel] = None
+        self._edge_index: Optional[torch.Tensor] = None
+        self._mtimes: Tuple[float, float] = (0.0, 0.0)
+        self.version: Optional[str] = None
+        self.embedding_version: Optional[str] = None
+
+    def _current_mtimes(self) -> Tuple[float, float]:
+        return os.path.getmtime(self.model_path), os.path.getmtime(self.edge_index_path)
+
+    def _load_locked(self, reason: str):
+        started = time.perf_counter()
+        mtimes = self._current_mtimes()
+
+        edge_index = torch.load(self.edge_index_path, map_location='cpu')
+        model = MultimodalFatigueModel(num_classes=self.num_classes)
+        checkpoint = torch.load(self.model_path, map_location='cpu')
+        model.load_state_dict(checkpoint.get('model', checkpoint))
+        model.eval()
+        model.requires_grad_(False)
+
+        self._model, self._edge_index, self._mtimes = model, edge_index, mtimes
+        self.version = f"{os.path.basename(self.model_path)}@{int(mtimes[0])}"
+        self.embedding_version = embedding_fingerprint(model, edge_index)
+
+        elapsed = time.perf_counter() - started
+        memory = sum(_tensor_bytes(p) for p in model.parameters())
+        memory += sum(_tensor_bytes(b) for b in model.buffers())
+        memory += _tensor_bytes(edge_index)
+        MODEL_LOAD_SECONDS.set(elapsed)
+        MODEL_MEMORY_BYTES.set(memory)
+        MODEL_LOADS_TOTAL.inc(reason=reason)
+        MODEL_CHECKPOINT_MTIME.set(mtimes[0])
+        logger.info(f"졸음 모델 로드 완료 ({reason}): {self.version}, {elapsed:.3f}s, {memory / 1024 / 1024:.1f}MB")
+
+    def load(self):
+        """모델을 (다시) 로드합니다. lifespan 시작 시 호출합니다."""
+        with self._lock:
+            self._load_locked("startup" if self._model is None else "manual")
+
+    def get(self) -> Tuple[MultimodalFatigueModel, torch.Tensor]:
+        """(model, edge_index) 를 반환합니다. 필요하면 지연 로드 / 핫 리로드합니다."""
+        with self._lock:
+            if self._model is None:
+                self._load_locked("lazy")
+            else:
+                mtimes = self._current_mtimes()
+                if mtimes != self._mtimes:
+                    try:
+                        self._load_locked("reload")
+                    except Exception as e:
+                        # 파일이 쓰이는 도중일 수 있으므로 기존 모델을 유지하고, 다음 변경 시 다시 시도합니다.
+                        self._mtimes = mtimes
+                        logger.warning(f"졸음 모델 핫 리로드 실패, 기존 모델 유지 ({self.version}): {e}")
+            return self._model, self._edge_index
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(Settings.FATIGUE_MODEL_PATH, Settings.FATIGUE_EDGE_INDEX_PATH)
+    return _registry
@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from app.core import metrics
+from app.core.config import Settings
+from app.ml.embedding_cache import WindowKey, append_embeddings, load_embeddings
+from app.ml.inference import adaptive_micro_batch_size, embed_windows
+from app.ml.model_registry import ModelRegistry, get_model_registry
+from app.utils.drowsiness_data_utils import landmark_window
+from app.utils.landmark_store import open_landmark_store
+
+logger = logging.getLogger(__name__)
+
+WINDOWS_EMBEDDED_TOTAL = metrics.counter(
+    "online_face_windows_embedded_total", "세션 진행 중/종료 시 임베딩한 윈도우 수", ["when"])
+WINDOWS_SKIPPED_TOTAL = metrics.counter(
+    "online_face_windows_skipped_total", "대기열이 가득 차 세션 중 임베딩을 건너뛴 윈도우 수 (종료 시 계산)")
+EMBED_BACKLOG = metrics.gauge(
+    "online_face_embed_backlog", "세션 중 임베딩 대기 중인 윈도우 수")
+EMBED_SECONDS = metrics.histogram(
+    "online_face_embed_seconds", "윈도우 1개를 ST-GCN 으로 임베딩하는 데 걸린 시간")
+
+WINDOW_SIZE = 150
+SEQ_LEN = 24
+
+def is_lead_window(window_idx: int, seq_len: int = SEQ_LEN) -> bool:
+    """STRIDE == SEQ_LEN 으로 세그먼트를 나누므로, 세그먼트의 첫 윈도우만 그래프 간선을 받습니다."""
+    return window_idx % seq_len == 0
+
+
+class OnlineWindowEmbedder:
+    """
+    세션 진행 중 150 프레임 윈도우가 저장될 때마다 FaceSTGCNModel 임베딩을 미리 계산해 두는 백그라운드 워커.
+
+    - 임베딩은 세션별로 (윈도우 인덱스, lead 여부) 키로 메모리와 세션 디렉토리의 임베딩 캐시(embedding_cache)에
+      ST-GCN 지문(embedding_version)과 함께 저장합니다. ST-GCN 이 바뀐 모델로 리로드되면 이전 임베딩은 쓰지 않습니다.
+    - 대기열이 가득 차면(모델이 ingest 속도를 못 따라가면) 윈도우를 건너뛰고, 종료 시 session_embeddings() 가 계산합니다.
+    - 종료 시에는 이미 계산된 임베딩을 모으고 빠진 윈도우만 임베딩하므로, 종료 지연이 영상 길이에 비례하지 않습니다.
+    """
+
+    def __init__(self, registry: Optional[ModelRegistry] = None, max_backlog: Optional[int] = None):
+        self._registry = registry
+        self.max_backlog = Settings.ONLINE_FACE_EMBED_BACKLOG if max_backlog is None else max_backlog
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="face-embed")
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict[WindowKey, Tuple[str, np.ndarray]]] = {}
+        self._pending: Dict[str, List[Future]] = {}
+        self._last_submit: Dict[str, float] = {}
+        self._backlog = 0
+
+    @property
+    def registry(self) -> ModelRegistry:
+        return self._registry or get_model_registry()
+
+    def submit(self, session_id: str, session_dir: str, window_idx: int) -> bool:
+        """저장소에 다 써진 window_idx 번째 윈도우의 임베딩을 예약합니다. 대기열이 가득 차면 False."""
+        with self._lock:
+            if self._backlog >= self.max_backlog:
+                WINDOWS_SKIPPED_TOTAL.inc()
+                return False
+            self._backlog += 1
+            EMBED_BACKLOG.set(self._backlog)
+            future = self._executor.submit(self._embed_from_store, session_id, session_dir, window_idx)
+            self._pending.setdefault(session_id, []).append(future)
+            now = time.monotonic()
+            self._last_submit[session_id] = now
+            self._evict_idle_locked(now)
+        return True
+
+    def _evict_idle_locked(self, now: float):
+        # finish/정리가 다른 워커에서 처리되어 drop() 이 이 프로세스에 오지 않은 세션도 메모리에 남지 않게 합니다.
+        # (디스크 캐시는 남으므로 나중에 분석해도 다시 임베딩하지 않음)
+        idle_before = now - Settings.SESSION_INACTIVE_TTL_SECONDS
+        for session_id in [sid for sid, at in self._last_submit.items() if at < idle_before]:
+            self._drop_locked(session_id)
+
+    def _embed_from_store(self, session_id: str, session_dir: str, window_idx: int):
+        try:
+            _, frames = open_landmark_store(session_dir)
+            window = landmark_window(frames, window_idx, WINDOW_SIZE)
+            self._embed_and_store(session_id, session_dir, [(window_idx, is_lead_window(window_idx))],
+                                  window[None], "online")
+        except Exception:
+            logger.exception(f"[{session_id}] 윈도우 {window_idx} 온라인 임베딩 실패 (종료 시 다시 계산)")
+        finally:
+            with self._lock:
+                self._backlog -= 1
+                EMBED_BACKLOG.set(self._backlog)
+
+    def _embed_and_store(self, session_id: str, session_dir: str, keys: List[WindowKey],
+                         windows: np.ndarray, when: str):
+        model, edge_index = self.registry.get()
+        version = self.registry.embedding_version
+        lead = torch.tensor([is_lead for _, is_lead in keys])
+        started = time.perf_counter()
+        hF = embed_windows(model, edge_index, torch.from_numpy(windows), lead)
+        EMBED_SECONDS.observe((time.perf_counter() - started) / len(keys))
+        hF = hF.numpy().copy()
+        with self._lock:
+            # drop() 이후에 끝난 온라인 임베딩은 메모리에 다시 올리지 않고 디스크 캐시에만 남깁니다.
+            if when != "online" or session_id in self._pending:
+                cache = self._cache.setdefault(session_id, {})
+                for key, emb in zip(keys, hF):
+                    cache[key] = (version, emb)
+        try:
+            append_embeddings(session_dir, version, zip(keys, hF))
+        except OSError as e:
+            logger.warning(f"[{session_id}] 얼굴 임베딩 캐시 저장 실패: {e}")
+        WINDOWS_EMBEDDED_TOTAL.inc(len(keys), when=when)
+
+    def session_embeddings(self, session_id: str, session_dir: str, frames: np.ndarray,
+                           segment_starts: Sequence[int], seq_len: int = SEQ_LEN,
+                           timeout: Optional[float] = None) -> torch.Tensor:
+        """
+        세그먼트(시작 윈도우 인덱스 목록)별 윈도우 임베딩 시퀀스 [P, seq_len, 64] 를 반환합니다.
+        진행 중인 온라인 임베딩을 기다린 뒤, 메모리/디스크 캐시에 없거나 다른 ST-GCN 으로 계산된 윈도우만 새로 임베딩합니다.
+        (lead 여부가 키에 들어가므로, stride 를 바꿔 재분석해도 겹치는 윈도우는 재사용됩니다)
+        """
+        with self._lock:
+            pending = list(self._pending.get(session_id, []))
+        if pending:
+            wait(pending, timeout=timeout)
+
+        # 빠진 윈도우를 계산하기 전에 모델을 확정해, 캐시와 새 임베딩이 같은 버전이 되게 합니다.
+        self.registry.get()
+        version = self.registry.embedding_version
+        cached = load_embeddings(session_dir, version)
+        with self._lock:
+            cached.update({key: emb for key, (v, emb) in self._cache.get(session_id, {}).items() if v == version})
+
+        needed = [[(s + j, j == 0) for j in range(seq_len)] for s in segment_starts]
+        missing = sorted({key for keys in needed for key in keys if key not in cached})
+        if missing:
+            batch = adaptive_micro_batch_size(1, WINDOW_SIZE, frames.shape[1], max_batch=seq_len)
+            for start in range(0, len(missing), batch):
+                keys = missing[start:start + batch]
+                windows = np.stack([landmark_window(frames, w, WINDOW_SIZE) for w, _ in keys])
+                self._embed_and_store(session_id, session_dir, keys, windows, "finish")
+            with self._lock:
+                cached.update({key: emb for key, (v, emb) in self._cache.get(session_id, {}).items() if v == version})
+        total = len(needed) * seq_len
+        logger.info(f"[{session_id}] 윈도우 임베딩 {total}개 중 {total - len(missing)}개 재사용")
+        return torch.from_numpy(np.stack([[cached[key] for key in keys] for keys in needed]).astype(np.float32))
+
+    def drop(self, session_id: str):
+        """
+        세션의 메모리 임베딩 캐시를 비웁니다. 분석이 끝나거나(성공/실패) 세션이 정리될 때 호출합니다.
+        (디스크 캐시는 재분석용으로 남김)
+        """
+        with self._lock:
+            self._drop_locked(session_id)
+
+    def _drop_locked(self, session_id: str):
+        self._cache.pop(session_id, None)
+        self._pending.pop(session_id, None)
+        self._last_submit.pop(session_id, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_embedder: Optional[OnlineWindowEmbedder] = None
+
+
+def get_online_embedder() -> OnlineWindowEmbedder:
+    global _embedder
+    if _embedder is None:
+        _embedder = OnlineWindowEmbedder()
+    return _embedder
+
+
+def drop_session_embeddings(session_id: str):
+    """이 프로세스의 온라인 임베더가 떠 있으면 세션의 메모리 캐시를 비웁니다."""
+    if _embedder is not None:
+        _embedder.drop(session_id)
@@ -20,18 +20,18 @@ class MultimodalFatigueModel(nn.Module):
         self.temporal = TemporalBiLSTM()
         self.regressor = RegressionHead(self.temporal.output_dim)
 
-    def forward(self,
-                face_seq: torch.Tensor,
-                hrv_seq: torch.Tensor,
-                edge_index: torch.Tensor) -> Tuple[torch.Tensor, dict]:
-
-        B, S, T, N, C = face_seq.shape  # S=12 windows of 150 frames
+    def score_sequence(self,
+                       hF_seq: torch.Tensor,
+                       hrv_seq: torch.Tensor) -> Tuple[torch.Tensor, dict]:
+        """
+        윈도우별 얼굴 임베딩 시퀀스와 HRV 시퀀스로 졸음 점수를 계산합니다. (ST-GCN 이후 단계)
+          hF_seq  : [B, S, 64]  face_embed 출력
+          hrv_seq : [B, S, 39]
+        """
+        B, S, _ = hF_seq.shape
 
-        # reshape to process each 5‑s window independently through ST‑GCN
-        face_seq_reshaped = face_seq.view(B * S, T, N, C)
-        hrv_seq_reshaped = hrv_seq.view(B * S, -1)  # [B*S, 39]
-
-        hF = self.face_embed(face_seq_reshaped, edge_index)          # [B*S, 64]
+        hF = hF_seq.reshape(B * S, -1)                                # [B*S, 64]
+        hrv_seq_reshaped = hrv_seq.view(B * S, -1)                   # [B*S, 39]
         hP = self.hrv_embed(hrv_seq_reshaped)                        # [B*S, 64]
 
         # RBM‑like stage (simplified)
@@ -51,3 +51,16 @@ class MultimodalFatigueModel(nn.Module):
             'F': F_fused.detach()
         }
         return fatigue_pred, aux
+
+    def forward(self,
+                face_seq: torch.Tensor,
+                hrv_seq: torch.Tensor,
+                edge_index: torch.Tensor) -> Tuple[torch.Tensor, dict]:
+
+        B, S, T, N, C = face_seq.shape  # S=12 windows of 150 frames
+
+        # reshape to process each 5‑s window independently through ST‑GCN
+        face_seq_reshaped = face_seq.view(B * S, T, N, C)
+        hF = self.face_embed(face_seq_reshaped, edge_index)          # [B*S, 64]
+
+        return self.score_sequence(hF.view(B, S, -1), hrv_seq)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP, Text, JSON, func
+from app.db.base import Base
+
+class DrowsinessJob(Base):
+    __tablename__ = "drowsiness_job"
+
+    id = Column(String(36), primary_key=True)  # uuid4
+    session_id = Column(String(64), nullable=False, index=True)
+    student_uid = Column(String(128), ForeignKey("student.uid"), nullable=False, index=True)
+    video_id = Column(Integer, ForeignKey("video.id"), nullable=False)
+    status = Column(String(16), nullable=False, default="queued")  # queued / running / succeeded / failed
+    stage = Column(String(32), nullable=True)  # 현재 진행 중인 파이프라인 단계
+    result = Column(JSON, nullable=True)  # 성공 시 DrowsinessFinishResponse
+    error_code = Column(Integer, nullable=True)  # 실패 시 HTTP 상태 코드
+    error_detail = Column(Text, nullable=True)
+    claimed_by = Column(String(128), nullable=True)  # 작업을 가져간 워커 프로세스 ("노드:pid:토큰")
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -29,3 +29,12 @@ class DrowsinessFinishResponse(BaseModel):
     session_id: str = Field(..., description="졸음 탐지 세션 ID")
     prediction: DrowsinessPrediction
     message: str = Field(..., description="상태 메시지")
+
+class DrowsinessJobResponse(BaseModel):
+    job_id: str = Field(..., description="졸음 분석 작업 ID")
+    session_id: str = Field(..., description="졸음 탐지 세션 ID")
+    status: str = Field(..., description="작업 상태 (queued / running / succeeded / failed)")
+    stage: Optional[str] = Field(None, description="현재 진행 중인 분석 단계")
+    result: Optional[DrowsinessFinishResponse] = Field(None, description="분석 결과 (succeeded 일 때)")
+    error_code: Optional[int] = Field(None, description="실패 시 HTTP 상태 코드")
+    error_detail: Optional[str] = Field(None, description="실패 사유")
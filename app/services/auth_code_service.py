@@ -0,0 +1,222 @@
+import logging
+import secrets
+import threading
+import time
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+
+from app.core import metrics, session_store
+from app.core.config import Settings
+from app.ml.online_embedding import drop_session_embeddings
+from app.services.hrv_stream import pop_hrv_stream
+from app.services.session_registry import ACTIVITY_PATH, release_session_records
+
+logger = logging.getLogger(__name__)
+
+# 웨어러블 연동용 6자리 인증코드.
+# auth_code_index/{code} = {"session_id", "expires_at"} 로 저장해 코드 → 세션 조회는 키 하나로 끝나고,
+# 발급/사용은 그 키에 대한 transaction 으로 처리해 같은 코드가 두 세션에 나가거나 두 번 쓰이지 않게 합니다.
+# 만료된 코드와 끝내 연동되지 않은 세션, 연동 후 PPG 가 멈춘 채 종료되지 않은 세션은 AuthCodeSweeper 가 주기적으로 지웁니다.
+INDEX_PATH = "auth_code_index"
+MAX_ALLOCATE_ATTEMPTS = 10
+
+COLLISIONS_TOTAL = metrics.counter(
+    "auth_code_collisions_total", "발급하려던 인증코드가 이미 사용 중이라 다시 뽑은 횟수")
+EXPIRED_CODES_TOTAL = metrics.counter(
+    "auth_codes_expired_total", "만료되어 정리한 인증코드 수")
+EXPIRED_SESSIONS_TOTAL = metrics.counter(
+    "drowsiness_sessions_expired_total",
+    "정리한 세션 수 (unpaired: 인증코드 만료까지 미연동, inactive: 연동 후 PPG 가 멈춘 채 미종료)", ["reason"])
+
+
+class _Abort(Exception):
+    """transaction 을 쓰지 않고 끝냅니다."""
+
+
+def _valid_session_id(entry, now: float) -> Optional[str]:
+    """인덱스 값이 아직 유효하면 session_id 를 반환합니다. (이전 형식인 session_id 문자열은 만료 시각 없이 유효)"""
+    if isinstance(entry, str):
+        return entry
+    if isinstance(entry, dict) and entry.get("expires_at", 0) > now:
+        return entry.get("session_id")
+    return None
+
+
+def allocate_auth_code(session_id: str, ttl: Optional[float] = None) -> str:
+    """비어 있거나 만료된 코드를 골라 session_id 에 ttl 초(기본: Settings.AUTH_CODE_TTL_SECONDS) 동안 배정합니다."""
+    ttl = Settings.AUTH_CODE_TTL_SECONDS if ttl is None else ttl
+    for _ in range(MAX_ALLOCATE_ATTEMPTS):
+        code = f"{secrets.randbelow(1_000_000):06d}"
+        now = time.time()
+
+        def _claim(current):
+            if _valid_session_id(current, now) is not None:
+                raise _Abort()
+            return {"session_id": session_id, "expires_at": now + ttl}
+
+        try:
+            session_store.reference(f"{INDEX_PATH}/{code}").transaction(_claim)
+            return code
+        except _Abort:
+            COLLISIONS_TOTAL.inc()
+    raise HTTPException(status_code=503, detail="인증코드를 발급하지 못했습니다. 잠시 후 다시 시도하세요.")
+
+
+def consume_auth_code(code: str) -> Optional[str]:
+    """유효한 코드면 인덱스에서 지우고 session_id 를 반환합니다. 없거나 만료되었으면 None."""
+    consumed = {}
+
+    def _consume(current):
+        session_id = _valid_session_id(current, time.time())
+        if session_id is None:
+            raise _Abort()
+        consumed["session_id"] = session_id
+        return None
+
+    try:
+        session_store.reference(f"{INDEX_PATH}/{code}").transaction(_consume)
+    except _Abort:
+        return None
+    return consumed["session_id"]
+
+
+def sweep_expired_auth_codes(now: Optional[float] = None, grace: Optional[float] = None) -> int:
+    """
+    만료 후 grace 초(기본: Settings.AUTH_CODE_SWEEP_INTERVAL_SECONDS)가 지난 코드를 지우고,
+    그 세션이 끝내 연동되지 않았으면 세션 데이터도 지웁니다.
+    만료 시각이 없는 이전 형식 값도 정리 대상입니다. 정리한 코드 수를 반환합니다.
+    """
+    now = time.time() if now is None else now
+    grace = Settings.AUTH_CODE_SWEEP_INTERVAL_SECONDS if grace is None else grace
+    index = session_store.reference(INDEX_PATH).get() or {}
+    expired = 0
+    for code, entry in index.items():
+        if isinstance(entry, dict) and entry.get("expires_at", 0) + grace > now:
+            continue
+
+        def _expire(current, entry=entry):
+            # 조회 이후 다시 발급되었거나 사용된 코드는 건드리지 않습니다.
+            if current != entry:
+                raise _Abort()
+            return None
+
+        try:
+            session_store.reference(f"{INDEX_PATH}/{code}").transaction(_expire)
+        except _Abort:
+            continue
+        expired += 1
+        EXPIRED_CODES_TOTAL.inc()
+        session_id = entry if isinstance(entry, str) else entry.get("session_id")
+        if session_id:
+            _expire_unpaired_session(session_id)
+    return expired
+
+
+def activity_record(now: Optional[float] = None) -> dict:
+    """세션 시작 시 session_activity/{session_id} 에 기록하는 값."""
+    return {"last_key": None, "updated_at": time.time() if now is None else now}
+
+
+def sweep_inactive_sessions(now: Optional[float] = None, ttl: Optional[float] = None) -> int:
+    """
+    마지막 활동 후 ttl 초가 지난 세션의 PPG_Data 마지막 키를 확인해, 그 사이 새 PPG 가 있으면 활동 시각만 갱신하고
+    없으면 세션 데이터와 소유/활동 기록을 지웁니다. 종료(stop)된 세션은 세션 데이터를 분석 작업에 맡기고 활동 기록만 지웁니다.
+    정리한 세션 수를 반환합니다.
+    """
+    now = time.time() if now is None else now
+    ttl = Settings.SESSION_INACTIVE_TTL_SECONDS if ttl is None else ttl
+    activity = session_store.reference(ACTIVITY_PATH).get() or {}
+    expired = 0
+    for session_id, entry in activity.items():
+        if not isinstance(entry, dict) or entry.get("updated_at", 0) + ttl > now:
+            continue
+        latest = session_store.reference(f"{session_id}/PPG_Data").order_by_key().limit_to_last(1).get() or {}
+        last_key = next(iter(latest), None)
+        if last_key is not None and last_key != entry.get("last_key"):
+            session_store.reference(f"{ACTIVITY_PATH}/{session_id}").set({"last_key": last_key, "updated_at": now})
+            continue
+        pairing = session_store.reference(f"{session_id}/pairing").get()
+        if not pairing or pairing.get("stop"):
+            # 이미 정리된 세션의 남은 기록이거나, 종료(finish)되어 분석 작업이 맡은 세션입니다.
+            # 작업이 기록을 지우지 못했더라도(프로세스 종료 등) 매 주기 다시 조회하지 않도록 활동 기록만 지웁니다.
+            session_store.reference(f"{ACTIVITY_PATH}/{session_id}").delete()
+            continue
+        if _expire_session(session_id, "inactive", lambda current: not current.get("stop")):
+            expired += 1
+    return expired
+
+
+def _expire_unpaired_session(session_id: str):
+    _expire_session(session_id, "unpaired", lambda current: not current.get("paired"))
+
+
+def _expire_session(session_id: str, reason: str, should_expire: Callable[[dict], bool]) -> bool:
+    """
+    pairing 이 아직 should_expire 조건을 만족하면 transaction 으로 지우고 나머지 세션 데이터와 기록을 정리합니다.
+    조회 이후 연동되거나 종료(finish)된 세션은 transaction 이 중단되어 그대로 남습니다.
+    """
+    def _remove_pairing(current):
+        if not current or not should_expire(current):
+            raise _Abort()
+        return None
+
+    try:
+        session_store.reference(f"{session_id}/pairing").transaction(_remove_pairing)
+    except _Abort:
+        return False
+    release_session_records(session_id, delete_data=True)
+    # 이 프로세스에서 돌던 실시간 HRV 스트림만 여기서 닫힙니다. 다른 워커의 스트림은 더 이상 PPG 가 오지 않으므로
+    # HRV_STREAM_IDLE_SECONDS 뒤 유휴 스트림 정리로 닫힙니다.
+    stream = pop_hrv_stream(session_id)
+    if stream is not None:
+        stream.close()
+    drop_session_embeddings(session_id)
+    EXPIRED_SESSIONS_TOTAL.inc(reason=reason)
+    logger.info(f"[{session_id}] 세션 정리 ({reason})")
+    return True
+
+
+class AuthCodeSweeper:
+    """sweep_expired_auth_codes() 와 sweep_inactive_sessions() 를 interval 초마다 실행하는 백그라운드 스레드."""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = Settings.AUTH_CODE_SWEEP_INTERVAL_SECONDS if interval is None else interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="auth-code-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                expired = sweep_expired_auth_codes()
+                if expired:
+                    logger.info(f"만료된 인증코드 {expired}개 정리")
+            except Exception:
+                logger.exception("인증코드 정리 실패")
+            try:
+                inactive = sweep_inactive_sessions()
+                if inactive:
+                    logger.info(f"활동이 없는 세션 {inactive}개 정리")
+            except Exception:
+                logger.exception("비활성 세션 정리 실패")
+
+
+_sweeper: Optional[AuthCodeSweeper] = None
+
+
+def get_auth_code_sweeper() -> AuthCodeSweeper:
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = AuthCodeSweeper()
+    return _sweeper
@@ -0,0 +1,246 @@
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import Settings
+from app.core.tracing import span
+from app.db.session import SessionLocal
+from app.models.drowsiness_job import DrowsinessJob
+from app.schemas.drowsiness import DrowsinessJobResponse, DrowsinessFinishResponse
+from app.ml.online_embedding import drop_session_embeddings
+from app.services.drowsiness_pipeline import run_drowsiness_analysis
+from app.services.session_registry import get_session_owner, is_local_owner, release_session_records
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+JOBS_TOTAL = metrics.counter(
+    "drowsiness_jobs_total", "종료된 졸음 분석 작업 수", ["status"])
+JOBS_IN_PROGRESS = metrics.gauge(
+    "drowsiness_jobs_in_progress", "워커에서 실행 중인 졸음 분석 작업 수")
+JOB_DURATION = metrics.histogram(
+    "drowsiness_job_duration_seconds", "졸음 분석 작업 1건의 실행 시간")
+
+# HTTP 스레드풀과 분리된, 크기가 제한된 분석 워커 풀
+_executor = ThreadPoolExecutor(max_workers=Settings.DROWSINESS_JOB_WORKERS, thread_name_prefix="drowsiness-job")
+
+# 작업을 가져간 프로세스를 DrowsinessJob.claimed_by 에 남기는 식별자. 컨테이너 재시작처럼 pid 가 다시 쓰여도
+# 구분되도록 프로세스마다 새 토큰을 붙입니다.
+_WORKER_ID = f"{Settings.NODE_ID}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def to_job_response(job: DrowsinessJob) -> DrowsinessJobResponse:
+    return DrowsinessJobResponse(
+        job_id=job.id,
+        session_id=job.session_id,
+        status=job.status,
+        stage=job.stage,
+        result=DrowsinessFinishResponse(**job.result) if job.result else None,
+        error_code=job.error_code,
+        error_detail=job.error_detail,
+    )
+
+
+def enqueue_drowsiness_job(db: Session, session_id: str, student_uid: str, video_id: int) -> DrowsinessJob:
+    """분석 작업을 DB에 기록하고 워커 풀에 제출합니다. 같은 세션의 진행 중인 작업이 있으면 그 작업을 돌려줍니다."""
+    active = db.query(DrowsinessJob).filter(
+        DrowsinessJob.session_id == session_id,
+        DrowsinessJob.status.in_(ACTIVE_STATUSES)
+    ).first()
+    if active:
+        return active
+
+    job = DrowsinessJob(
+        id=str(uuid.uuid4()),
+        session_id=session_id,
+        student_uid=student_uid,
+        video_id=video_id,
+        status="queued",
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _executor.submit(_run_job, job.id)
+    return job
+
+
+def get_job_for_student(db: Session, job_id: str, student_uid: str) -> DrowsinessJob:
+    job = db.query(DrowsinessJob).filter(DrowsinessJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="해당 분석 작업을 찾을 수 없습니다.")
+    if job.student_uid != student_uid:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="본인의 분석 작업이 아닙니다.")
+    return job
+
+
+def _claim_job(db: Session, job_id: str) -> bool:
+    # 조건부 UPDATE 로 queued → running 전환. 다른 워커가 먼저 가져갔으면 0행이 갱신됩니다.
+    claimed = db.query(DrowsinessJob).filter(
+        DrowsinessJob.id == job_id,
+        DrowsinessJob.status == "queued"
+    ).update({"status": "running", "stage": "queued", "claimed_by": _WORKER_ID}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+
+def _claimant_alive(claimed_by: Optional[str]) -> Optional[bool]:
+    """
+    작업을 가져간 프로세스가 살아 있는지 확인합니다.
+    이 노드의 프로세스면 True/False, 다른 노드이거나 기록이 없으면(이전 버전에서 가져간 작업) None.
+    """
+    try:
+        node_id, pid, _ = claimed_by.rsplit(":", 2)
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return None
+    if node_id != Settings.NODE_ID:
+        return None
+    if claimed_by == _WORKER_ID:
+        return True
+    if pid == os.getpid():
+        # 같은 pid 의 이전 프로세스 (컨테이너 재시작)
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _set_stage(db: Session, job: DrowsinessJob, stage: str):
+    job.stage = stage
+    db.commit()
+
+
+def _release_session(session_id: str):
+    """
+    끝난 작업(성공/실패)의 세션 소유/활동 기록과 온라인 임베딩 메모리 캐시를 지웁니다. 실패한 세션도 더 이상 소유 노드나
+    비활성 정리 대상으로 남겨 두지 않습니다. (세션 데이터는 그대로 두어 다시 분석할 수 있음)
+    """
+    drop_session_embeddings(session_id)
+    try:
+        release_session_records(session_id)
+    except Exception as e:
+        logger.warning(f"세션 소유/활동 기록 정리 실패 (session_id={session_id}): {e}")
+
+
+def _run_job(job_id: str):
+    db = SessionLocal()
+    started = time.perf_counter()
+    session_id = None
+    in_progress = False
+    try:
+        if not _claim_job(db, job_id):
+            return
+        JOBS_IN_PROGRESS.inc()
+        in_progress = True
+        job = db.query(DrowsinessJob).filter(DrowsinessJob.id == job_id).first()
+        session_id, student_uid, video_id = job.session_id, job.student_uid, job.video_id
+        # 분석(PPG 대기 ~ 모델 예측)은 수 분 걸리므로 읽기 트랜잭션을 끝내 커넥션을 풀에 돌려줍니다.
+        # 단계 갱신(_set_stage)과 결과 저장은 그때마다 커넥션을 다시 얻고 commit 으로 반납합니다.
+        db.commit()
+        try:
+            response = run_drowsiness_analysis(
+                db, session_id, student_uid, video_id,
+                on_stage=lambda stage: _set_stage(db, job, stage)
+            )
+            # 예측 결과(DrowsinessLevel)와 작업 상태를 한 트랜잭션으로 저장
+            with span("db_commit", session_id=session_id):
+                job.status = "succeeded"
+                job.stage = "done"
+                job.result = response.model_dump()
+                db.commit()
+        except HTTPException as e:
+            db.rollback()
+            job.status = "failed"
+            job.error_code = e.status_code
+            job.error_detail = str(e.detail)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.exception(f"졸음 분석 작업 실패 (job_id={job_id})")
+            job.status = "failed"
+            job.error_code = 500
+            job.error_detail = f"분석 작업 중 서버 오류 발생: {e}"
+            db.commit()
+        JOBS_TOTAL.inc(status=job.status)
+        JOB_DURATION.observe(time.perf_counter() - started)
+        logger.info(f"졸음 분석 작업 종료 (job_id={job_id}, status={job.status})")
+    except Exception:
+        logger.exception(f"졸음 분석 작업 상태 갱신 실패 (job_id={job_id})")
+    finally:
+        # 상태 저장(commit)이 실패해도 실행 중 작업 수는 되돌립니다.
+        if in_progress:
+            JOBS_IN_PROGRESS.dec()
+        db.close()
+        if session_id is not None:
+            _release_session(session_id)
+
+
+def resume_pending_jobs() -> int:
+    """
+    서버 시작 시 호출합니다. 이 노드에서 처리할 작업 중 대기 중(queued)인 작업과 다시 실행할 running 작업을 워커에 제출합니다.
+
+    - 세션 데이터가 다른 노드에 있는 작업은 상태를 바꾸지 않고 그 노드가 재개하도록 남겨 둡니다.
+    - 이 노드의 프로세스가 가져간 running 작업은 그 프로세스가 종료되었으면 바로 다시 실행합니다.
+      (같은 노드의 다른 워커가 실행 중이면 건드리지 않음)
+    - 가져간 프로세스를 알 수 없으면 DB 시각 기준으로 DROWSINESS_JOB_STALE_SECONDS 이상 갱신이 없을 때만 다시 실행합니다.
+    """
+    db = SessionLocal()
+    job_ids = []
+    try:
+        db_now = db.scalar(select(func.now()))
+        # updated_at(TIMESTAMP) 과 같은 기준으로 비교하도록 DB 세션 시간대의 naive 시각으로 맞춥니다.
+        stale_before = db_now.replace(tzinfo=None) - timedelta(seconds=Settings.DROWSINESS_JOB_STALE_SECONDS)
+        rows = db.query(
+            DrowsinessJob.id, DrowsinessJob.session_id, DrowsinessJob.status,
+            DrowsinessJob.claimed_by, DrowsinessJob.updated_at
+        ).filter(DrowsinessJob.status.in_(ACTIVE_STATUSES)).all()
+        db.commit()
+
+        for row in rows:
+            try:
+                if not is_local_owner(get_session_owner(row.session_id)):
+                    continue
+            except Exception as e:
+                logger.warning(f"세션 소유 노드 조회 실패로 작업 재개를 건너뜁니다 (job_id={row.id}): {e}")
+                continue
+            if row.status == "running":
+                alive = _claimant_alive(row.claimed_by)
+                if alive or (alive is None and row.updated_at is not None and row.updated_at >= stale_before):
+                    continue
+                # 조회 이후 다른 워커가 다시 가져갔으면 0행이 갱신됩니다.
+                requeued = db.query(DrowsinessJob).filter(
+                    DrowsinessJob.id == row.id,
+                    DrowsinessJob.status == "running",
+                    DrowsinessJob.claimed_by == row.claimed_by
+                ).update({"status": "queued"}, synchronize_session=False)
+                db.commit()
+                if requeued != 1:
+                    continue
+            job_ids.append(row.id)
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        _executor.submit(_run_job, job_id)
+    if job_ids:
+        logger.info(f"대기 중인 졸음 분석 작업 {len(job_ids)}건 재개")
+    return len(job_ids)
+
+
+def shutdown_job_workers(wait: bool = False):
+    # 실행 중이던 작업은 재시작 후 resume_pending_jobs() 에서 다시 처리됩니다.
+    _executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,250 @@
+import os
+from typing import Callable, Optional
+
+import numpy as np
+import torch
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.config import Settings
+from app.core.tracing import StageSpans
+from app.models.drowsiness_level import DrowsinessLevel
+from app.schemas.drowsiness import DrowsinessFinishResponse, DrowsinessPrediction
+from app.services.hrv_analyzer import compute_hrv_and_features_from_firebase, hrv_segments_to_features
+from app.services.hrv_stream import FirebaseHRVStream, pop_hrv_stream, stream_segments_for_resume
+from app.services.landmark_completion import wait_for_landmarks_closed, LandmarkCloseTimeout
+from app.services.ppg_completion import wait_for_ppg_upload, PPGUploadTimeout
+from app.utils.drowsiness_data_utils import make_shard_and_pt, merge_landmark_csvs
+from app.utils.landmark_store import landmark_file_paths
+from app.ml.data_loader import SessionSequenceDataset
+from app.ml.model_registry import get_model_registry
+from app.ml.inference import predict_segments, score_segments
+from app.ml.online_embedding import drop_session_embeddings, get_online_embedder
+from app.ml.inference_scheduler import get_inference_scheduler
+
+BASE_DIR = Settings.DROWSINESS_DATA_DIR
+
+
+def run_drowsiness_analysis(
+        db_session: Session,
+        session_id: str,
+        student_uid: str,
+        video_id: int,
+        on_stage: Optional[Callable[[str], None]] = None
+) -> DrowsinessFinishResponse:
+    """
+    졸음 탐지 세션 종료 후의 분석 파이프라인 (PPG 대기 → HRV → 랜드마크 대기 → 샤드/데이터셋 → 모델 예측).
+    예측 결과는 db_session 에 추가만 하며, commit 은 호출자가 합니다. (작업 상태와 같은 트랜잭션으로 저장)
+    실패 시 기존 엔드포인트와 같은 상태 코드의 HTTPException 을 발생시킵니다.
+    on_stage 가 주어지면 각 단계 시작 시 단계 이름으로 호출됩니다.
+    단계마다 span(실행 시간 / 입력 크기 / RSS)을 기록합니다. (app.core.tracing)
+    """
+    # 이 프로세스에서 돌던 실시간 HRV 스트림과 온라인 얼굴 임베딩 메모리 캐시는 작업이 어느 단계에서 끝나든 정리합니다.
+    stream = pop_hrv_stream(session_id)
+    try:
+        with StageSpans(session_id=session_id) as spans:
+            def stage(name: str):
+                spans.enter(name)
+                if on_stage is not None:
+                    on_stage(name)
+
+            return _run_stages(db_session, session_id, student_uid, video_id, stage, spans, stream)
+    finally:
+        if stream is not None:
+            stream.close()
+        drop_session_embeddings(session_id)
+
+
+def _run_stages(db_session: Session, session_id: str, student_uid: str, video_id: int,
+                stage: Callable[[str], None], spans: StageSpans,
+                stream: Optional[FirebaseHRVStream]) -> DrowsinessFinishResponse:
+    base_dir = BASE_DIR
+    session_dir = os.path.join(base_dir, session_id)
+
+    # --- 2. PPG 데이터 수신 완료 대기 (완료 마커 리스너, 없으면 마지막 키만 조회) ---
+    stage("ppg_wait")
+    try:
+        spans.set(reason=wait_for_ppg_upload(session_id))
+        print(f"[{session_id}] ✅ PPG 데이터 수신 완료.")
+    except PPGUploadTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PPG 데이터 수신 확인 중 오류 발생: {e}")
+
+
+    # --- 3. 웨어러블 특징(HRV) 데이터 생성 ---
+    stage("hrv")
+    try:
+        # 세션 중 실시간으로 계산된 세그먼트가 있으면 마지막 세그먼트와 MSPC-PCA 만 계산합니다.
+        # 스트림이 같은 노드의 다른 프로세스에서 돌았으면(또는 유휴로 닫혔으면) 저장된 세그먼트 뒤만 계산합니다.
+        if stream is not None:
+            df_wearable = hrv_segments_to_features(stream.finish())
+            source = "stream"
+        else:
+            resumed = stream_segments_for_resume(session_id, session_dir)
+            df_wearable = compute_hrv_and_features_from_firebase(session_id, session_dir=session_dir,
+                                                                 resume_from=resumed)
+            source = "stream_resume" if resumed else "batch"
+        spans.set(items=len(df_wearable), source=source)
+        # 분석 결과를 디버깅용으로 저장 (선택 사항)
+        os.makedirs(session_dir, exist_ok=True)
+        wearable_csv_path = os.path.join(session_dir, 'wearable_features.csv')
+        df_wearable.to_csv(wearable_csv_path, index=False)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"HRV 분석 실패: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"HRV 분석 중 서버 오류 발생: {e}")
+
+    # --- 4. 랜드마크 데이터 로드 (파일 쓰기 완료 대기 포함) ---
+    stage("landmark_wait")
+    print(f"[{session_id}] 📂 Step 4: 랜드마크 데이터 로드 시작")
+    if not os.path.isdir(session_dir):
+        raise HTTPException(status_code=404, detail="Landmark 데이터 디렉토리가 존재하지 않습니다.")
+
+    # WebSocket 이 닫히고 writer 가 세션 파일을 닫았다는 기록을 기다립니다. (최대 LANDMARK_CLOSE_TIMEOUT_SECONDS)
+    print(f"[{session_id}] ⏳ 랜드마크 저장 완료 대기 중...")
+    try:
+        landmark_reason = wait_for_landmarks_closed(session_id, session_dir)
+    except LandmarkCloseTimeout as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    landmark_files = landmark_file_paths(session_dir)
+    if not landmark_files:
+        raise HTTPException(status_code=404, detail="Landmark 데이터가 없습니다.")
+
+    spans.set(items=len(landmark_files), reason=landmark_reason)
+    # 랜드마크 파일 개수 확인 (병합은 PT 파일 생성 시 자동으로 수행됨)
+    print(f"[{session_id}] ✅ 랜드마크 데이터 확인 완료 ({landmark_reason}, 총 {len(landmark_files)}개 파일)")
+    
+    # --- 5. 데이터 검증 ---
+    print(f"[{session_id}] ✅ Step 5: 데이터 검증 완료")
+    print(f"[{session_id}] 📊 HRV 세그먼트: {len(df_wearable)}개 (2분 단위)")
+    print(f"[{session_id}] 📊 랜드마크 파일: {len(landmark_files)}개")
+    
+    # HRV 특징 차원 확인
+    num_hrv_features = len([col for col in df_wearable.columns if col != 'timestamp'])
+    print(f"[{session_id}] 📊 HRV 특징 차원: {num_hrv_features}개")
+    if num_hrv_features != 39:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"HRV 특징 차원 불일치: {num_hrv_features}개 (기대값: 39개)"
+        )
+
+    # --- 6. AI 모델 예측 수행 및 DB 저장 (1분 단위) ---
+    stage("inference")
+    print(f"[{session_id}] 🤖 Step 6: AI 모델 예측 수행 시작 (1분 단위)")
+    try:
+        # 2분 단위로 예측 수행 (HRV 데이터와 동기화)
+        # SEQ_LEN=12 shards × 150 frames/shard × (1/30) sec/frame = 60초 = 1분
+        # 2분 = 24 shards
+        SEQ_LEN = 24  # 2분에 해당하는 윈도우 개수
+        STRIDE = 24   # 2분씩 이동 (2분 = 24 shards)
+
+        # HRV 특징 행렬 (timestamp 제외한 39개 특징, 2분 단위 1:1 매칭)
+        feature_cols = [col for col in df_wearable.columns if col != 'timestamp']
+        if len(feature_cols) != 39:
+            raise ValueError(f"HRV 특징 차원 오류: {len(feature_cols)}개 (기대값: 39개)")
+        num_hrv_segments = len(df_wearable)
+
+        if Settings.ONLINE_FACE_EMBEDDING or Settings.FACE_EMBEDDING_CACHE:
+            # 세션 중 미리 계산됐거나 이전 분석에서 캐시된 윈도우 임베딩을 모으고, 빠진 윈도우만 임베딩한 뒤
+            # BiLSTM 만 수행합니다. (PT 파일/데이터셋 생성 없이 랜드마크 저장소에서 바로 윈도우를 꺼냅니다)
+            spans.enter("landmark_merge")
+            frames = merge_landmark_csvs(session_id, base_dir)
+            spans.set(items=len(frames))
+            num_windows = -(-len(frames) // 150)
+            num_landmark_2min_segments = (num_windows - SEQ_LEN) // STRIDE + 1 if num_windows >= SEQ_LEN else 0
+            if num_landmark_2min_segments == 0:
+                raise ValueError("2분 이상 시청하지 않아 분석이 불가능합니다.")
+            num_predictions = min(num_landmark_2min_segments, num_hrv_segments)
+            print(f"[{session_id}] 📈 예측 정보: HRV 세그먼트={num_hrv_segments}, 랜드마크 세그먼트={num_landmark_2min_segments} (모두 2분 단위)")
+            print(f"[{session_id}] 🎯 총 {num_predictions}개의 2분 단위 세그먼트 예측 시작 (온라인 임베딩)")
+            if num_predictions == 0:
+                raise ValueError("예측 가능한 2분 단위 세그먼트가 없습니다.")
+            hrv_matrix = df_wearable[feature_cols].to_numpy(dtype=np.float32)[:num_predictions]
+
+            spans.enter("face_embedding", items=num_predictions * SEQ_LEN)
+            embedder = get_online_embedder()
+            hF = embedder.session_embeddings(session_id, session_dir, frames,
+                                             range(0, num_predictions * STRIDE, STRIDE), SEQ_LEN)
+            spans.enter("model", items=num_predictions)
+            model, _ = get_model_registry().get()
+            all_preds = score_segments(model, hF, torch.from_numpy(hrv_matrix)).tolist()
+        else:
+            print(f"[{session_id}] 📦 샤드 파일 생성 중...")
+            spans.enter("shard_build")
+            shard_path = make_shard_and_pt(session_id, base_dir=base_dir, shard_size=150)
+            if not (shard_path and os.path.exists(shard_path)):
+                raise FileNotFoundError("샤드 파일이 생성되지 않았습니다.")
+            print(f"[{session_id}] ✅ 샤드 파일 생성 완료: {os.path.basename(shard_path)}")
+
+            print(f"[{session_id}] 📊 데이터셋 생성 중 (SEQ_LEN={SEQ_LEN}, STRIDE={STRIDE})...")
+            spans.enter("dataset")
+            dataset = SessionSequenceDataset(session_dir, seq_len=SEQ_LEN, stride=STRIDE)
+            spans.set(items=len(dataset))
+            if len(dataset) == 0:
+                raise ValueError("2분 이상 시청하지 않아 분석이 불가능합니다.")
+            print(f"[{session_id}] ✅ 데이터셋 생성 완료 (총 {len(dataset)}개 시퀀스)")
+
+            # 랜드마크 데이터로 만들 수 있는 2분 단위 예측 개수
+            num_landmark_2min_segments = len(dataset)
+
+            # 실제 예측 가능한 개수는 랜드마크 데이터와 HRV 데이터 중 작은 값
+            num_predictions = min(num_landmark_2min_segments, num_hrv_segments)
+
+            print(f"[{session_id}] 📈 예측 정보: HRV 세그먼트={num_hrv_segments}, 랜드마크 세그먼트={num_landmark_2min_segments} (모두 2분 단위)")
+            print(f"[{session_id}] 🎯 총 {num_predictions}개의 2분 단위 세그먼트 예측 시작")
+
+            if num_predictions == 0:
+                raise ValueError("예측 가능한 2분 단위 세그먼트가 없습니다.")
+            hrv_matrix = df_wearable[feature_cols].to_numpy(dtype=np.float32)[:num_predictions]
+
+            spans.enter("model", items=num_predictions)
+            # 모든 세그먼트를 배치로 묶어 추론. 스케줄러가 떠 있으면 다른 세션의 세그먼트와 함께 배치되고,
+            # 아니면(스크립트 실행 등) 이 요청 안에서 마이크로배치로 추론합니다.
+            scheduler = get_inference_scheduler()
+            if scheduler.running:
+                all_preds = scheduler.predict_segments_threadsafe(lambda i: dataset[i][0], hrv_matrix)
+            else:
+                model, edge_index = get_model_registry().get()
+                all_preds = predict_segments(model, edge_index, lambda i: dataset[i][0], hrv_matrix)
+        for idx, drowsiness_score in enumerate(all_preds):
+            print(f"[{session_id}] 📊 예측 결과 [{idx+1}/{num_predictions}] ({idx*2}~{(idx+1)*2}분): 졸음 점수 = {drowsiness_score:.4f}")
+
+        spans.enter("db_insert", items=len(all_preds))
+        # DB에 한 번에 저장 (timestamp는 0부터 시작, 2분 단위: 0 = 0~2분, 2 = 2~4분, ...)
+        db_session.bulk_insert_mappings(DrowsinessLevel, [
+            {
+                "video_id": video_id,
+                "student_uid": student_uid,
+                "timestamp": idx * 2,
+                "drowsiness_score": drowsiness_score,
+            }
+            for idx, drowsiness_score in enumerate(all_preds)
+        ])
+
+        print(f"[{session_id}] 💾 DB에 예측 결과 추가 완료 (총 {len(all_preds)}개 레코드, 작업 완료 시 commit)")
+
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"모델 예측 실패: {e}")
+
+    if not all_preds:
+        raise HTTPException(status_code=400, detail="분석 결과가 없습니다.")
+
+    print(f"[{session_id}] 🎉 졸음 탐지 분석 완료!")
+    print(f"[{session_id}] 📊 최종 결과: 총 {len(all_preds)}개 세그먼트 (2분 단위), 마지막 졸음 점수 = {all_preds[-1]:.4f}")
+    
+    prediction = DrowsinessPrediction(
+        session_id=session_id,
+        drowsiness_level=all_preds[-1],
+        confidence=1.0,
+        details={"total_segments": len(all_preds), "all_preds": all_preds}
+    )
+    return DrowsinessFinishResponse(
+        session_id=session_id,
+        prediction=prediction,
+        message=f"졸음 예측이 완료되었습니다. 총 {len(all_preds)}개의 2분 단위 세그먼트가 분석되었습니다."
+    )
@@ -4,23 +4,37 @@ import numpy as np
 from scipy.stats import chi2, f
 from sklearn.decomposition import PCA
 from sklearn.preprocessing import StandardScaler
-from firebase_admin import db
+
+from app.core import session_store
+from app.services.hrv_parallel import compute_segments
+from app.services.ppg_sync import load_ppg, records_to_columns, sync_ppg
 
 
 # PPG 신호에서 피크를 찾는 헬퍼 함수
+# 좌우 각 5샘플 구간의 최솟값보다 threshold 이상 높은 국소 최댓값을 피크로 봅니다.
+# 구간 최솟값은 양 끝을 +inf 로 채운 신호의 슬라이딩 윈도우(stride trick, 복사 없음)로 한 번에 계산합니다.
+_PEAK_WINDOW = 5
+
+
 def _find_prominent_peaks(sig, threshold=0.1, min_y=0):
-    peaks = []
-    for i in range(1, len(sig) - 1):
-        if sig[i] > sig[i - 1] and sig[i] > sig[i + 1] and sig[i] > min_y:
-            L = min(sig[max(0, i - 5):i])
-            R = min(sig[i + 1:i + 6])
-            if sig[i] - max(L, R) > threshold:
-                peaks.append(i)
-    return peaks
+    sig = np.asarray(sig, dtype=np.float64)
+    n = len(sig)
+    if n < 3:
+        return []
+    w = _PEAK_WINDOW
+    padded = np.concatenate([np.full(w, np.inf), sig, np.full(w, np.inf)])
+    window_min = np.lib.stride_tricks.sliding_window_view(padded, w).min(axis=1)
+    # window_min[k] = min(padded[k:k+w]) → 샘플 i 의 왼쪽 구간 sig[i-5:i] 는 k=i, 오른쪽 구간 sig[i+1:i+6] 는 k=i+w+1
+    i = np.arange(1, n - 1)
+    center = sig[1:-1]
+    is_peak = (center > sig[:-2]) & (center > sig[2:]) & (center > min_y)
+    base = np.maximum(window_min[i], window_min[i + w + 1])
+    is_peak &= center - base > threshold
+    return i[is_peak].tolist()
 
 
 # 메인 분석 함수 (전체 로직 포함)
-def compute_hrv_and_features_from_firebase(session_id: str, alpha=0.05, fs=25):
+def compute_hrv_and_features_from_firebase(session_id: str, alpha=0.05, fs=25, session_dir=None, resume_from=None):
     """
     Firebase에서 PPG 데이터를 가져와 HRV 특징 계산 및 이상탐지를 수행합니다.
     총 wearable feature는 39개(timestamp 컬럼 제외)를 생성합니다.
@@ -33,19 +47,46 @@ def compute_hrv_and_features_from_firebase(session_id: str, alpha=0.05, fs=25):
       - Nonlinear domain: 4개 (csi, cvi, modified_csi, sampen)
       - MSPC-PCA (N > 1일 때): 15개 (각 도메인당 T2, SPE, T2_over_ULC, SPE_over_ULC, Anomaly_Flag × 3)
     
+    resume_from 에 실시간 스트림이 이미 닫은 세그먼트가 주어지면 그 뒤 구간만 계산해 이어 붙입니다.
+
     Returns:
         pd.DataFrame: timestamp 컬럼 + 39개 HRV 특징 컬럼
     """
-    # 1) Firebase에서 PPG 데이터 불러오기
-    ppg_node = db.reference(f"{session_id}/PPG_Data").get() or {}
-    timestamps, ppg = [], []
-    for k, v in ppg_node.items():
-        if not v.get("isError", False):
-            timestamps.append(pd.to_datetime(v["timestamp"]))
-            ppg.append(v["ppgGreen"])
-
-
-
+    # 1) PPG 데이터 불러오기
+    #    session_dir 가 주어지면 새 레코드만 키 범위 조회로 로컬 저장소에 동기화한 뒤 로컬 파일에서 읽습니다.
+    if session_dir is not None:
+        sync_ppg(session_id, session_dir)
+        timestamps, ppg = load_ppg(session_dir)
+    else:
+        ppg_node = session_store.reference(f"{session_id}/PPG_Data").get() or {}
+        columns = records_to_columns(ppg_node)
+        keep = columns["is_error"] == 0
+        timestamps, ppg = columns["timestamp"][keep], columns["ppg_green"][keep]
+
+    if resume_from:
+        hrv_segments = list(resume_from) + _segments_after(resume_from[-1]["Segment Start"], timestamps, ppg, fs)
+    else:
+        hrv_segments = compute_hrv_segments(timestamps, ppg, fs=fs)
+    return hrv_segments_to_features(hrv_segments, alpha=alpha)
+
+
+def _segments_after(last_start, timestamps, ppg, fs, margin_seconds=30):
+    # 다음 세그먼트는 마지막 세그먼트 시작 + 2분 이후 첫 피크에서 시작합니다. (StreamingHRV 와 같은 경계)
+    # 정제 필터가 안정되도록 경계 앞 margin 부터 정제/피크 검출을 하고, 경계 이전 피크는 버립니다.
+    boundary = np.datetime64(last_start, "ns") + np.timedelta64(2, "m")
+    timestamps = np.asarray(timestamps, dtype="datetime64[ns]")
+    keep = timestamps >= boundary - np.timedelta64(int(margin_seconds * 1000), "ms")
+    if keep.sum() < fs * 2:
+        return []
+    return compute_hrv_segments(timestamps[keep], np.asarray(ppg)[keep], fs=fs, start_at=boundary)
+
+
+def compute_hrv_segments(timestamps, ppg, fs=25, start_at=None):
+    """
+    PPG (timestamp, ppgGreen) 를 정제/피크 검출한 뒤 2분 세그먼트별 HRV 지표
+    ({"Segment Start", "time", "freq", "nonlinear"}) 목록을 반환합니다.
+    start_at 이 주어지면 그 시각 이전의 피크는 버리고 그 뒤부터 세그먼트를 나눕니다.
+    """
     if len(ppg) < fs * 2:
         raise ValueError("PPG 데이터가 HRV 분석을 하기에 충분하지 않습니다.")
 
@@ -56,77 +97,40 @@ def compute_hrv_and_features_from_firebase(session_id: str, alpha=0.05, fs=25):
     clean = nk.ppg_clean(df["PPG"], sampling_rate=fs)
     idx = _find_prominent_peaks(clean)
     ts_peaks = df["Timestamp"].iloc[idx].values
+    if start_at is not None:
+        after = ts_peaks >= start_at
+        idx, ts_peaks = np.asarray(idx)[after], ts_peaks[after]
 
-    # 4) 2분 세그먼트마다 HRV 지표 계산
-    hrv_segments = []
+    # 4) 2분 세그먼트 경계를 정하고, 세그먼트마다 HRV 지표 계산 (세그먼트가 많으면 프로세스 풀에서 병렬 계산)
+    bounds = []  # [(시작, 끝)) 피크 위치
     i = 0
     while i < len(ts_peaks):
-        seg_start_ts = ts_peaks[i]
-        seg_end_ts = seg_start_ts + pd.Timedelta(minutes=2)
-
-        peak_indices_in_seg = []
+        seg_start = i
+        seg_end_ts = ts_peaks[i] + pd.Timedelta(minutes=2)
         while i < len(ts_peaks) and ts_peaks[i] < seg_end_ts:
-            peak_indices_in_seg.append(idx[i])
             i += 1
-
-        if len(peak_indices_in_seg) < 2:
-            continue
-
-        # --- Time-domain (16개) ---
-        rri = np.diff(df["Timestamp"].iloc[peak_indices_in_seg].values).astype('timedelta64[ms]').astype(int)
-        hr = 60000 / rri
-
-        hrv_time = nk.hrv_time(peak_indices_in_seg, sampling_rate=fs)
-        time_metrics = {
-            "mean_nni": hrv_time["HRV_MeanNN"].iloc[0],
-            "median_nni": hrv_time["HRV_MedianNN"].iloc[0],
-            "range_nni": hrv_time["HRV_MaxNN"].iloc[0] - hrv_time["HRV_MinNN"].iloc[0],
-            "sdnn": hrv_time["HRV_SDNN"].iloc[0],
-            "sdsd": hrv_time["HRV_SDSD"].iloc[0],
-            "rmssd": hrv_time["HRV_RMSSD"].iloc[0],
-            "nni_50": int(np.sum(np.abs(np.diff(rri)) > 50)),
-            "pnni_50": hrv_time["HRV_pNN50"].iloc[0],
-            "nni_20": int(np.sum(np.abs(np.diff(rri)) > 20)),
-            "pnni_20": hrv_time["HRV_pNN20"].iloc[0],
-            "cvsd": hrv_time["HRV_CVSD"].iloc[0],
-            "cvnni": hrv_time["HRV_CVNN"].iloc[0],
-            "mean_hr": np.nanmean(hr),
-            "min_hr": np.nanmin(hr),
-            "max_hr": np.nanmax(hr),
-            "std_hr": np.nanstd(hr, ddof=1),
+        if i - seg_start >= 2:
+            bounds.append((seg_start, i))
+
+    # --- Time(16) / Freq(4) / Nonlinear(4) 지표를 RR 간격 배열에서 한 번에 계산 ---
+    segment_metrics = compute_segments(np.asarray(idx, dtype=np.int64), ts_peaks, bounds, fs)
+    return [
+        {
+            "Segment Start": ts_peaks[seg_start],   # [수정] 키를 일관화 (아래 변환부에서 사용)
+            "time": features["time"],
+            "freq": features["freq"],
+            "nonlinear": features["nonlinear"]
         }
+        for (seg_start, _), features in zip(bounds, segment_metrics)
+    ]
 
-        # --- Freq-domain (4개) ---
-        hrv_freq = nk.hrv_frequency(peak_indices_in_seg, sampling_rate=fs, normalize=False)
-        if not hrv_freq.empty:
-            freq_metrics = {
-                "power_lf": hrv_freq["HRV_LF"].iloc[0],
-                "power_hf": hrv_freq["HRV_HF"].iloc[0],
-                "total_power": hrv_freq["HRV_TP"].iloc[0],
-                "lf_hf_ratio": hrv_freq["HRV_LFHF"].iloc[0]
-            }
-        else:
-            freq_metrics = {k: np.nan for k in ["power_lf", "power_hf", "total_power", "lf_hf_ratio"]}
-
-        # --- Nonlinear-domain (4개) ---
-        hrv_nl = nk.hrv_nonlinear(peak_indices_in_seg, sampling_rate=fs)
-        if not hrv_nl.empty:
-            nonlinear_metrics = {
-                "csi": float(hrv_nl["HRV_CSI"].iloc[0]),
-                "cvi": float(hrv_nl["HRV_CVI"].iloc[0]),
-                "modified_csi": float(hrv_nl["HRV_CSI_Modified"].iloc[0]),
-                "sampen": float(hrv_nl["HRV_SampEn"].iloc[0])
-            }
-        else:
-            nonlinear_metrics = {k: np.nan for k in ["csi", "cvi", "modified_csi", "sampen"]}
-
-        hrv_segments.append({
-            "Segment Start": seg_start_ts,   # [수정] 키를 일관화 (아래 변환부에서 사용)
-            "time": time_metrics,
-            "freq": freq_metrics,
-            "nonlinear": nonlinear_metrics
-        })
 
+def hrv_segments_to_features(hrv_segments, alpha=0.05):
+    """
+    세그먼트별 HRV 지표({"Segment Start", "time", "freq", "nonlinear"}) 목록을
+    timestamp + 39개 특징 DataFrame 으로 변환하고 MSPC-PCA 이상탐지 컬럼을 추가합니다.
+    (일괄 분석과 실시간 HRV 스트림이 공유)
+    """
     # 결과 리스트를 DataFrame으로 변환
     if not hrv_segments:
         raise ValueError("HRV 세그먼트를 생성할 수 없습니다.")
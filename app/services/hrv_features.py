@@ -0,0 +1,154 @@
+from typing import Dict, Tuple
+
+import numpy as np
+import scipy.interpolate
+import scipy.signal
+
+# 2분 세그먼트 하나의 HRV 지표(time 16 + freq 4 + nonlinear 4)를 RR 간격 배열에서 바로 계산합니다.
+# 기존 nk.hrv_time / nk.hrv_frequency / nk.hrv_nonlinear(기본 인자) 와 같은 정의를 따르되,
+# 사용하지 않는 지표(TINN, DFA, MSE 등)는 계산하지 않고 PSD 는 세그먼트당 한 번만 구합니다.
+
+# nk.hrv_frequency 기본값
+_INTERPOLATION_RATE = 100
+_BANDS = {
+    "ULF": (0, 0.0033),
+    "VLF": (0.0033, 0.04),
+    "LF": (0.04, 0.15),
+    "HF": (0.15, 0.4),
+    "VHF": (0.4, 0.5),
+}
+_MAX_FREQUENCY = 0.5
+
+
+def peaks_to_rri(peak_indices, fs: float) -> np.ndarray:
+    """피크 샘플 인덱스 → RR 간격(ms). (nk.hrv_* 의 입력 변환과 동일)"""
+    return np.diff(np.asarray(peak_indices)) / fs * 1000
+
+
+def time_domain_metrics(rri: np.ndarray, rri_ts: np.ndarray) -> Dict[str, float]:
+    """
+    rri    : 피크 인덱스 기반 RR 간격(ms) — nk.hrv_time 지표
+    rri_ts : 피크 timestamp 기반 RR 간격(ms, 정수) — nni_50/nni_20/심박수 지표 (기존 계산 방식 유지)
+    """
+    diff_rri = np.diff(rri)
+    mean_nn = np.nanmean(rri)
+    sdnn = np.nanstd(rri, ddof=1)
+    rmssd = np.sqrt(np.nanmean(diff_rri ** 2))
+    diff_ts = np.abs(np.diff(rri_ts))
+    hr = 60000 / rri_ts
+    return {
+        "mean_nni": mean_nn,
+        "median_nni": np.nanmedian(rri),
+        "range_nni": np.nanmax(rri) - np.nanmin(rri),
+        "sdnn": sdnn,
+        "sdsd": np.nanstd(diff_rri, ddof=1),
+        "rmssd": rmssd,
+        "nni_50": int(np.sum(diff_ts > 50)),
+        "pnni_50": np.sum(np.abs(diff_rri) > 50) / (len(diff_rri) + 1) * 100,
+        "nni_20": int(np.sum(diff_ts > 20)),
+        "pnni_20": np.sum(np.abs(diff_rri) > 20) / (len(diff_rri) + 1) * 100,
+        "cvsd": rmssd / mean_nn,
+        "cvnni": sdnn / mean_nn,
+        "mean_hr": np.nanmean(hr),
+        "min_hr": np.nanmin(hr),
+        "max_hr": np.nanmax(hr),
+        "std_hr": np.nanstd(hr, ddof=1),
+    }
+
+
+def rri_psd(rri: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    RR 간격 시계열의 PSD (frequency, power).
+    100Hz 로 2차 보간한 뒤 평균을 빼고 Hann 창 Welch (nperseg ≈ 길이/2, nfft = 2×nperseg) 로 구합니다.
+    """
+    rri_time = np.nancumsum(rri / 1000)
+    x_new = np.arange(rri_time[0], rri_time[-1] + 1 / _INTERPOLATION_RATE, 1 / _INTERPOLATION_RATE)
+    if len(rri) == 1:
+        signal = np.ones(len(x_new)) * rri[0]
+    else:
+        signal = scipy.interpolate.interp1d(rri_time, rri, kind="quadratic", bounds_error=False,
+                                            fill_value=([rri[0]], [rri[-1]]))(x_new)
+    signal = signal - np.mean(signal)
+
+    n = len(signal)
+    min_frequency = (2 * _INTERPOLATION_RATE) / (n / 2)
+    nperseg = int((2 / min_frequency) * _INTERPOLATION_RATE)
+    if nperseg > n / 2:
+        nperseg = int(n / 2)
+    frequency, power = scipy.signal.welch(signal, fs=_INTERPOLATION_RATE, scaling="density", detrend=False,
+                                          nfft=int(nperseg * 2), average="mean", nperseg=nperseg, window="hann")
+    keep = (frequency >= min_frequency) & (frequency <= _MAX_FREQUENCY)
+    return frequency[keep], power[keep]
+
+
+def frequency_domain_metrics(rri: np.ndarray) -> Dict[str, float]:
+    frequency, power = rri_psd(rri)
+    band_power = {}
+    for name, (low, high) in _BANDS.items():
+        where = (frequency >= low) & (frequency < high)
+        p = np.trapezoid(y=power[where], x=frequency[where])
+        band_power[name] = np.nan if p == 0.0 else p
+    return {
+        "power_lf": band_power["LF"],
+        "power_hf": band_power["HF"],
+        "total_power": np.nansum(list(band_power.values())),
+        "lf_hf_ratio": band_power["LF"] / band_power["HF"],
+    }
+
+
+def sample_entropy(x: np.ndarray, tolerance: float, dimension: int = 2) -> float:
+    """
+    SampEn (delay=1, Chebyshev 거리 ≤ tolerance, 자기 자신 제외).
+    세그먼트당 박동 수가 수백 개 수준이므로 KD-tree 대신 거리 행렬을 한 번 만들어 대각선 방향으로 누적합니다.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n_templates = len(x) - dimension
+    if n_templates < 1:
+        return np.nan
+    close = np.abs(x[:, None] - x[None, :]) <= tolerance
+    # match[i, j] : 길이 dimension 템플릿 i, j 가 모두 tolerance 안인지 (i, j < n_templates)
+    match = close[:n_templates, :n_templates].copy()
+    for k in range(1, dimension):
+        match &= close[k:k + n_templates, k:k + n_templates]
+    match_next = match & close[dimension:dimension + n_templates, dimension:dimension + n_templates]
+    a = match.sum() - n_templates
+    b = match_next.sum() - n_templates
+    # nk.entropy_sample 의 _phi_divide 와 같은 예외 처리
+    phi0 = a / (n_templates * (n_templates - 1)) if n_templates > 1 else np.nan
+    phi1 = b / (n_templates * (n_templates - 1)) if n_templates > 1 else np.nan
+    if np.isclose(phi0, 0):
+        return -np.inf
+    division = phi1 / phi0
+    if np.isclose(division, 0):
+        return np.inf
+    if division < 0:
+        return np.nan
+    return -np.log(division)
+
+
+def nonlinear_metrics(rri: np.ndarray) -> Dict[str, float]:
+    rri_n, rri_plus = rri[:-1], rri[1:]
+    sd1 = np.std((rri_n - rri_plus) / np.sqrt(2), ddof=1)
+    sd2 = np.std((rri_n + rri_plus) / np.sqrt(2), ddof=1)
+    T, L = 4 * sd1, 4 * sd2
+    return {
+        "csi": float(L / T),
+        "cvi": float(np.log10(L * T)),
+        "modified_csi": float(L ** 2 / T),
+        "sampen": float(sample_entropy(rri, tolerance=0.2 * np.std(rri, ddof=1))),
+    }
+
+
+def segment_features(peak_indices, peak_times, fs: float) -> Dict[str, Dict[str, float]]:
+    """
+    세그먼트의 피크 샘플 인덱스와 피크 timestamp(datetime64) 로 time/freq/nonlinear 지표를 한 번에 계산합니다.
+    반환 형식은 compute_hrv_and_features_from_firebase 의 세그먼트 dict 와 같습니다.
+    """
+    rri = peaks_to_rri(peak_indices, fs)
+    rri_ts = np.diff(np.asarray(peak_times)).astype('timedelta64[ms]').astype(int)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "time": time_domain_metrics(rri, rri_ts),
+            "freq": frequency_domain_metrics(rri),
+            "nonlinear": nonlinear_metrics(rri),
+        }
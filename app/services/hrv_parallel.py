@@ -0,0 +1,91 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import Settings
+from app.services.hrv_features import segment_features
+
+logger = logging.getLogger(__name__)
+
+# 세그먼트 수가 이보다 적으면 프로세스 간 전달 비용이 더 크므로 현재 스레드에서 계산합니다.
+_MIN_PARALLEL_SEGMENTS = 8
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def hrv_worker_count() -> int:
+    return Settings.HRV_PROCESS_WORKERS or os.cpu_count() or 1
+
+
+def get_hrv_pool() -> ProcessPoolExecutor:
+    """HRV 세그먼트 계산용 프로세스 풀 (코어 수만큼, 프로세스 전체 공유)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 서버 프로세스는 여러 스레드(job worker, torch)를 쓰므로 fork 대신 spawn 으로 띄웁니다.
+            _pool = ProcessPoolExecutor(max_workers=hrv_worker_count(),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_hrv_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _segment_worker(shm_name: str, num_peaks: int, bounds: Sequence[Tuple[int, int]],
+                    fs: float) -> List[Dict[str, Dict[str, float]]]:
+    # 공유 메모리: [0, num_peaks) 피크 샘플 인덱스, [num_peaks, 2*num_peaks) 피크 timestamp(ns)
+    # spawn 워커는 부모의 resource tracker 를 함께 쓰므로 여기서 등록을 해제하면 부모의 등록이 지워집니다.
+    # 정리(unlink)는 세그먼트를 만든 부모가 하고, 워커는 close() 만 합니다.
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # 공유 메모리 버퍼를 참조하는 배열이 남아 있으면 close() 가 실패하므로 복사본으로 계산합니다. (세그먼트 범위만)
+        data = np.ndarray((2, num_peaks), dtype=np.int64, buffer=shm.buf)
+        lo, hi = min(start for start, _ in bounds), max(end for _, end in bounds)
+        peaks, times = data[0, lo:hi].copy(), data[1, lo:hi].copy().view("datetime64[ns]")
+        del data
+    finally:
+        shm.close()
+    return [segment_features(peaks[start - lo:end - lo], times[start - lo:end - lo], fs) for start, end in bounds]
+
+
+def compute_segments(peak_indices: Sequence[int], peak_times: np.ndarray,
+                     bounds: Sequence[Tuple[int, int]], fs: float) -> List[Dict[str, Dict[str, float]]]:
+    """
+    세그먼트([start, end) 피크 구간) 별 HRV 지표를 계산해 bounds 순서대로 반환합니다.
+    세그먼트가 충분히 많으면 피크 배열을 공유 메모리에 한 번 올리고 프로세스 풀에 나눠 계산합니다.
+    """
+    workers = hrv_worker_count()
+    if workers <= 1 or len(bounds) < _MIN_PARALLEL_SEGMENTS:
+        return [segment_features(peak_indices[start:end], peak_times[start:end], fs) for start, end in bounds]
+
+    num_peaks = len(peak_indices)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, 2 * num_peaks * 8))
+    try:
+        data = np.ndarray((2, num_peaks), dtype=np.int64, buffer=shm.buf)
+        data[0] = peak_indices
+        data[1] = np.asarray(peak_times, dtype="datetime64[ns]").view(np.int64)
+        del data
+
+        pool = get_hrv_pool()
+        chunk = -(-len(bounds) // workers)
+        futures = [pool.submit(_segment_worker, shm.name, num_peaks, bounds[i:i + chunk], fs)
+                   for i in range(0, len(bounds), chunk)]
+        results: List[Dict[str, Dict[str, float]]] = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+    finally:
+        shm.close()
+        shm.unlink()
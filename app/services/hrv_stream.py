@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import neurokit2 as nk
+import numpy as np
+import pandas as pd
+
+from app.core import metrics, session_store
+from app.core.config import Settings
+from app.services.hrv_analyzer import _find_prominent_peaks
+from app.services.hrv_features import segment_features
+from app.services.ppg_sync import records_to_columns
+from app.services.session_registry import get_hrv_stream_owner, is_local_owner, register_hrv_stream_owner
+
+logger = logging.getLogger(__name__)
+
+SEGMENTS_EMITTED_TOTAL = metrics.counter(
+    "hrv_stream_segments_total", "세션 진행 중 / 종료 시 계산된 2분 HRV 세그먼트 수", ["when"])
+ACTIVE_STREAMS = metrics.gauge(
+    "hrv_stream_active_sessions", "PPG 를 실시간으로 받아 HRV 를 계산 중인 세션 수")
+IDLE_CLOSED_TOTAL = metrics.counter(
+    "hrv_stream_idle_closed_total", "HRV_STREAM_IDLE_SECONDS 동안 PPG 가 없어 닫은 실시간 HRV 스트림 수")
+
+SEGMENTS_FILE = "hrv_segments.jsonl"
+_SEGMENT = pd.Timedelta(minutes=2)
+
+
+class StreamingHRV:
+    """
+    PPG 샘플을 받는 대로 정제/피크 검출을 이어 가며, 2분 세그먼트가 닫히는 즉시 HRV 지표를 계산합니다.
+
+    - 정제(nk.ppg_clean)는 양방향 필터이므로 버퍼 끝 margin 구간의 피크는 다음 샘플이 올 때까지 확정하지 않습니다.
+    - 버퍼에는 열려 있는 세그먼트 시작 - margin 이후의 샘플만 남깁니다. (피크 인덱스는 세션 처음부터의 샘플 번호)
+    - 닫힌 세그먼트는 persist_path(jsonl)에 한 줄씩 기록합니다.
+    - 샘플은 timestamp 순서로 도착한다고 가정합니다. (확정된 구간보다 이전 샘플은 버퍼 안에서만 정렬됩니다)
+    """
+
+    def __init__(self, fs: int = 25, margin_seconds: float = 30, min_new_seconds: float = 5,
+                 persist_path: Optional[str] = None):
+        self.fs = fs
+        self.margin = int(margin_seconds * fs)
+        self.min_new = int(min_new_seconds * fs)
+        self.persist_path = persist_path
+        self.segments: List[Dict] = []
+        self.total_samples = 0
+        self._lock = threading.Lock()
+        self._ts = np.empty(0, dtype="datetime64[ns]")
+        self._ppg = np.empty(0, dtype=np.float64)
+        self._offset = 0            # 버퍼 첫 샘플의 세션 내 샘플 번호
+        self._confirmed_until = 0   # 이 샘플 번호 이전의 피크는 확정
+        self._pending = 0           # 마지막 처리 이후 들어온 샘플 수
+        self._seg_peaks: List[int] = []
+        self._seg_times: List[np.datetime64] = []
+
+    def add_samples(self, timestamps, ppg) -> List[Dict]:
+        """샘플을 추가하고, 이번에 닫힌 세그먼트 목록을 반환합니다."""
+        timestamps = np.asarray(pd.to_datetime(timestamps).values, dtype="datetime64[ns]")
+        with self._lock:
+            self._ts = np.concatenate([self._ts, timestamps])
+            self._ppg = np.concatenate([self._ppg, np.asarray(ppg, dtype=np.float64)])
+            order = np.argsort(self._ts, kind="stable")
+            self._ts, self._ppg = self._ts[order], self._ppg[order]
+            self.total_samples += len(timestamps)
+            self._pending += len(timestamps)
+            if self._pending < self.min_new:
+                return []
+            return self._process(final=False)
+
+    def finalize(self) -> List[Dict]:
+        """남은 샘플을 모두 처리하고 마지막(2분 미만) 세그먼트까지 닫은 뒤 전체 세그먼트를 반환합니다."""
+        with self._lock:
+            if self.total_samples < self.fs * 2:
+                raise ValueError("PPG 데이터가 HRV 분석을 하기에 충분하지 않습니다.")
+            self._process(final=True)
+            self._close_segment("finish")
+            return list(self.segments)
+
+    def _process(self, final: bool) -> List[Dict]:
+        self._pending = 0
+        n = len(self._ppg)
+        if n < 3:
+            return []
+        clean = nk.ppg_clean(self._ppg, sampling_rate=self.fs)
+        stable_until = n if final else n - self.margin
+        closed = []
+        for p in _find_prominent_peaks(clean):
+            absolute = self._offset + p
+            if absolute < self._confirmed_until or p >= stable_until:
+                continue
+            ts = self._ts[p]
+            if self._seg_times and ts >= self._seg_times[0] + _SEGMENT:
+                closed.extend(self._close_segment("stream"))
+            self._seg_peaks.append(absolute)
+            self._seg_times.append(ts)
+        self._confirmed_until = max(self._confirmed_until, self._offset + stable_until)
+
+        # 열린 세그먼트(또는 확정 지점) 앞쪽 margin 만 남기고 버퍼를 비웁니다.
+        keep_from = self._seg_peaks[0] if self._seg_peaks else self._confirmed_until
+        drop = min(n, max(0, keep_from - self.margin - self._offset))
+        if drop:
+            self._ts, self._ppg = self._ts[drop:], self._ppg[drop:]
+            self._offset += drop
+        return closed
+
+    def _close_segment(self, when: str) -> List[Dict]:
+        peaks, times = self._seg_peaks, self._seg_times
+        self._seg_peaks, self._seg_times = [], []
+        if len(peaks) < 2:
+            return []
+        features = segment_features(peaks, np.array(times, dtype="datetime64[ns]"), self.fs)
+        segment = {"Segment Start": times[0], **features}
+        self.segments.append(segment)
+        SEGMENTS_EMITTED_TOTAL.inc(when=when)
+        if self.persist_path:
+            _append_segment(self.persist_path, segment)
+        return [segment]
+
+
+def _append_segment(path: str, segment: Dict):
+    row = {"segment_start": str(pd.Timestamp(segment["Segment Start"])),
+           **{domain: {k: float(v) for k, v in segment[domain].items()} for domain in ("time", "freq", "nonlinear")}}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(row) + "\n")
+
+
+def load_stream_segments(session_dir: str) -> List[Dict]:
+    """스트림이 세션 디렉토리에 저장한 닫힌 세그먼트를 StreamingHRV.segments 와 같은 형식으로 읽습니다."""
+    path = os.path.join(session_dir, SEGMENTS_FILE)
+    if not os.path.exists(path):
+        return []
+    segments, seen = [], set()
+    with open(path) as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue   # 쓰는 도중 잘린 마지막 줄
+            if row["segment_start"] in seen:
+                continue
+            seen.add(row["segment_start"])
+            segments.append({"Segment Start": np.datetime64(pd.Timestamp(row["segment_start"]), "ns"),
+                             **{domain: row[domain] for domain in ("time", "freq", "nonlinear")}})
+    return segments
+
+
+def _records_to_samples(records: Dict) -> tuple:
+    columns = records_to_columns({k: records[k] for k in sorted(records)})
+    keep = columns["is_error"] == 0
+    return columns["timestamp"][keep], columns["ppg_green"][keep]
+
+
+class FirebaseHRVStream:
+    """{session_id}/PPG_Data 를 Firebase 리스너로 구독해 StreamingHRV 에 넣어 주는 세션 단위 스트림."""
+
+    def __init__(self, session_id: str, session_dir: str, fs: int = 25):
+        self.session_id = session_id
+        self.hrv = StreamingHRV(fs=fs, persist_path=os.path.join(session_dir, SEGMENTS_FILE))
+        self._ref = session_store.reference(f"{session_id}/PPG_Data")
+        self._last_key: Optional[str] = None
+        self._key_lock = threading.Lock()
+        self._registration = None
+        self.last_activity = time.monotonic()
+
+    def start(self):
+        self._registration = self._ref.listen(self._on_event)
+        ACTIVE_STREAMS.inc()
+
+    def _feed(self, records: Dict):
+        self.last_activity = time.monotonic()
+        with self._key_lock:
+            if self._last_key is not None:
+                records = {k: v for k, v in records.items() if k > self._last_key}
+            if not records:
+                return
+            self._last_key = max(records)
+            timestamps, ppg = _records_to_samples(records)
+            if len(timestamps):
+                self.hrv.add_samples(timestamps, ppg)
+
+    def _on_event(self, event):
+        try:
+            if event.data is None:
+                return
+            path = event.path.strip("/")
+            if not path:
+                self._feed(event.data)
+            elif "/" not in path:
+                self._feed({path: event.data})
+        except Exception:
+            logger.exception(f"[{self.session_id}] 실시간 HRV 처리 실패")
+
+    def finish(self) -> List[Dict]:
+        """리스너가 아직 못 받은 레코드를 키 범위 조회로 받아 반영하고, 전체 세그먼트를 반환합니다."""
+        self.close()
+        query = self._ref.order_by_key()
+        if self._last_key is not None:
+            query = query.start_at(self._last_key)
+        self._feed(query.get() or {})
+        return self.hrv.finalize()
+
+    def close(self):
+        if self._registration is not None:
+            self._registration.close()
+            self._registration = None
+            ACTIVE_STREAMS.dec()
+
+
+_streams: Dict[str, FirebaseHRVStream] = {}
+_streams_lock = threading.Lock()
+_reaper: Optional[threading.Thread] = None
+
+
+def start_hrv_stream(session_id: str, session_dir: str) -> Optional[FirebaseHRVStream]:
+    """
+    세션 시작 시 호출. 리스너를 열지 못하면 None (종료 시 일괄 분석으로 대체).
+    스트림 위치(노드/프로세스)를 기록해 두어, finish 가 다른 프로세스에서 실행돼도 저장된 세그먼트를 찾게 합니다.
+    """
+    global _reaper
+    try:
+        stream = FirebaseHRVStream(session_id, session_dir)
+        stream.start()
+    except Exception as e:
+        logger.warning(f"[{session_id}] 실시간 HRV 스트림 시작 실패, 종료 시 일괄 분석: {e}")
+        return None
+    try:
+        register_hrv_stream_owner(session_id)
+    except Exception as e:
+        logger.warning(f"[{session_id}] 실시간 HRV 스트림 위치 기록 실패: {e}")
+    with _streams_lock:
+        _streams[session_id] = stream
+        if _reaper is None or not _reaper.is_alive():
+            _reaper = threading.Thread(target=_reap_idle_streams, name="hrv-stream-reaper", daemon=True)
+            _reaper.start()
+    return stream
+
+
+def _reap_idle_streams():
+    while True:
+        time.sleep(min(60.0, Settings.HRV_STREAM_IDLE_SECONDS))
+        close_idle_hrv_streams()
+
+
+def close_idle_hrv_streams(max_idle: Optional[float] = None) -> int:
+    """
+    max_idle(기본 HRV_STREAM_IDLE_SECONDS) 초 동안 PPG 가 없던 스트림의 리스너를 닫습니다.
+    (종료되지 않고 버려진 세션, 다른 프로세스에서 종료된 세션) 닫힌 세그먼트는 파일에 남아 있습니다.
+    """
+    max_idle = Settings.HRV_STREAM_IDLE_SECONDS if max_idle is None else max_idle
+    now = time.monotonic()
+    with _streams_lock:
+        idle = [session_id for session_id, stream in _streams.items() if now - stream.last_activity >= max_idle]
+        streams = [_streams.pop(session_id) for session_id in idle]
+    for stream in streams:
+        stream.close()
+        IDLE_CLOSED_TOTAL.inc()
+        logger.info(f"[{stream.session_id}] {max_idle:.0f}초 동안 PPG 가 없어 실시간 HRV 스트림을 닫습니다.")
+    return len(streams)
+
+
+def stream_segments_for_resume(session_id: str, session_dir: str) -> List[Dict]:
+    """
+    이 프로세스에 스트림이 없을 때, 스트림이 같은 노드(또는 공유 스토리지)에서 돌았다면 저장된 세그먼트를 반환합니다.
+    스트림이 없었거나 다른 노드에서 돌았으면 빈 목록 (일괄 분석).
+    """
+    owner = get_hrv_stream_owner(session_id)
+    if not owner or not is_local_owner(owner):
+        return []
+    return load_stream_segments(session_dir)
+
+
+def pop_hrv_stream(session_id: str) -> Optional[FirebaseHRVStream]:
+    with _streams_lock:
+        return _streams.pop(session_id, None)
+
+
+def close_all_hrv_streams():
+    with _streams_lock:
+        streams = list(_streams.values())
+        _streams.clear()
+    for stream in streams:
+        stream.close()
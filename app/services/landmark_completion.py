@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from app.core import metrics
+from app.core.config import Settings
+from app.utils.landmark_store import landmark_file_paths
+
+logger = logging.getLogger(__name__)
+
+# 세션 디렉토리에 남기는 랜드마크 수신 상태 ("open" / "closed").
+# 같은 프로세스의 대기자는 threading.Event 로 바로 깨우고, 다른 프로세스/재시작 후에는 이 파일로 확인합니다.
+STATE_FILE = "landmarks_state.json"
+
+LANDMARK_WAIT_SECONDS = metrics.histogram(
+    "landmark_close_wait_seconds", "세션 종료 후 랜드마크 저장 완료를 확인하기까지 걸린 시간", ["reason"])
+
+
+class LandmarkCloseTimeout(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_open_counts: Dict[str, int] = {}
+_events: Dict[str, threading.Event] = {}
+
+
+def read_landmark_state(session_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(session_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_state(session_dir: str, state: dict):
+    path = os.path.join(session_dir, STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({**state, "pid": os.getpid(), "updated_at": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+def mark_landmarks_open(session_id: str, session_dir: str):
+    """랜드마크 WebSocket 이 열렸음을 기록합니다. (같은 세션으로 재연결하면 다시 open 상태가 됩니다)"""
+    with _lock:
+        _open_counts[session_id] = _open_counts.get(session_id, 0) + 1
+        _events.setdefault(session_id, threading.Event())
+        _write_state(session_dir, {"state": "open"})
+
+
+def mark_landmarks_closed(session_id: str, session_dir: str, frames: int):
+    """
+    랜드마크 WebSocket 의 남은 청크가 모두 기록되고 파일이 닫혔음을 알립니다.
+    writer.close_session() 이 끝난 뒤에 호출해야 합니다. 같은 세션의 다른 연결이 아직 열려 있으면 기다립니다.
+    """
+    with _lock:
+        remaining = _open_counts.get(session_id, 1) - 1
+        if remaining > 0:
+            _open_counts[session_id] = remaining
+            return
+        _open_counts.pop(session_id, None)
+        _write_state(session_dir, {"state": "closed", "frames": frames})
+        event = _events.pop(session_id, None)
+    if event is not None:
+        event.set()
+
+
+def wait_for_landmarks_closed(session_id: str, session_dir: str,
+                              timeout: Optional[float] = None,
+                              quiet_period: Optional[float] = None,
+                              poll_interval: float = 1.0) -> str:
+    """
+    랜드마크 저장이 끝날 때까지 기다립니다. 완료 판단 근거를 반환합니다.
+
+    - "closed": WebSocket 이 닫히고 writer 가 세션 파일을 닫았습니다. (같은 프로세스면 즉시 깨어남)
+    - "quiet" : 상태 파일이 없는 이전 세션은 마지막 파일 수정 후 quiet_period 가 지나면 완료로 간주합니다.
+    - "stale" : timeout 까지 open 상태지만 이 프로세스에 열린 연결이 없고 파일도 멈춰 있으면
+                (서버 재시작 등으로 닫힘을 기록하지 못한 세션) 경고를 남기고 완료로 간주합니다.
+    timeout 안에 판단하지 못하면 LandmarkCloseTimeout 을 발생시킵니다.
+    timeout / quiet_period 를 주지 않으면 호출 시점의 Settings.LANDMARK_CLOSE_TIMEOUT_SECONDS / LANDMARK_QUIET_SECONDS 를 씁니다.
+    """
+    timeout = Settings.LANDMARK_CLOSE_TIMEOUT_SECONDS if timeout is None else timeout
+    quiet_period = Settings.LANDMARK_QUIET_SECONDS if quiet_period is None else quiet_period
+    started = time.monotonic()
+    deadline = started + timeout
+    with _lock:
+        event = _events.setdefault(session_id, threading.Event())
+
+    def _files_quiet() -> bool:
+        files = landmark_file_paths(session_dir)
+        return bool(files) and time.time() - max(os.path.getmtime(f) for f in files) >= quiet_period
+
+    reason = None
+    try:
+        while reason is None:
+            state = read_landmark_state(session_dir)
+            now = time.monotonic()
+            if state is not None and state.get("state") == "closed":
+                reason = "closed"
+            elif state is None and _files_quiet():
+                reason = "quiet"
+            elif now >= deadline:
+                with _lock:
+                    open_here = session_id in _open_counts
+                if state is not None and not open_here and _files_quiet():
+                    logger.warning(f"[{session_id}] 랜드마크 연결 종료 기록이 없어 파일 상태로 완료 처리합니다. (pid={state.get('pid')})")
+                    reason = "stale"
+                else:
+                    raise LandmarkCloseTimeout(f"Landmark 데이터 저장 대기 시간({timeout:.0f}초)을 초과했습니다.")
+            elif event.wait(min(poll_interval, deadline - now)):
+                # 닫힘 알림을 받았지만 그 사이 재연결로 다시 open 이면, 이미 set 된 이벤트 대신
+                # 재연결이 만든 새 이벤트로 기다립니다. (set 된 이벤트로는 wait 가 바로 반환되어 계속 돌게 됨)
+                with _lock:
+                    event = _events.setdefault(session_id, threading.Event())
+    finally:
+        with _lock:
+            if session_id not in _open_counts and _events.get(session_id) is event:
+                del _events[session_id]
+
+    elapsed = time.monotonic() - started
+    LANDMARK_WAIT_SECONDS.observe(elapsed, reason=reason)
+    logger.info(f"[{session_id}] 랜드마크 저장 완료 확인 ({reason}, {elapsed:.1f}초)")
+    return reason
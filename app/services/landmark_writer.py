@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.core import metrics
+from app.core.config import Settings
+from app.ml.online_embedding import WINDOW_SIZE, get_online_embedder
+from app.utils.landmark_store import LandmarkStoreWriter
+
+logger = logging.getLogger(__name__)
+
+WRITE_QUEUE_DEPTH = metrics.gauge(
+    "landmark_write_queue_depth", "디스크 쓰기 대기 중인 랜드마크 청크 수")
+WRITE_LAG_SECONDS = metrics.gauge(
+    "landmark_write_lag_seconds", "세션별 마지막 청크의 큐 대기 + 쓰기 지연(초)", ["session_id"])
+WRITE_SECONDS = metrics.histogram(
+    "landmark_write_seconds", "청크 1개를 디스크에 쓰는 데 걸린 시간")
+BACKPRESSURE_TOTAL = metrics.counter(
+    "landmark_write_backpressure_total", "쓰기 큐가 가득 차 수신 루프가 대기한 횟수")
+WRITE_ERRORS_TOTAL = metrics.counter(
+    "landmark_write_errors_total", "랜드마크 쓰기 실패 횟수")
+
+# 큐가 가득 찼을 때 블로킹 put 한 번이 기다리는 최대 시간. 그 사이 writer 스레드가 죽었으면 다시 띄웁니다.
+_BACKPRESSURE_PUT_TIMEOUT = 1.0
+
+
+class LandmarkWriterService:
+    """
+    WebSocket 수신 루프 대신 전용 스레드에서 랜드마크 청크를 디스크에 쓰는 백그라운드 writer.
+
+    - 수신 루프는 append() 로 청크를 크기 제한된 큐에 넣기만 하고 디스크 I/O 를 기다리지 않습니다.
+    - 큐가 가득 차면(디스크가 느리면) 블로킹 put 을 스레드풀에서 실행하고, 해당 소켓의 수신 루프만 자리가 날 때까지
+      await 합니다. (이벤트 루프는 막지 않고, 자리가 나면 바로 깨어남)
+    - close_session() 은 그 세션의 남은 청크가 모두 기록되고 파일이 닫힐 때까지 기다립니다.
+    """
+
+    def __init__(self, max_pending_chunks: Optional[int] = None):
+        if max_pending_chunks is None:
+            max_pending_chunks = Settings.LANDMARK_WRITE_QUEUE_SIZE
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending_chunks)
+        self._writers: Dict[str, LandmarkStoreWriter] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="landmark-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """남은 청크를 모두 쓰고 writer 스레드를 종료합니다."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    async def _put(self, item):
+        self.start()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            BACKPRESSURE_TOTAL.inc()
+            await asyncio.get_running_loop().run_in_executor(None, self._put_blocking, item)
+        WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _put_blocking(self, item):
+        while True:
+            try:
+                self._queue.put(item, timeout=_BACKPRESSURE_PUT_TIMEOUT)
+                return
+            except queue.Full:
+                self.start()
+
+    async def append(self, session_id: str, session_dir: str, timestamps: np.ndarray, frames: np.ndarray):
+        await self._put(("append", session_id, session_dir, timestamps, frames, time.perf_counter()))
+
+    async def close_session(self, session_id: str):
+        """세션의 남은 청크를 모두 쓰고 파일을 닫을 때까지 기다립니다."""
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def _notify(error: Optional[BaseException]):
+            if done.done():
+                return
+            if error is not None:
+                done.set_exception(error)
+            else:
+                done.set_result(None)
+
+        await self._put(("close", session_id, lambda error: loop.call_soon_threadsafe(_notify, error)))
+        await done
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+            if item is None:
+                for writer in self._writers.values():
+                    writer.close()
+                self._writers.clear()
+                return
+            kind, session_id = item[0], item[1]
+            try:
+                if kind == "append":
+                    _, _, session_dir, timestamps, frames, enqueued_at = item
+                    started = time.perf_counter()
+                    writer = self._writers.get(session_id)
+                    if writer is None:
+                        writer = self._writers[session_id] = LandmarkStoreWriter(
+                            session_dir, dtype=Settings.LANDMARK_STORE_DTYPE)
+                    before = writer.frames_written
+                    writer.append(timestamps, frames)
+                    finished = time.perf_counter()
+                    WRITE_SECONDS.observe(finished - started)
+                    WRITE_LAG_SECONDS.set(finished - enqueued_at, session_id=session_id)
+                    if Settings.ONLINE_FACE_EMBEDDING:
+                        # 이번 청크로 다 채워진 150 프레임 윈도우의 얼굴 임베딩을 미리 계산해 둡니다.
+                        embedder = get_online_embedder()
+                        for window_idx in range(before // WINDOW_SIZE, writer.frames_written // WINDOW_SIZE):
+                            embedder.submit(session_id, session_dir, window_idx)
+                elif kind == "close":
+                    writer = self._writers.pop(session_id, None)
+                    if writer is not None:
+                        writer.close()
+                    WRITE_LAG_SECONDS.remove(session_id=session_id)
+                    _notify_closed(item[2])
+            except Exception as e:
+                WRITE_ERRORS_TOTAL.inc()
+                logger.exception(f"[{session_id}] 랜드마크 쓰기 실패")
+                if kind == "close":
+                    _notify_closed(item[2], e)
+
+
+def _notify_closed(callback, error: Optional[BaseException] = None):
+    # 기다리던 쪽의 이벤트 루프가 이미 닫혔을 수 있으므로, 알림 실패가 writer 스레드를 멈추지 않게 합니다.
+    try:
+        callback(error)
+    except RuntimeError:
+        pass
+
+
+_service: Optional[LandmarkWriterService] = None
+
+
+def get_landmark_writer() -> LandmarkWriterService:
+    global _service
+    if _service is None:
+        _service = LandmarkWriterService()
+    return _service
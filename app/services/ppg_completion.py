@@ -0,0 +1,80 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from app.core import metrics, session_store
+from app.core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+PPG_WAIT_SECONDS = metrics.histogram(
+    "ppg_upload_wait_seconds", "세션 종료 후 PPG 업로드 완료를 확인하기까지 걸린 시간", ["reason"])
+
+
+class PPGUploadTimeout(Exception):
+    pass
+
+
+def wait_for_ppg_upload(session_id: str,
+                        timeout: Optional[float] = None,
+                        quiet_period: Optional[float] = None,
+                        poll_interval: float = 1.0) -> str:
+    """
+    웨어러블의 PPG 업로드가 끝날 때까지 기다립니다. 완료 판단 근거("marker" / "quiet")를 반환합니다.
+
+    1) 웨어러블이 업로드를 마치면 {session_id}/pairing/upload_complete = true 를 기록합니다.
+       이 값을 Firebase 리스너로 구독해 기록되는 즉시 완료로 판단합니다.
+    2) 마커를 쓰지 않는 구버전 웨어러블은 PPG_Data 의 마지막 키만 조회(order_by_key + limit_to_last(1))해서
+       quiet_period 동안 새 키가 없으면 완료로 판단합니다. 세션 길이와 무관하게 조회당 레코드 1개만 전송됩니다.
+    timeout 안에 판단하지 못하면 PPGUploadTimeout 을 발생시킵니다.
+    timeout / quiet_period 를 주지 않으면 호출 시점의 Settings.PPG_UPLOAD_TIMEOUT_SECONDS / PPG_UPLOAD_QUIET_SECONDS 를 씁니다.
+    """
+    timeout = Settings.PPG_UPLOAD_TIMEOUT_SECONDS if timeout is None else timeout
+    quiet_period = Settings.PPG_UPLOAD_QUIET_SECONDS if quiet_period is None else quiet_period
+    started = time.monotonic()
+    deadline = started + timeout
+    completed = threading.Event()
+
+    marker_ref = session_store.reference(f"{session_id}/pairing/upload_complete")
+    ppg_ref = session_store.reference(f"{session_id}/PPG_Data")
+
+    def _on_marker(event):
+        if event.data:
+            completed.set()
+
+    registration = None
+    try:
+        registration = marker_ref.listen(_on_marker)
+    except Exception as e:
+        # 스트리밍 연결을 못 여는 환경이면 마커도 폴링으로 확인합니다.
+        logger.warning(f"[{session_id}] PPG 완료 마커 리스너 등록 실패, 폴링으로 대체: {e}")
+
+    reason = None
+    try:
+        last_key, last_change = None, started
+        while reason is None:
+            if completed.is_set() or (registration is None and marker_ref.get()):
+                reason = "marker"
+                break
+
+            latest = ppg_ref.order_by_key().limit_to_last(1).get() or {}
+            key = next(iter(latest), None)
+            now = time.monotonic()
+            if key != last_key:
+                last_key, last_change = key, now
+            elif key is not None and now - last_change >= quiet_period:
+                reason = "quiet"
+                break
+
+            if now >= deadline:
+                raise PPGUploadTimeout(f"PPG 데이터 수신 대기 시간({timeout:.0f}초)을 초과했습니다.")
+            completed.wait(min(poll_interval, deadline - now))
+    finally:
+        if registration is not None:
+            registration.close()
+
+    elapsed = time.monotonic() - started
+    PPG_WAIT_SECONDS.observe(elapsed, reason=reason)
+    logger.info(f"[{session_id}] PPG 업로드 완료 확인 ({reason}, {elapsed:.1f}초, 마지막 키={last_key})")
+    return reason
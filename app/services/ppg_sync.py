@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core import metrics, session_store
+
+logger = logging.getLogger(__name__)
+
+PPG_RECORDS_SYNCED_TOTAL = metrics.counter(
+    "ppg_records_synced_total", "Firebase 에서 로컬 PPG 저장소로 가져온 레코드 수")
+PPG_SYNC_SECONDS = metrics.histogram(
+    "ppg_sync_seconds", "PPG 증분 동기화 1회에 걸린 시간")
+
+# 세션별 로컬 PPG 저장소 (컬럼별 append-only 파일)
+#   ppg/timestamp.i64 : timestamp (UTC, ns)
+#   ppg/ppg_green.f64 : ppgGreen
+#   ppg/is_error.u1   : isError
+#   ppg/meta.json     : 마지막으로 가져온 Firebase 키, 레코드 수
+# meta.json 은 데이터 파일을 쓴 뒤에 갱신하므로, 중간에 끊기면 meta 의 레코드 수까지만 유효합니다.
+PPG_DIR = "ppg"
+_COLUMNS = (("timestamp", "timestamp.i64", np.int64),
+            ("ppg_green", "ppg_green.f64", np.float64),
+            ("is_error", "is_error.u1", np.uint8))
+_META_FILE = "meta.json"
+DEFAULT_PAGE_SIZE = 5000
+
+_session_locks: Dict[str, threading.Lock] = {}
+_session_locks_guard = threading.Lock()
+
+
+def _session_lock(session_dir: str) -> threading.Lock:
+    with _session_locks_guard:
+        return _session_locks.setdefault(os.path.abspath(session_dir), threading.Lock())
+
+
+def records_to_columns(records: Dict) -> Dict[str, np.ndarray]:
+    """Firebase PPG 레코드 {key: {...}} (키 순서) 를 컬럼 배열로 변환합니다. timestamp 는 한 번에 파싱합니다."""
+    values = [v for v in records.values() if isinstance(v, dict) and "timestamp" in v]
+    if not values:
+        return {"timestamp": np.empty(0, dtype="datetime64[ns]"),
+                "ppg_green": np.empty(0, dtype=np.float64),
+                "is_error": np.empty(0, dtype=np.uint8)}
+    raw = [v["timestamp"] for v in values]
+    try:
+        timestamps = pd.to_datetime(raw, utc=True)
+    except (ValueError, TypeError):
+        # 레코드마다 형식이 다른 경우 (예: 일부만 timezone 표기)
+        timestamps = pd.to_datetime(raw, utc=True, format="mixed")
+    return {
+        "timestamp": timestamps.tz_localize(None).values.astype("datetime64[ns]"),
+        "ppg_green": np.array([v.get("ppgGreen", np.nan) for v in values], dtype=np.float64),
+        "is_error": np.array([bool(v.get("isError", False)) for v in values], dtype=np.uint8),
+    }
+
+
+def _read_meta(store_dir: str) -> dict:
+    path = os.path.join(store_dir, _META_FILE)
+    if not os.path.exists(path):
+        return {"last_key": None, "count": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_meta(store_dir: str, meta: dict):
+    path = os.path.join(store_dir, _META_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, path)
+
+
+def _append_columns(store_dir: str, count: int, columns: Dict[str, np.ndarray]):
+    for name, filename, dtype in _COLUMNS:
+        path = os.path.join(store_dir, filename)
+        with open(path, "ab") as f:
+            # meta 에 기록되지 않은(중간에 끊긴) 꼬리는 잘라내고 이어 씁니다.
+            f.truncate(count * np.dtype(dtype).itemsize)
+            values = columns[name].view(np.int64) if name == "timestamp" else columns[name]
+            f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+
+def sync_ppg(session_id: str, session_dir: str, page_size: int = DEFAULT_PAGE_SIZE) -> int:
+    """
+    Firebase {session_id}/PPG_Data 의 새 레코드만 키 범위 조회(order_by_key().start_at(last_key))로 가져와
+    로컬 저장소에 이어 씁니다. 가져온 레코드 수를 반환합니다.
+    """
+    store_dir = os.path.join(session_dir, PPG_DIR)
+    ref = session_store.reference(f"{session_id}/PPG_Data")
+    started = time.perf_counter()
+    with _session_lock(session_dir):
+        os.makedirs(store_dir, exist_ok=True)
+        meta = _read_meta(store_dir)
+        fetched = 0
+        while True:
+            query = ref.order_by_key()
+            if meta["last_key"] is not None:
+                # start_at 은 마지막 키를 포함하므로 한 개 더 받아 버립니다.
+                query = query.start_at(meta["last_key"]).limit_to_first(page_size + 1)
+            else:
+                query = query.limit_to_first(page_size)
+            page = query.get() or {}
+            page = {k: v for k, v in sorted(page.items()) if meta["last_key"] is None or k > meta["last_key"]}
+            if not page:
+                break
+            columns = records_to_columns(page)
+            _append_columns(store_dir, meta["count"], columns)
+            meta = {"last_key": max(page), "count": meta["count"] + len(columns["timestamp"])}
+            _write_meta(store_dir, meta)
+            fetched += len(page)
+            if len(page) < page_size:
+                break
+    PPG_SYNC_SECONDS.observe(time.perf_counter() - started)
+    PPG_RECORDS_SYNCED_TOTAL.inc(fetched)
+    logger.info(f"[{session_id}] PPG 동기화: 새 레코드 {fetched}개 (누적 {meta['count']}개)")
+    return fetched
+
+
+def load_ppg(session_dir: str, include_errors: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """로컬 저장소의 (timestamp[datetime64[ns]], ppgGreen) 를 키 순서대로 반환합니다. 기본은 isError 레코드 제외."""
+    store_dir = os.path.join(session_dir, PPG_DIR)
+    count = _read_meta(store_dir)["count"]
+    columns = {}
+    for name, filename, dtype in _COLUMNS:
+        path = os.path.join(store_dir, filename)
+        columns[name] = np.fromfile(path, dtype=dtype, count=count) if count else np.empty(0, dtype=dtype)
+    timestamps = columns["timestamp"].view("datetime64[ns]")
+    if include_errors:
+        return timestamps, columns["ppg_green"]
+    keep = columns["is_error"] == 0
+    return timestamps[keep], columns["ppg_green"][keep]
+
+
+def has_local_ppg(session_dir: Optional[str]) -> bool:
+    return bool(session_dir) and os.path.exists(os.path.join(session_dir, PPG_DIR, _META_FILE))
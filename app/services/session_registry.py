@@ -0,0 +1,95 @@
+import logging
+import os
+import time
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+from app.core import metrics, session_store
+from app.core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# 세션 → 소유 노드 레지스트리.
+# 랜드마크 WebSocket 을 받은 노드가 세션 데이터를 로컬 디스크에 쓰므로, 그 노드를 세션 저장소
+# (Firebase RTDB / sqlite — 여러 워커·노드가 함께 보는 곳)의 session_owners/{session_id} 에 기록합니다.
+# finish 가 다른 노드에 도착하면 소유 노드로 전달하고, 공유 스토리지를 쓰면(SHARED_SESSION_DATA) 그대로 처리합니다.
+OWNERS_PATH = "session_owners"
+# 세션 시작(start)을 처리한 프로세스에서 도는 실시간 HRV 스트림의 위치. finish 가 다른 프로세스에서 실행되면
+# 같은 노드(또는 공유 스토리지)일 때 스트림이 저장한 세그먼트에서 이어 계산합니다.
+HRV_STREAM_OWNERS_PATH = "hrv_stream_owners"
+# 세션 활동 기록 {last_key, updated_at}. 연동 후 PPG 업로드가 멈춘 채 종료되지 않은 세션을 정리하는 데 씁니다. (auth_code_service)
+ACTIVITY_PATH = "session_activity"
+# 전달받은 요청에 붙는 헤더. 소유 노드가 다시 전달하지 않도록 합니다.
+FORWARDED_HEADER = "X-Session-Owner-Forwarded"
+
+FORWARDS_TOTAL = metrics.counter(
+    "session_owner_forwards_total", "세션 소유 노드로 전달한 요청 수", ["result"])
+
+
+def _owner_record() -> dict:
+    return {
+        "node_id": Settings.NODE_ID,
+        "url": Settings.NODE_URL,
+        "pid": os.getpid(),
+        "data_dir": Settings.DROWSINESS_DATA_DIR,
+        "updated_at": time.time(),
+    }
+
+
+def register_session_owner(session_id: str):
+    """이 노드를 세션 소유 노드로 기록합니다. (같은 세션으로 다른 노드에 재연결하면 그 노드로 바뀝니다)"""
+    session_store.reference(f"{OWNERS_PATH}/{session_id}").set(_owner_record())
+
+
+def get_session_owner(session_id: str) -> Optional[dict]:
+    return session_store.reference(f"{OWNERS_PATH}/{session_id}").get()
+
+
+def register_hrv_stream_owner(session_id: str):
+    session_store.reference(f"{HRV_STREAM_OWNERS_PATH}/{session_id}").set(_owner_record())
+
+
+def get_hrv_stream_owner(session_id: str) -> Optional[dict]:
+    return session_store.reference(f"{HRV_STREAM_OWNERS_PATH}/{session_id}").get()
+
+
+def release_session_records(session_id: str, delete_data: bool = False):
+    """
+    분석이 끝났거나 정리된 세션의 소유/활동 기록을 한 번의 다중 경로 update 로 지웁니다.
+    delete_data 면 세션 데이터({session_id}: pairing, PPG_Data)도 함께 지웁니다.
+    """
+    paths = {f"{path}/{session_id}": None for path in (OWNERS_PATH, HRV_STREAM_OWNERS_PATH, ACTIVITY_PATH)}
+    if delete_data:
+        paths[session_id] = None
+    session_store.reference().update(paths)
+
+
+def is_local_owner(owner: Optional[dict]) -> bool:
+    """
+    세션 데이터를 이 노드에서 읽을 수 있는지 확인합니다.
+    소유 노드 기록이 없는 세션(랜드마크 연결 전이거나 이전 세션)은 로컬로 간주합니다.
+    """
+    return Settings.SHARED_SESSION_DATA or not owner or owner.get("node_id") == Settings.NODE_ID
+
+
+def forward_to_owner(owner: dict, path: str, payload: dict, authorization: Optional[str] = None) -> httpx.Response:
+    """요청을 세션 소유 노드의 같은 경로로 전달하고 응답을 그대로 돌려줍니다."""
+    node_id, url = owner.get("node_id"), owner.get("url")
+    if not url:
+        FORWARDS_TOTAL.inc(result="no_url")
+        raise HTTPException(status_code=503, detail=f"세션 소유 노드({node_id})의 주소가 등록되어 있지 않습니다.")
+
+    headers = {FORWARDED_HEADER: Settings.NODE_ID}
+    if authorization:
+        headers["Authorization"] = authorization
+    try:
+        response = httpx.post(f"{url.rstrip('/')}{path}", json=payload, headers=headers,
+                              timeout=Settings.SESSION_FORWARD_TIMEOUT_SECONDS)
+    except httpx.HTTPError as e:
+        FORWARDS_TOTAL.inc(result="error")
+        logger.warning(f"세션 소유 노드({node_id}, {url})로 요청 전달 실패: {e}")
+        raise HTTPException(status_code=502, detail=f"세션 소유 노드({node_id})로 요청을 전달하지 못했습니다: {e}")
+    FORWARDS_TOTAL.inc(result="ok")
+    return response
@@ -0,0 +1,105 @@
+import struct
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+NUM_LANDMARKS = 478
+NUM_COORDS = 3
+
+# 바이너리 프레임 형식 (little-endian)
+#   헤더 16 bytes: timestamp(float64, 첫 프레임, ms) | frame_interval(float32, ms) | frame_count(uint16) | dtype(uint8) | version(uint8)
+#   본문        : frame_count × 478 × 3 개의 float32(dtype=0) 또는 float16(dtype=1) 좌표
+# 메시지 하나에 여러 프레임을 담을 수 있고, i번째 프레임의 timestamp 는 timestamp + i × frame_interval 입니다.
+BINARY_HEADER = struct.Struct("<dfHBB")
+BINARY_VERSION = 1
+BINARY_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2")}
+
+# WebSocket 서브프로토콜 협상용 이름. 바이너리를 제안하지 않는 클라이언트는 기존 JSON 텍스트 프레임을 그대로 사용합니다.
+SUBPROTOCOL_BINARY = "landmarks.binary.v1"
+SUBPROTOCOL_JSON = "landmarks.json.v1"
+
+
+class LandmarkFrameError(ValueError):
+    pass
+
+
+def encode_binary_frames(timestamp_ms: float, frames: np.ndarray, frame_interval_ms: float = 0.0,
+                         dtype: int = 0) -> bytes:
+    """[n, 478, 3] 랜드마크를 바이너리 메시지로 인코딩합니다. (클라이언트/테스트/리플레이용)"""
+    frames = np.asarray(frames).reshape(-1, NUM_LANDMARKS, NUM_COORDS)
+    header = BINARY_HEADER.pack(timestamp_ms, frame_interval_ms, frames.shape[0], dtype, BINARY_VERSION)
+    return header + frames.astype(BINARY_DTYPES[dtype], copy=False).tobytes()
+
+
+def decode_binary_frames(payload: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    바이너리 메시지를 (timestamps[n] float64, frames[n, 478, 3]) 로 해석합니다.
+    frames 는 payload 위의 읽기 전용 뷰(복사 없음)이며, dtype 은 전송된 그대로(float32/float16)입니다.
+    """
+    if len(payload) < BINARY_HEADER.size:
+        raise LandmarkFrameError(f"헤더 길이 부족: {len(payload)} bytes")
+    timestamp, interval, count, dtype_code, version = BINARY_HEADER.unpack_from(payload)
+    if version != BINARY_VERSION:
+        raise LandmarkFrameError(f"지원하지 않는 바이너리 버전: {version}")
+    dtype = BINARY_DTYPES.get(dtype_code)
+    if dtype is None:
+        raise LandmarkFrameError(f"지원하지 않는 dtype 코드: {dtype_code}")
+    expected = BINARY_HEADER.size + count * NUM_LANDMARKS * NUM_COORDS * dtype.itemsize
+    if len(payload) != expected:
+        raise LandmarkFrameError(f"본문 길이 불일치: {len(payload)} bytes (기대값: {expected})")
+    frames = np.frombuffer(payload, dtype=dtype, offset=BINARY_HEADER.size).reshape(count, NUM_LANDMARKS, NUM_COORDS)
+    timestamps = timestamp + np.arange(count, dtype=np.float64) * interval
+    return timestamps, frames
+
+
+def parse_timestamp_ms(value) -> float:
+    """JSON 프레임의 timestamp(epoch ms 숫자 또는 ISO 문자열)를 epoch ms(float)로 변환합니다."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return pd.Timestamp(value).value / 1e6
+
+
+def decode_json_frame(msg: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """기존 JSON 텍스트 프레임 {"timestamp": ..., "frame": [[x, y, z], ...]} 을 바이너리와 같은 형태로 변환합니다."""
+    frame = np.asarray(msg["frame"], dtype=np.float32)
+    if frame.shape != (NUM_LANDMARKS, NUM_COORDS):
+        raise LandmarkFrameError(f"랜드마크 shape 불일치: {frame.shape}")
+    return np.array([parse_timestamp_ms(msg["timestamp"])], dtype=np.float64), frame[np.newaxis]
+
+
+class LandmarkRingBuffer:
+    """
+    수신한 프레임을 미리 할당된 float32 링 버퍼에 바로 복사해 두고, chunk 단위로 꺼내 쓰는 버퍼.
+    프레임마다 Python 리스트를 만들지 않으므로 수신 경로의 할당/복사가 한 번으로 줄어듭니다.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.frames = np.empty((capacity, NUM_LANDMARKS, NUM_COORDS), dtype=np.float32)
+        self.timestamps = np.empty(capacity, dtype=np.float64)
+        self._start = 0
+        self.count = 0
+
+    def append(self, timestamps: np.ndarray, frames: np.ndarray) -> int:
+        """남은 공간만큼 프레임을 복사해 넣고, 실제로 넣은 프레임 수를 반환합니다."""
+        n = min(len(timestamps), self.capacity - self.count)
+        written = 0
+        while written < n:
+            pos = (self._start + self.count) % self.capacity
+            step = min(n - written, self.capacity - pos)
+            self.frames[pos:pos + step] = frames[written:written + step]
+            self.timestamps[pos:pos + step] = timestamps[written:written + step]
+            self.count += step
+            written += step
+        return n
+
+    def pop(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """앞에서부터 n개(기본: 전부) 프레임을 꺼내 (timestamps, frames) 복사본으로 반환합니다."""
+        n = self.count if n is None else min(n, self.count)
+        idx = (self._start + np.arange(n)) % self.capacity
+        timestamps, frames = self.timestamps[idx], self.frames[idx]
+        self._start = (self._start + n) % self.capacity
+        self.count -= n
+        return timestamps, frames
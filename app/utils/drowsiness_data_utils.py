@@ -1,10 +1,20 @@
-import glob, os
+import glob, json, os
 import numpy as np
 import pandas as pd
 import torch
 
+from app.utils.landmark_store import has_landmark_store, open_landmark_store
+
 def merge_landmark_csvs(session_id: str, base_dir: str):
     session_dir = os.path.join(base_dir, session_id)
+    # 바이너리 랜드마크 저장소가 있으면 memmap 으로 복사 없이 반환
+    if has_landmark_store(session_dir):
+        _, frames = open_landmark_store(session_dir)
+        if len(frames) == 0:
+            raise ValueError(f"No landmark frames found for session {session_id}")
+        return frames
+
+    # 이전 형식(landmarks_*.csv) 세션
     csv_files = sorted(glob.glob(os.path.join(session_dir, 'landmarks_*.csv')))
     all_frames = []
     for csv_file in csv_files:
@@ -17,26 +27,71 @@ def merge_landmark_csvs(session_id: str, base_dir: str):
         raise ValueError(f"No landmark CSVs found for session {session_id}")
     return np.concatenate(all_frames, axis=0)
 
+def landmark_window(frames: np.ndarray, window_idx: int, shard_size: int = 150) -> np.ndarray:
+    """frames 에서 window_idx 번째 윈도우([shard_size, 478, 3], float32)를 꺼냅니다. 모자란 프레임은 make_shard_and_pt 와 같이 0으로 채웁니다."""
+    chunk = np.asarray(frames[window_idx * shard_size:(window_idx + 1) * shard_size], dtype=np.float32)
+    if chunk.shape[0] < shard_size:
+        pad = np.zeros((shard_size - chunk.shape[0],) + chunk.shape[1:], dtype=np.float32)
+        chunk = np.concatenate([chunk, pad], axis=0)
+    return chunk
+
+# 세션 샤드 형식 (make_shard_and_pt)
+#   {session_id}_shards.f32  : [윈도우, shard_size, 478, 3] float32 를 이어 붙인 파일 (마지막 윈도우는 0 패딩)
+#   {session_id}_shards.idx  : 윈도우별 시작 위치(원소 단위, int64) 인덱스
+#   {session_id}_shards.json : shape 정보. 데이터/인덱스를 다 쓴 뒤 마지막에 기록합니다.
+# 읽을 때는 np.memmap 위의 torch.from_numpy 뷰로 열어 세션 전체를 메모리에 올리지 않습니다.
+SHARD_DATA_SUFFIX = "_shards.f32"
+SHARD_INDEX_SUFFIX = "_shards.idx"
+SHARD_META_SUFFIX = "_shards.json"
+SHARD_VERSION = 1
+
+
 def make_shard_and_pt(session_id: str, base_dir: str = "drowsiness_data", shard_size: int = 150):
+    """
+    세션 랜드마크를 shard_size 프레임 윈도우로 나눠 샤드 파일로 씁니다. 메타 파일 경로를 반환합니다.
+    랜드마크 저장소(memmap)에서 윈도우 하나씩 복사해 쓰므로 세션 길이와 관계없이 윈도우 하나 분량의 메모리만 씁니다.
+    """
     merged = merge_landmark_csvs(session_id, base_dir)
     session_dir = os.path.join(base_dir, session_id)
     os.makedirs(session_dir, exist_ok=True)
 
     num_frames, N, C = merged.shape
-    shards = []
-    for i in range(0, num_frames, shard_size):
-        chunk = merged[i:i + shard_size]
-        if chunk.shape[0] < shard_size:      # 마지막 조각은 Zero-padding
-            pad = np.zeros((shard_size - chunk.shape[0], N, C), dtype=chunk.dtype)
-            chunk = np.concatenate([chunk, pad], axis=0)
-
-        shards.append({
-            "face_seq": torch.tensor(chunk, dtype=torch.float32),
-            "wear_seq": torch.zeros(39, dtype=torch.float32),
-            "label"   : torch.tensor(0.,  dtype=torch.float32),
-        })
-
-    # Dataset 이 찾을 수 있도록 *_shard_0.pt 로 저장
-    pt_path = os.path.join(session_dir, f"{session_id}_shard_0.pt")
-    torch.save(shards, pt_path)
-    return pt_path
\ No newline at end of file
+    num_windows = -(-num_frames // shard_size)
+    window_elems = shard_size * N * C
+    data_path = os.path.join(session_dir, session_id + SHARD_DATA_SUFFIX)
+    with open(data_path, "wb") as f:
+        for w in range(num_windows):
+            f.write(landmark_window(merged, w, shard_size).tobytes())
+    (np.arange(num_windows, dtype=np.int64) * window_elems).tofile(
+        os.path.join(session_dir, session_id + SHARD_INDEX_SUFFIX))
+
+    meta_path = os.path.join(session_dir, session_id + SHARD_META_SUFFIX)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump({"version": SHARD_VERSION, "session_id": session_id, "num_windows": num_windows,
+                   "shard_size": shard_size, "num_landmarks": N, "num_coords": C, "dtype": "float32"}, f)
+    os.replace(meta_path + ".tmp", meta_path)
+    return meta_path
+
+
+def read_shard_meta(meta_path: str) -> dict:
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def open_shard_windows(meta_path: str) -> torch.Tensor:
+    """
+    make_shard_and_pt 로 만든 샤드를 [윈도우, shard_size, 478, 3] float32 텐서 뷰로 엽니다. (복사 없음)
+    copy-on-write memmap 이므로 뷰를 수정해도 파일은 바뀌지 않습니다.
+    """
+    meta = read_shard_meta(meta_path)
+    prefix = meta_path[:-len(SHARD_META_SUFFIX)]
+    shape = (meta["num_windows"], meta["shard_size"], meta["num_landmarks"], meta["num_coords"])
+    if meta["num_windows"] == 0:
+        return torch.empty(shape, dtype=torch.float32)
+    offsets = np.fromfile(prefix + SHARD_INDEX_SUFFIX, dtype=np.int64)
+    window_elems = shape[1] * shape[2] * shape[3]
+    # 현재 형식은 윈도우가 빈틈없이 이어져 있으므로 파일 전체를 한 배열로 봅니다.
+    if len(offsets) != shape[0] or np.any(offsets != np.arange(shape[0], dtype=np.int64) * window_elems):
+        raise ValueError(f"샤드 인덱스가 데이터와 맞지 않습니다: {prefix + SHARD_INDEX_SUFFIX}")
+    windows = np.memmap(prefix + SHARD_DATA_SUFFIX, dtype=np.float32, mode="c", shape=shape)
+    return torch.from_numpy(windows)
@@ -0,0 +1,153 @@
+import argparse
+import glob
+import json
+import os
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 세션별 랜드마크 저장 형식
+#   landmarks.bin       : [프레임, 478, 3] 좌표를 float32(또는 float16) 그대로 이어 붙인 파일 (C-order)
+#   landmarks_ts.f64    : 프레임별 timestamp(epoch ms, float64) 인덱스
+#   landmarks_meta.json : dtype / shape 정보
+# 프레임 수는 파일 크기로 계산하므로 append 만으로 유지되고, 읽을 때는 np.memmap 으로 복사 없이 엽니다.
+FRAMES_FILE = "landmarks.bin"
+TIMESTAMPS_FILE = "landmarks_ts.f64"
+META_FILE = "landmarks_meta.json"
+STORE_VERSION = 1
+NUM_LANDMARKS = 478
+NUM_COORDS = 3
+
+
+def has_landmark_store(session_dir: str) -> bool:
+    return os.path.exists(os.path.join(session_dir, META_FILE))
+
+
+def landmark_file_paths(session_dir: str) -> List[str]:
+    """세션의 랜드마크 데이터 파일 목록 (바이너리 저장소, 없으면 기존 landmarks_*.csv)."""
+    if has_landmark_store(session_dir):
+        return [os.path.join(session_dir, name) for name in (FRAMES_FILE, TIMESTAMPS_FILE)
+                if os.path.exists(os.path.join(session_dir, name))]
+    return sorted(glob.glob(os.path.join(session_dir, 'landmarks_*.csv')))
+
+
+class LandmarkStoreWriter:
+    """세션 디렉토리의 랜드마크 저장소에 프레임을 이어 씁니다."""
+
+    def __init__(self, session_dir: str, dtype: str = "float32"):
+        self.session_dir = session_dir
+        os.makedirs(session_dir, exist_ok=True)
+        meta_path = os.path.join(session_dir, META_FILE)
+        if os.path.exists(meta_path):
+            # 같은 세션으로 재접속한 경우 기존 dtype 을 그대로 이어서 사용
+            with open(meta_path) as f:
+                dtype = json.load(f)["dtype"]
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"version": STORE_VERSION, "dtype": dtype,
+                           "num_landmarks": NUM_LANDMARKS, "num_coords": NUM_COORDS}, f)
+        self.dtype = np.dtype(dtype)
+        self._frames_file = open(os.path.join(session_dir, FRAMES_FILE), "ab")
+        self._ts_file = open(os.path.join(session_dir, TIMESTAMPS_FILE), "ab")
+        # 재접속으로 이어 쓰는 경우에도 세션 처음부터의 프레임 수가 되도록 기존 프레임 수에서 시작
+        frame_bytes = self.dtype.itemsize * NUM_LANDMARKS * NUM_COORDS
+        self.frames_written = min(self._frames_file.tell() // frame_bytes, self._ts_file.tell() // 8)
+
+    def append(self, timestamps: np.ndarray, frames: np.ndarray):
+        # 좌표를 먼저 쓰고 timestamp 를 나중에 씁니다. 중간에 끊겨도 읽는 쪽은 둘 중 짧은 쪽에 맞춥니다.
+        frames = np.ascontiguousarray(frames, dtype=self.dtype).reshape(-1, NUM_LANDMARKS, NUM_COORDS)
+        self._frames_file.write(frames.tobytes())
+        self._ts_file.write(np.ascontiguousarray(timestamps, dtype=np.float64).tobytes())
+        self._frames_file.flush()
+        self._ts_file.flush()
+        self.frames_written += len(frames)
+
+    def close(self):
+        for f in (self._frames_file, self._ts_file):
+            if not f.closed:
+                os.fsync(f.fileno())
+                f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_landmark_store(session_dir: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(timestamps[n], frames[n, 478, 3]) 를 읽기 전용 memmap 으로 반환합니다. (복사 없음)"""
+    with open(os.path.join(session_dir, META_FILE)) as f:
+        meta = json.load(f)
+    dtype = np.dtype(meta["dtype"])
+    shape = (meta["num_landmarks"], meta["num_coords"])
+    frame_bytes = dtype.itemsize * shape[0] * shape[1]
+
+    frames_path = os.path.join(session_dir, FRAMES_FILE)
+    ts_path = os.path.join(session_dir, TIMESTAMPS_FILE)
+    n_frames = os.path.getsize(frames_path) // frame_bytes if os.path.exists(frames_path) else 0
+    n_ts = os.path.getsize(ts_path) // 8 if os.path.exists(ts_path) else 0
+    n = min(n_frames, n_ts)
+    if n == 0:
+        return np.empty(0, dtype=np.float64), np.empty((0,) + shape, dtype=dtype)
+    frames = np.memmap(frames_path, dtype=dtype, mode="r", shape=(n,) + shape)
+    timestamps = np.memmap(ts_path, dtype=np.float64, mode="r", shape=(n,))
+    return timestamps, frames
+
+
+def _timestamp_ms(value) -> float:
+    try:
+        return pd.Timestamp(value).value / 1e6
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _timestamps_ms(column: pd.Series) -> np.ndarray:
+    """
+    CSV timestamp 열을 epoch ms 로 변환합니다. 숫자(epoch ms)와 예전 라우트가 그대로 기록한 ISO 문자열을 모두 받으며,
+    websocket_service.parse_timestamp_ms 와 같은 값이 됩니다. (문자열마다 시간대가 다를 수 있어 행 단위로 해석)
+    """
+    timestamps = pd.to_numeric(column, errors="coerce")
+    text = timestamps.isna() & column.notna()
+    if text.any():
+        timestamps[text] = column[text].map(_timestamp_ms)
+    return timestamps.to_numpy(dtype=np.float64)
+
+
+def convert_csv_session(session_dir: str, dtype: str = "float32", remove_csv: bool = False) -> int:
+    """
+    기존 landmarks_*.csv (timestamp + 478×3 좌표) 세션을 바이너리 저장소로 변환합니다.
+    이미 저장소가 있으면 아무것도 하지 않습니다. 변환한 프레임 수를 반환합니다.
+    """
+    if has_landmark_store(session_dir):
+        return 0
+    csv_files = sorted(glob.glob(os.path.join(session_dir, 'landmarks_*.csv')))
+    if not csv_files:
+        return 0
+    total = 0
+    with LandmarkStoreWriter(session_dir, dtype=dtype) as writer:
+        for csv_file in csv_files:
+            for df in pd.read_csv(csv_file, header=None, chunksize=9000):
+                timestamps = _timestamps_ms(df.iloc[:, 0])
+                writer.append(timestamps, df.iloc[:, 1:].to_numpy(dtype=np.float32))
+                total += len(df)
+    if remove_csv:
+        for csv_file in csv_files:
+            os.remove(csv_file)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="landmarks_*.csv 세션을 바이너리 랜드마크 저장소로 변환합니다.")
+    parser.add_argument("session_dirs", nargs="+", help="세션 디렉토리 (drowsiness_data/{session_id})")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--remove-csv", action="store_true", help="변환 후 CSV 파일 삭제")
+    args = parser.parse_args()
+    for session_dir in args.session_dirs:
+        frames = convert_csv_session(session_dir, dtype=args.dtype, remove_csv=args.remove_csv)
+        print(f"{session_dir}: {frames} frames 변환")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+_find_prominent_peaks 벤치마크 (합성 PPG, 25Hz)
+
+    python -m benchmarks.bench_hrv_peaks [--repeat 3]
+
+벡터화 구현과 이전 파이썬 루프 구현의 실행 시간과 결과 일치 여부를 신호 길이별로 출력합니다.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.hrv_analyzer import _find_prominent_peaks
+
+FS = 25
+MINUTES = (1, 10, 30, 75, 150)
+
+
+def _loop_peaks(sig, threshold=0.1, min_y=0):
+    peaks = []
+    for i in range(1, len(sig) - 1):
+        if sig[i] > sig[i - 1] and sig[i] > sig[i + 1] and sig[i] > min_y:
+            L = min(sig[max(0, i - 5):i])
+            R = min(sig[i + 1:i + 6])
+            if sig[i] - max(L, R) > threshold:
+                peaks.append(i)
+    return peaks
+
+
+def synthetic_ppg(n: int, fs: int = FS, seed: int = 0) -> np.ndarray:
+    rng = np.random.RandomState(seed)
+    t = np.arange(n) / fs
+    return np.sin(2 * np.pi * 1.2 * t) + 0.3 * np.sin(2 * np.pi * 2.4 * t + 0.5) + 0.2 * rng.randn(n)
+
+
+def _best_of(fn, sig, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(sig)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'minutes':>8} {'samples':>9} {'loop(ms)':>10} {'numpy(ms)':>10} {'speedup':>8} {'same':>5}")
+    for minutes in MINUTES:
+        sig = synthetic_ppg(minutes * 60 * FS)
+        loop_s, expected = _best_of(_loop_peaks, sig, args.repeat)
+        vec_s, got = _best_of(_find_prominent_peaks, sig, args.repeat)
+        print(f"{minutes:>8} {len(sig):>9} {loop_s * 1000:>10.1f} {vec_s * 1000:>10.2f} "
+              f"{loop_s / vec_s:>7.0f}x {str(got == expected):>5}")
+
+
+if __name__ == "__main__":
+    main()
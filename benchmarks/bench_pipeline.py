@@ -0,0 +1,191 @@
+"""
+졸음 분석 종료(finish) 경로 단계별 벤치마크 (합성 세션)
+
+    python -m benchmarks.bench_pipeline [--minutes 10 30 60 90] [--landmark-format store|csv] [--output result.json]
+
+세션 길이별로 랜드마크(30fps) + PPG(25Hz) 합성 세션을 만들고, finish 경로의 단계를 따로 잽니다.
+    merge      : merge_landmark_csvs (바이너리 저장소 memmap 또는 landmarks_*.csv 병합)
+    shard_pt   : make_shard_and_pt
+    dataset    : SessionSequenceDataset 생성 (seq_len=24, stride=24)
+    hrv        : compute_hrv_segments (정제 + 피크 검출 + 2분 세그먼트 지표)
+    mspc_pca   : hrv_segments_to_features
+    forward    : predict_segments (모델 forward, 전체 세그먼트)
+단계별 실행 시간과 단계 중 최대 RSS(프로세스 전체, HRV 프로세스 풀 자식 제외)를 JSON 으로 출력합니다.
+샤드/데이터셋 단계는 랜드마크 저장소를 memmap 으로 참조하므로 세션 길이가 늘어도 메모리가 거의 늘지 않습니다.
+(peak RSS 증가분은 읽어 들인 파일 페이지로, 커널이 회수할 수 있습니다) 최대 메모리는 forward 단계의 마이크로배치 활성값이 차지합니다.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import torch
+
+from app.core.tracing import rss_bytes
+from app.ml.data_loader import SessionSequenceDataset
+from app.ml.inference import predict_segments
+from app.ml.model_registry import get_model_registry
+from app.services.hrv_analyzer import compute_hrv_segments, hrv_segments_to_features
+from app.services.hrv_parallel import hrv_worker_count, shutdown_hrv_pool
+from app.utils.drowsiness_data_utils import make_shard_and_pt, merge_landmark_csvs
+from app.utils.landmark_store import LandmarkStoreWriter, NUM_COORDS, NUM_LANDMARKS
+
+FS = 25
+LANDMARK_FPS = 30
+SHARD_SIZE = 150
+SEQ_LEN = STRIDE = 24
+CSV_FRAMES_PER_FILE = 9000
+MINUTES = (10, 30, 60, 90)
+
+
+class _StageMeter:
+    """단계 실행 시간과, 실행 중 주기적으로 잰 RSS 의 최대값을 기록합니다."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.stages = {}
+
+    def run(self, name: str, fn, *args, **kwargs):
+        rss_before = rss_bytes()
+        peak = [rss_before]
+        stop = threading.Event()
+
+        def _sample():
+            while not stop.wait(self.interval):
+                peak[0] = max(peak[0], rss_bytes())
+
+        sampler = threading.Thread(target=_sample, daemon=True)
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            stop.set()
+            sampler.join()
+        rss_after = rss_bytes()
+        self.stages[name] = {
+            "seconds": round(elapsed, 4),
+            "peak_rss_mb": round(max(peak[0], rss_after) / 2 ** 20, 1),
+            "rss_delta_mb": round((rss_after - rss_before) / 2 ** 20, 1),
+        }
+        print(f"  {name:<9} {elapsed:>9.2f}s  peak RSS {self.stages[name]['peak_rss_mb']:>8.1f} MB", file=sys.stderr)
+        return result
+
+
+def write_synthetic_session(session_dir: str, minutes: float, landmark_format: str, seed: int = 0):
+    """합성 랜드마크를 세션 디렉토리에 쓰고, 합성 PPG (timestamps, ppg) 를 반환합니다."""
+    import neurokit2 as nk
+
+    os.makedirs(session_dir, exist_ok=True)
+    rng = np.random.RandomState(seed)
+    face = rng.rand(NUM_LANDMARKS, NUM_COORDS).astype(np.float32)
+    num_frames = int(minutes * 60 * LANDMARK_FPS)
+    step = SHARD_SIZE if landmark_format == "store" else CSV_FRAMES_PER_FILE
+    writer = LandmarkStoreWriter(session_dir) if landmark_format == "store" else None
+    for i in range(0, num_frames, step):
+        n = min(step, num_frames - i)
+        frames = face + 0.01 * rng.randn(n, NUM_LANDMARKS, NUM_COORDS).astype(np.float32)
+        timestamps = (i + np.arange(n)) * 1000 / LANDMARK_FPS
+        if writer is not None:
+            writer.append(timestamps, frames)
+        else:
+            table = np.column_stack([timestamps, frames.reshape(n, -1)])
+            pd.DataFrame(table).to_csv(os.path.join(session_dir, f"landmarks_{i // step:05d}.csv"),
+                                       header=False, index=False)
+    if writer is not None:
+        writer.close()
+
+    ppg = nk.ppg_simulate(duration=int(minutes * 60), sampling_rate=FS, heart_rate=70,
+                          frequency_modulation=0.3, random_state=seed)
+    timestamps = np.datetime64("2024-01-01T00:00:00", "ns") + np.arange(len(ppg)) * np.timedelta64(1000 // FS, "ms")
+    return timestamps, ppg
+
+
+def bench_session(minutes: float, landmark_format: str, workdir: str, model, edge_index) -> dict:
+    session_id = f"bench-{minutes:g}min"
+    session_dir = os.path.join(workdir, session_id)
+    print(f"[{minutes:g}분] 합성 세션 생성 중...", file=sys.stderr)
+    ppg_timestamps, ppg = write_synthetic_session(session_dir, minutes, landmark_format)
+
+    meter = _StageMeter()
+    frames = meter.run("merge", merge_landmark_csvs, session_id, workdir)
+    num_frames = len(frames)
+    del frames
+    meter.run("shard_pt", make_shard_and_pt, session_id, base_dir=workdir, shard_size=SHARD_SIZE)
+    dataset = meter.run("dataset", SessionSequenceDataset, session_dir, seq_len=SEQ_LEN, stride=STRIDE)
+    hrv_segments = meter.run("hrv", compute_hrv_segments, ppg_timestamps, ppg, fs=FS)
+    df_wearable = meter.run("mspc_pca", hrv_segments_to_features, hrv_segments)
+
+    feature_cols = [col for col in df_wearable.columns if col != "timestamp"]
+    num_predictions = min(len(dataset), len(df_wearable))
+    hrv_matrix = df_wearable[feature_cols].to_numpy(dtype=np.float32)[:num_predictions]
+    meter.run("forward", predict_segments, model, edge_index, lambda i: dataset[i][0], hrv_matrix)
+
+    return {
+        "minutes": minutes,
+        "landmark_format": landmark_format,
+        "frames": num_frames,
+        "ppg_samples": len(ppg),
+        "hrv_segments": len(hrv_segments),
+        "predicted_segments": num_predictions,
+        "stages": meter.stages,
+        "total_seconds": round(sum(stage["seconds"] for stage in meter.stages.values()), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=list(MINUTES))
+    parser.add_argument("--landmark-format", choices=["store", "csv"], default="store",
+                        help="합성 랜드마크 형식 (store: 바이너리 저장소, csv: 이전 landmarks_*.csv)")
+    parser.add_argument("--workdir", default=None, help="합성 세션을 만들 디렉토리 (기본: 임시 디렉토리, 끝나면 삭제)")
+    parser.add_argument("--output", default="-", help="결과 JSON 경로 (기본: 표준 출력)")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_pipeline_")
+    model, edge_index = get_model_registry().get()
+    try:
+        sessions = []
+        for minutes in args.minutes:
+            sessions.append(bench_session(minutes, args.landmark_format, workdir, model, edge_index))
+            shutil.rmtree(os.path.join(workdir, f"bench-{minutes:g}min"), ignore_errors=True)
+    finally:
+        shutdown_hrv_pool()
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "benchmark": "drowsiness_finish_pipeline",
+        "created_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "hrv_workers": hrv_worker_count(),
+        },
+        "sessions": sessions,
+    }
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"결과 저장: {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+졸음 탐지 플로우 리플레이 / 부하 테스트 (Firebase 없이 로컬에서 실행)
+
+    python -m benchmarks.replay_sessions --students 4 --synthetic-minutes 4 --speed 20
+    python -m benchmarks.replay_sessions --sessions drowsiness_data/<session_id> ... --speed 1
+
+세션 저장소를 memory(또는 sqlite)로 띄운 앱을 프로세스 안에서 실행하고, 학생 N명이 동시에
+start → verify → (PPG 업로드 + 랜드마크 WebSocket 전송) → finish → 작업 완료까지 진행합니다.
+PPG/랜드마크는 녹화된 세션(ppg/ 로컬 저장소 또는 ppg_data.csv + 랜드마크 저장소) 또는 합성 데이터를
+--speed 배속(0 이면 대기 없이)으로 보내고, finish 요청부터 작업 종료까지의 시간을 학생별로 출력합니다.
+
+인증은 Bearer 토큰 값을 그대로 학생 uid 로 쓰도록 바꾸고, DB 는 --database-url(기본: ./replay.db)에 테이블을 만들어 씁니다.
+리플레이로 만든 drowsiness_data/{session_id} 디렉토리는 --keep 을 주지 않으면 끝난 뒤 지웁니다.
+"""
+import argparse
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+FS = 25
+LANDMARK_FPS = 30
+CHUNK_FRAMES = 150
+PPG_BATCH_SECONDS = 1.0
+
+
+class ReplaySession:
+    """리플레이할 세션 하나의 PPG(timestamp, 값)와 랜드마크 청크 공급자."""
+
+    def __init__(self, name: str, ppg_offsets: np.ndarray, ppg: np.ndarray):
+        self.name = name
+        self.ppg_offsets = ppg_offsets      # 세션 시작 기준 초
+        self.ppg = ppg
+
+    @property
+    def duration(self) -> float:
+        return float(self.ppg_offsets[-1]) if len(self.ppg_offsets) else 0.0
+
+    def landmark_chunks(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """(세션 시작 기준 초 offsets[n], frames[n, 478, 3]) 청크."""
+        raise NotImplementedError
+
+
+class RecordedSession(ReplaySession):
+    def __init__(self, session_dir: str):
+        from app.services.ppg_sync import has_local_ppg, load_ppg
+        from app.utils.landmark_store import has_landmark_store, open_landmark_store
+
+        if has_local_ppg(session_dir):
+            timestamps, ppg = load_ppg(session_dir)
+        elif os.path.exists(os.path.join(session_dir, "ppg_data.csv")):
+            df = pd.read_csv(os.path.join(session_dir, "ppg_data.csv"))
+            if "isError" in df:
+                df = df[~df["isError"].astype(bool)]
+            timestamps = pd.to_datetime(df["timestamp"], utc=True).dt.tz_localize(None).to_numpy()
+            ppg = df["ppgGreen"].to_numpy(dtype=np.float64)
+        else:
+            raise FileNotFoundError(f"{session_dir}: PPG 데이터(ppg/ 또는 ppg_data.csv)가 없습니다.")
+        if not has_landmark_store(session_dir):
+            raise FileNotFoundError(f"{session_dir}: 랜드마크 저장소가 없습니다. "
+                                    f"(CSV 세션은 python -m app.utils.landmark_store 로 먼저 변환)")
+        order = np.argsort(timestamps, kind="stable")
+        timestamps, ppg = timestamps[order], ppg[order]
+        offsets = (timestamps - timestamps[0]) / np.timedelta64(1, "s")
+        super().__init__(os.path.basename(os.path.normpath(session_dir)), offsets, ppg)
+        self._landmark_ts, self._frames = open_landmark_store(session_dir)
+
+    def landmark_chunks(self):
+        if not len(self._landmark_ts):
+            return
+        start = self._landmark_ts[0]
+        for i in range(0, len(self._landmark_ts), CHUNK_FRAMES):
+            yield (self._landmark_ts[i:i + CHUNK_FRAMES] - start) / 1000, self._frames[i:i + CHUNK_FRAMES]
+
+
+class SyntheticSession(ReplaySession):
+    def __init__(self, minutes: float, seed: int):
+        import neurokit2 as nk
+
+        ppg = nk.ppg_simulate(duration=int(minutes * 60), sampling_rate=FS, heart_rate=60 + seed % 20,
+                              frequency_modulation=0.3, random_state=seed)
+        super().__init__(f"synthetic-{seed}", np.arange(len(ppg)) / FS, ppg)
+        self._seed = seed
+        self._num_frames = int(minutes * 60 * LANDMARK_FPS)
+
+    def landmark_chunks(self):
+        rng = np.random.RandomState(self._seed)
+        face = rng.rand(478, 3).astype(np.float32)
+        for i in range(0, self._num_frames, CHUNK_FRAMES):
+            n = min(CHUNK_FRAMES, self._num_frames - i)
+            frames = face + 0.01 * rng.randn(n, 478, 3).astype(np.float32)
+            yield (i + np.arange(n)) / LANDMARK_FPS, frames
+
+
+def _sleep_until(t0: float, offset: float, speed: float):
+    if speed > 0:
+        delay = t0 + offset / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _upload_ppg(session_id: str, session: ReplaySession, t0: float, wall_start: pd.Timestamp, speed: float):
+    from app.core import session_store
+
+    ref = session_store.reference(f"{session_id}/PPG_Data")
+    edges = np.arange(0, session.duration + PPG_BATCH_SECONDS, PPG_BATCH_SECONDS)
+    bounds = np.searchsorted(session.ppg_offsets, edges, side="right")
+    seq = 0
+    for lo, hi, edge in zip(bounds[:-1], bounds[1:], edges[1:]):
+        if hi <= lo:
+            continue
+        _sleep_until(t0, edge, speed)
+        stamps = wall_start + pd.to_timedelta(session.ppg_offsets[lo:hi], unit="s")
+        records = {}
+        for ts, value in zip(stamps, session.ppg[lo:hi]):
+            records[f"{seq:010d}"] = {"timestamp": ts.isoformat(), "ppgGreen": float(value), "isError": False}
+            seq += 1
+        ref.update(records)
+    # 웨어러블이 업로드를 마쳤다는 마커
+    session_store.reference(f"{session_id}/pairing").update({"upload_complete": True})
+
+
+def _send_landmarks(client, session_id: str, session: ReplaySession, t0: float, wall_start_ms: float,
+                    speed: float) -> int:
+    from app.services.websocket_service import SUBPROTOCOL_BINARY, encode_binary_frames
+
+    sent = 0
+    with client.websocket_connect(f"/ws/drowsiness/landmarks/{session_id}", subprotocols=[SUBPROTOCOL_BINARY]) as ws:
+        for offsets, frames in session.landmark_chunks():
+            _sleep_until(t0, float(offsets[-1]), speed)
+            interval_ms = float(np.median(np.diff(offsets)) * 1000) if len(offsets) > 1 else 1000 / LANDMARK_FPS
+            ws.send_bytes(encode_binary_frames(wall_start_ms + offsets[0] * 1000, frames, interval_ms))
+            sent += len(frames)
+    return sent
+
+
+class StudentResult:
+    def __init__(self, student_uid: str, source: str):
+        self.student_uid = student_uid
+        self.source = source
+        self.session_id: Optional[str] = None
+        self.status = "not started"
+        self.detail = ""
+        self.replay_seconds = 0.0
+        self.finish_seconds = 0.0
+        self.segments = 0
+
+
+def _run_student(client, session: ReplaySession, video_id: int, speed: float, poll: float,
+                 result: StudentResult):
+    headers = {"Authorization": f"Bearer {result.student_uid}"}
+    prefix = "/api/v1/students/drowsiness"
+    try:
+        started = client.post(f"{prefix}/start", json={"video_id": video_id}, headers=headers)
+        started.raise_for_status()
+        session_id, auth_code = started.json()["session_id"], started.json()["auth_code"]
+        result.session_id = session_id
+        client.post(f"{prefix}/verify", json={"code": auth_code}).raise_for_status()
+
+        t0 = time.perf_counter()
+        wall_start = pd.Timestamp.now(tz="UTC")
+        uploader = threading.Thread(target=_upload_ppg, args=(session_id, session, t0, wall_start, speed))
+        uploader.start()
+        _send_landmarks(client, session_id, session, t0, wall_start.value / 1e6, speed)
+        uploader.join()
+        result.replay_seconds = time.perf_counter() - t0
+
+        finish_started = time.perf_counter()
+        finished = client.post(f"{prefix}/finish", headers=headers,
+                               json={"session_id": session_id, "student_uid": result.student_uid})
+        finished.raise_for_status()
+        job = finished.json()
+        while job["status"] in ("queued", "running"):
+            time.sleep(poll)
+            job = client.get(f"{prefix}/jobs/{job['job_id']}", headers=headers).json()
+        result.finish_seconds = time.perf_counter() - finish_started
+        result.status = job["status"]
+        if job["status"] == "succeeded":
+            result.segments = job["result"]["prediction"]["details"]["total_segments"]
+        else:
+            result.detail = f"{job.get('error_code')}: {job.get('error_detail')}"
+    except Exception as e:
+        result.status = "error"
+        result.detail = str(e)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", nargs="*", default=[], help="녹화된 세션 디렉토리 (학생들에게 순서대로 배정)")
+    parser.add_argument("--synthetic-minutes", type=float, default=4.0, help="--sessions 가 없을 때 합성 세션 길이(분)")
+    parser.add_argument("--students", type=int, default=1, help="동시에 진행할 학생 수")
+    parser.add_argument("--speed", type=float, default=1.0, help="재생 배속 (1 = 실시간, 0 = 대기 없이)")
+    parser.add_argument("--store", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--database-url", default="sqlite:///./replay.db")
+    parser.add_argument("--video-id", type=int, default=1)
+    parser.add_argument("--poll", type=float, default=0.5, help="작업 상태 조회 간격(초)")
+    parser.add_argument("--keep", action="store_true", help="리플레이로 만든 세션 디렉토리를 지우지 않음")
+    args = parser.parse_args()
+
+    # 앱 모듈이 Settings 를 읽기 전에 로컬 저장소/DB 로 고정합니다.
+    os.environ["SESSION_STORE"] = args.store
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from fastapi import Depends
+    from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+    from fastapi.testclient import TestClient
+
+    import app.models  # noqa: F401  (테이블 메타데이터 등록)
+    from app.db.base import Base
+    from app.db.session import engine
+    from app.dependencies.auth import get_current_student_uid
+    from app.main import app
+    from app.services.auth_service import get_current_student
+    from app.services.drowsiness_pipeline import BASE_DIR
+
+    Base.metadata.create_all(bind=engine)
+
+    def _uid_from_token(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())) -> str:
+        return credentials.credentials
+
+    app.dependency_overrides[get_current_student_uid] = _uid_from_token
+    app.dependency_overrides[get_current_student] = _uid_from_token
+
+    if args.sessions:
+        sources = [RecordedSession(path) for path in args.sessions]
+    else:
+        sources = [SyntheticSession(args.synthetic_minutes, seed) for seed in range(args.students)]
+    run_id = uuid.uuid4().hex[:8]
+    results = [StudentResult(f"replay-{run_id}-{i}", sources[i % len(sources)].name) for i in range(args.students)]
+
+    print(f"학생 {args.students}명, 세션 길이 최대 {max(s.duration for s in sources) / 60:.1f}분, "
+          f"배속 {args.speed or '최대'}, 저장소 {args.store}")
+    wall_started = time.perf_counter()
+    with TestClient(app) as client:
+        threads = [threading.Thread(target=_run_student,
+                                    args=(client, sources[i % len(sources)], args.video_id, args.speed, args.poll,
+                                          results[i]))
+                   for i in range(args.students)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    total = time.perf_counter() - wall_started
+
+    print(f"\n{'student':>24} {'source':>16} {'status':>10} {'replay(s)':>10} {'finish(s)':>10} {'segments':>9}")
+    for r in results:
+        print(f"{r.student_uid:>24} {r.source[:16]:>16} {r.status:>10} {r.replay_seconds:>10.1f} "
+              f"{r.finish_seconds:>10.2f} {r.segments:>9}" + (f"  {r.detail}" if r.detail else ""))
+    latencies = [r.finish_seconds for r in results if r.status == "succeeded"]
+    print(f"\n성공 {len(latencies)}/{len(results)}, finish 지연 p50={_percentile(latencies, 50):.2f}s "
+          f"p95={_percentile(latencies, 95):.2f}s max={max(latencies, default=float('nan')):.2f}s, 전체 {total:.1f}s")
+
+    if not args.keep:
+        for r in results:
+            if r.session_id:
+                shutil.rmtree(os.path.join(BASE_DIR, r.session_id), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import session_store
+from app.core.session_store import MemorySessionStore
+from app.services import auth_code_service
+
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    store = MemorySessionStore()
+    monkeypatch.setattr(session_store, "_store", store)
+    return store
+
+
+def test_allocate_and_consume_once(store):
+    code = auth_code_service.allocate_auth_code("s1", ttl=60)
+    entry = store.reference(f"auth_code_index/{code}").get()
+    assert entry["session_id"] == "s1" and entry["expires_at"] > time.time()
+
+    assert auth_code_service.consume_auth_code(code) == "s1"
+    assert auth_code_service.consume_auth_code(code) is None
+    assert store.reference("auth_code_index").get() is None
+
+
+def test_allocate_skips_codes_in_use(store, monkeypatch):
+    codes = iter([123456, 123456, 654321])
+    monkeypatch.setattr(auth_code_service.secrets, "randbelow", lambda n: next(codes))
+    assert auth_code_service.allocate_auth_code("s1") == "123456"
+    assert auth_code_service.allocate_auth_code("s2") == "654321"
+
+    monkeypatch.setattr(auth_code_service.secrets, "randbelow", lambda n: 123456)
+    with pytest.raises(HTTPException) as exc:
+        auth_code_service.allocate_auth_code("s3")
+    assert exc.value.status_code == 503
+
+
+def test_expired_code_is_rejected_and_swept_with_unpaired_session(store):
+    store.reference("s1/pairing").set({"paired": False, "auth_code": "111111"})
+    store.reference("s2/pairing").set({"paired": True, "auth_code": "222222"})
+    store.reference("session_owners/s1").set({"node_id": "node-a"})
+    expired_at = time.time() - 1
+    store.reference("auth_code_index").set({
+        "111111": {"session_id": "s1", "expires_at": expired_at},
+        "222222": {"session_id": "s2", "expires_at": expired_at},
+        "333333": {"session_id": "s3", "expires_at": time.time() + 60},
+    })
+    assert auth_code_service.consume_auth_code("111111") is None
+    # 만료된 코드는 다른 세션에 다시 발급할 수 있습니다.
+    assert auth_code_service._valid_session_id(store.reference("auth_code_index/111111").get(), time.time()) is None
+
+    assert auth_code_service.sweep_expired_auth_codes(grace=0) == 2
+    assert list(store.reference("auth_code_index").get()) == ["333333"]
+    assert store.reference("s1").get() is None
+    assert store.reference("session_owners").get() is None
+    assert store.reference("s2/pairing/paired").get() is True
+
+
+def test_inactive_paired_session_is_swept_and_finished_session_keeps_data(store):
+    now = time.time()
+    store.reference("s1/pairing").set({"paired": True, "stop": False})
+    store.reference("s1/PPG_Data").set({"k1": {"ppg": 1}})
+    store.reference("s2/pairing").set({"paired": True, "stop": True})
+    store.reference("session_owners").set({"s1": {"node_id": "node-a"}, "s2": {"node_id": "node-a"}})
+    store.reference("session_activity").set({
+        "s1": auth_code_service.activity_record(now - 100),
+        "s2": auth_code_service.activity_record(now - 100),
+        "s3": auth_code_service.activity_record(now - 100),
+    })
+
+    # 마지막 활동 이후 새 PPG 가 있었으면 활동 시각만 갱신합니다. 이미 정리된 세션(s3)과
+    # 종료된 세션(s2)은 활동 기록만 지우고, 종료된 세션의 데이터는 분석 작업에 맡깁니다.
+    assert auth_code_service.sweep_inactive_sessions(now=now, ttl=60) == 0
+    assert list(store.reference("session_activity").get()) == ["s1"]
+    assert store.reference("session_activity/s1").get() == {"last_key": "k1", "updated_at": now}
+    assert store.reference("s2/pairing/stop").get() is True
+
+    # 그 뒤 ttl 동안 새 PPG 가 없으면 PPG_Data 를 포함한 세션 데이터와 기록을 지웁니다.
+    assert auth_code_service.sweep_inactive_sessions(now=now + 61, ttl=60) == 1
+    assert store.reference("s1").get() is None
+    assert list(store.reference("session_owners").get()) == ["s2"]
+    assert store.reference("session_activity").get() is None
+    assert store.reference("s2/pairing/stop").get() is True
+
+
+def test_verify_with_unknown_code_returns_404(store):
+    import asyncio
+
+    from app.api.routes.student import verify_drowsiness_from_wearable
+    from app.schemas.drowsiness import DrowsinessVerifyRequest
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(verify_drowsiness_from_wearable(DrowsinessVerifyRequest(code="000000")))
+    assert exc.value.status_code == 404
+
+
+def test_defaults_read_settings_at_call_time(store, monkeypatch):
+    monkeypatch.setattr(auth_code_service.Settings, "AUTH_CODE_TTL_SECONDS", 5)
+    monkeypatch.setattr(auth_code_service.Settings, "AUTH_CODE_SWEEP_INTERVAL_SECONDS", 0)
+    code = auth_code_service.allocate_auth_code("s1")
+    expires_at = store.reference(f"auth_code_index/{code}/expires_at").get()
+    assert expires_at <= time.time() + 5
+    assert auth_code_service.sweep_expired_auth_codes(now=expires_at) == 1
+    assert auth_code_service.AuthCodeSweeper().interval == 0
@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.db import session as db_session
+from app.db.session import InstrumentedQueuePool, create_db_engine
+
+
+def test_pool_metrics_track_in_use_wait_and_timeouts(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool,
+                              pool_size=1, max_overflow=0, pool_timeout=0.1)
+    in_use = db_session.POOL_CONNECTIONS_IN_USE.value()
+    waits = db_session.POOL_CHECKOUT_WAIT_SECONDS.count()
+    timeouts = db_session.POOL_TIMEOUTS_TOTAL.value()
+    try:
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+            assert db_session.POOL_CONNECTIONS_IN_USE.value() == in_use + 1
+            with pytest.raises(PoolTimeoutError):
+                engine.connect()
+        assert db_session.POOL_CONNECTIONS_IN_USE.value() == in_use
+        assert db_session.POOL_CHECKOUT_WAIT_SECONDS.count() == waits + 2
+        assert db_session.POOL_TIMEOUTS_TOTAL.value() == timeouts + 1
+    finally:
+        engine.dispose()
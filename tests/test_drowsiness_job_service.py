@@ -0,0 +1,158 @@
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import session_store
+from app.core.session_store import MemorySessionStore
+from app.db.base import Base
+from app.models.drowsiness_job import DrowsinessJob
+from app.services import drowsiness_job_service as jobs
+
+
+class _RecordingExecutor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args[0])
+
+
+@pytest.fixture
+def db_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(jobs, "SessionLocal", factory)
+    monkeypatch.setattr(jobs, "_executor", _RecordingExecutor())
+    monkeypatch.setattr(session_store, "_store", MemorySessionStore())
+    monkeypatch.setattr(jobs.Settings, "NODE_ID", "node-a")
+    monkeypatch.setattr(jobs.Settings, "SHARED_SESSION_DATA", False)
+    monkeypatch.setattr(jobs, "_WORKER_ID", f"node-a:{os.getpid()}:current")
+    yield factory
+    engine.dispose()
+
+
+def _add_job(factory, job_id, status="queued", claimed_by=None, updated_at=None):
+    db = factory()
+    db.add(DrowsinessJob(id=job_id, session_id=f"session-{job_id}", student_uid="u1", video_id=1,
+                         status=status, claimed_by=claimed_by, updated_at=updated_at))
+    db.commit()
+    db.close()
+
+
+def _get_job(factory, job_id):
+    db = factory()
+    try:
+        return db.query(DrowsinessJob).filter(DrowsinessJob.id == job_id).one()
+    finally:
+        db.close()
+
+
+def test_enqueue_returns_active_job_for_same_session(db_factory):
+    db = db_factory()
+    job = jobs.enqueue_drowsiness_job(db, "s1", "u1", 1)
+    assert job.status == "queued"
+    assert jobs._executor.submitted == [job.id]
+
+    assert jobs.enqueue_drowsiness_job(db, "s1", "u1", 1).id == job.id
+    assert jobs._executor.submitted == [job.id]
+    db.close()
+
+
+def test_claim_job_is_exclusive(db_factory):
+    _add_job(db_factory, "j1")
+    first, second = db_factory(), db_factory()
+    assert jobs._claim_job(first, "j1")
+    assert not jobs._claim_job(second, "j1")
+    first.close()
+    second.close()
+
+    job = _get_job(db_factory, "j1")
+    assert job.status == "running" and job.claimed_by == jobs._WORKER_ID
+
+
+@pytest.mark.parametrize("error, code", [
+    (HTTPException(status_code=404, detail="PPG 없음"), 404),
+    (RuntimeError("boom"), 500),
+])
+def test_failed_analysis_records_status_and_error_code(db_factory, monkeypatch, error, code):
+    def fail(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(jobs, "run_drowsiness_analysis", fail)
+    session_store.reference().update({"session_owners/session-j1": {"node_id": "node-a"},
+                                      "session_activity/session-j1": {"updated_at": 1}})
+    _add_job(db_factory, "j1")
+    jobs._run_job("j1")
+
+    job = _get_job(db_factory, "j1")
+    assert job.status == "failed" and job.error_code == code and job.error_detail
+    # 실패한 세션의 소유/활동 기록도 남기지 않습니다.
+    assert session_store.reference("session_owners/session-j1").get() is None
+    assert session_store.reference("session_activity/session-j1").get() is None
+
+
+def test_in_progress_gauge_is_restored_when_status_commit_fails(db_factory, monkeypatch):
+    def lost_connection():
+        raise RuntimeError("connection lost")
+
+    def fail(db, *args, on_stage):
+        # 분석 실패 뒤 상태 저장까지 실패하는 경우 (커넥션 끊김, 풀 타임아웃 등)
+        monkeypatch.setattr(db, "commit", lost_connection)
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(jobs, "run_drowsiness_analysis", fail)
+    _add_job(db_factory, "j1")
+    in_progress = jobs.JOBS_IN_PROGRESS.value()
+    jobs._run_job("j1")
+    assert jobs.JOBS_IN_PROGRESS.value() == in_progress
+
+
+def test_succeeded_job_stores_result_and_releases_owner(db_factory, monkeypatch):
+    monkeypatch.setattr(jobs, "run_drowsiness_analysis",
+                        lambda db, *args, on_stage: on_stage("model") or SimpleNamespace(model_dump=lambda: {"ok": 1}))
+    session_store.reference("session_owners/session-j1").set({"node_id": "node-a"})
+    _add_job(db_factory, "j1")
+    jobs._run_job("j1")
+
+    job = _get_job(db_factory, "j1")
+    assert job.status == "succeeded" and job.stage == "done" and job.result == {"ok": 1}
+    assert session_store.reference("session_owners/session-j1").get() is None
+
+
+def test_resume_requeues_only_this_nodes_jobs(db_factory, monkeypatch):
+    now = datetime.utcnow()
+    stale = now - timedelta(hours=1)
+    _add_job(db_factory, "queued")
+    # 이 노드에서 종료된 프로세스가 가져간 작업은 갱신 시각과 관계없이 바로 다시 실행합니다.
+    _add_job(db_factory, "dead", "running", claimed_by=f"node-a:{os.getpid()}:previous", updated_at=now)
+    # 같은 노드의 다른 워커가 실행 중인 작업은 건드리지 않습니다.
+    _add_job(db_factory, "sibling", "running", claimed_by=f"node-a:{os.getppid()}:sibling", updated_at=stale)
+    # 가져간 프로세스를 모르면 DB 시각 기준으로 멈춘 작업만 다시 실행합니다.
+    _add_job(db_factory, "legacy-fresh", "running", updated_at=now)
+    _add_job(db_factory, "legacy-stale", "running", updated_at=stale)
+    # 세션 데이터가 다른 노드에 있으면 상태를 바꾸지 않습니다.
+    _add_job(db_factory, "remote", "running", claimed_by="node-b:1:x", updated_at=stale)
+    session_store.reference("session_owners/session-remote").set({"node_id": "node-b"})
+    # 소유 노드 조회가 실패한 작업만 건너뛰고 나머지는 재개합니다.
+    _add_job(db_factory, "lookup-error")
+    original = jobs.get_session_owner
+
+    def flaky_owner(session_id):
+        if session_id == "session-lookup-error":
+            raise RuntimeError("firebase down")
+        return original(session_id)
+
+    monkeypatch.setattr(jobs, "get_session_owner", flaky_owner)
+    assert jobs.resume_pending_jobs() == 3
+
+    assert sorted(jobs._executor.submitted) == ["dead", "legacy-stale", "queued"]
+    statuses = {job_id: _get_job(db_factory, job_id).status
+                for job_id in ("dead", "sibling", "legacy-fresh", "legacy-stale", "remote", "lookup-error")}
+    assert statuses == {"dead": "queued", "sibling": "running", "legacy-fresh": "running",
+                        "legacy-stale": "queued", "remote": "running", "lookup-error": "queued"}
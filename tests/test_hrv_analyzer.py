@@ -0,0 +1,34 @@
+import numpy as np
+
+from app.services.hrv_analyzer import _find_prominent_peaks
+
+
+def _reference_peaks(sig, threshold=0.1, min_y=0):
+    # 벡터화 이전의 순수 파이썬 구현
+    peaks = []
+    for i in range(1, len(sig) - 1):
+        if sig[i] > sig[i - 1] and sig[i] > sig[i + 1] and sig[i] > min_y:
+            L = min(sig[max(0, i - 5):i])
+            R = min(sig[i + 1:i + 6])
+            if sig[i] - max(L, R) > threshold:
+                peaks.append(i)
+    return peaks
+
+
+def _synthetic_ppg(n, fs=25, seed=0):
+    rng = np.random.RandomState(seed)
+    t = np.arange(n) / fs
+    return np.sin(2 * np.pi * 1.2 * t) + 0.3 * np.sin(2 * np.pi * 2.4 * t + 0.5) + 0.2 * rng.randn(n)
+
+
+def test_find_prominent_peaks_matches_reference_loop():
+    for n in (0, 1, 2, 3, 7, 12, 250, 5000):
+        for seed in range(3):
+            sig = _synthetic_ppg(n, seed=seed)
+            for threshold, min_y in ((0.1, 0), (0.0, -1.0), (0.5, 0.2)):
+                assert _find_prominent_peaks(sig, threshold, min_y) == _reference_peaks(sig, threshold, min_y)
+
+
+def test_find_prominent_peaks_handles_plateaus_and_edges():
+    sig = np.array([0, 1, 1, 0, 2, 0, 0, 0, 0, 0, 0, 3, 0], dtype=float)
+    assert _find_prominent_peaks(sig) == _reference_peaks(sig) == [4, 11]
@@ -0,0 +1,134 @@
+import os
+import subprocess
+import sys
+import textwrap
+import warnings
+
+import neurokit2 as nk
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.hrv_analyzer import _find_prominent_peaks
+from app.services.hrv_features import sample_entropy, segment_features
+
+FS = 25
+
+
+def _neurokit_segment(peaks, peak_times, fs):
+    # 엔진 도입 전 compute_hrv_and_features_from_firebase 의 세그먼트 계산
+    rri = np.diff(peak_times).astype('timedelta64[ms]').astype(int)
+    hr = 60000 / rri
+    t = nk.hrv_time(peaks, sampling_rate=fs)
+    f = nk.hrv_frequency(peaks, sampling_rate=fs, normalize=False)
+    n = nk.hrv_nonlinear(peaks, sampling_rate=fs)
+    return {
+        "time": {
+            "mean_nni": t["HRV_MeanNN"].iloc[0],
+            "median_nni": t["HRV_MedianNN"].iloc[0],
+            "range_nni": t["HRV_MaxNN"].iloc[0] - t["HRV_MinNN"].iloc[0],
+            "sdnn": t["HRV_SDNN"].iloc[0],
+            "sdsd": t["HRV_SDSD"].iloc[0],
+            "rmssd": t["HRV_RMSSD"].iloc[0],
+            "nni_50": int(np.sum(np.abs(np.diff(rri)) > 50)),
+            "pnni_50": t["HRV_pNN50"].iloc[0],
+            "nni_20": int(np.sum(np.abs(np.diff(rri)) > 20)),
+            "pnni_20": t["HRV_pNN20"].iloc[0],
+            "cvsd": t["HRV_CVSD"].iloc[0],
+            "cvnni": t["HRV_CVNN"].iloc[0],
+            "mean_hr": np.nanmean(hr),
+            "min_hr": np.nanmin(hr),
+            "max_hr": np.nanmax(hr),
+            "std_hr": np.nanstd(hr, ddof=1),
+        },
+        "freq": {
+            "power_lf": f["HRV_LF"].iloc[0],
+            "power_hf": f["HRV_HF"].iloc[0],
+            "total_power": f["HRV_TP"].iloc[0],
+            "lf_hf_ratio": f["HRV_LFHF"].iloc[0],
+        },
+        "nonlinear": {
+            "csi": float(n["HRV_CSI"].iloc[0]),
+            "cvi": float(n["HRV_CVI"].iloc[0]),
+            "modified_csi": float(n["HRV_CSI_Modified"].iloc[0]),
+            "sampen": float(n["HRV_SampEn"].iloc[0]),
+        },
+    }
+
+
+def _fixture_segment(seed, heart_rate):
+    # 25Hz 워치 PPG 를 흉내 낸 2분 세그먼트 (timestamp 지터 포함)
+    ppg = nk.ppg_simulate(duration=120, sampling_rate=FS, heart_rate=heart_rate,
+                          frequency_modulation=0.3, random_state=seed)
+    jitter = np.random.RandomState(seed).randint(0, 3, len(ppg))
+    times = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(len(ppg)) * 40 + jitter, unit="ms")
+    peaks = _find_prominent_peaks(nk.ppg_clean(ppg, sampling_rate=FS))
+    return peaks, times.values[peaks]
+
+
+@pytest.mark.parametrize("seed,heart_rate", [(0, 58), (1, 72), (2, 95)])
+def test_segment_features_match_neurokit(seed, heart_rate):
+    peaks, peak_times = _fixture_segment(seed, heart_rate)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = _neurokit_segment(peaks, peak_times, FS)
+    got = segment_features(peaks, peak_times, FS)
+
+    for domain, metrics in expected.items():
+        assert list(got[domain]) == list(metrics)
+        for name, value in metrics.items():
+            np.testing.assert_allclose(got[domain][name], value, rtol=1e-9, err_msg=f"{domain}.{name}")
+
+
+def test_sample_entropy_matches_neurokit():
+    rng = np.random.RandomState(0)
+    for n in (10, 50, 200):
+        x = 800 + 50 * rng.randn(n)
+        tolerance = 0.2 * np.std(x, ddof=1)
+        expected, _ = nk.entropy_sample(x, delay=1, dimension=2, tolerance=tolerance)
+        np.testing.assert_allclose(sample_entropy(x, tolerance), expected, rtol=1e-12)
+
+
+def test_compute_segments_in_process_pool_matches_sequential(monkeypatch):
+    from app.core.config import Settings
+    from app.services import hrv_parallel
+
+    peaks, peak_times = [], []
+    for seed in range(10):
+        p, t = _fixture_segment(seed, 60 + seed * 3)
+        peaks.append(np.asarray(p) + seed * 3000)
+        peak_times.append(t + np.timedelta64(seed * 120, "s"))
+    sizes = np.cumsum([0] + [len(p) for p in peaks])
+    bounds = list(zip(sizes[:-1].tolist(), sizes[1:].tolist()))
+    peaks, peak_times = np.concatenate(peaks), np.concatenate(peak_times)
+
+    expected = [segment_features(peaks[s:e], peak_times[s:e], FS) for s, e in bounds]
+    monkeypatch.setattr(Settings, "HRV_PROCESS_WORKERS", 2)
+    try:
+        got = hrv_parallel.compute_segments(peaks, peak_times, bounds, FS)
+    finally:
+        hrv_parallel.shutdown_hrv_pool()
+    assert got == expected
+
+
+def test_process_pool_leaves_no_resource_tracker_errors():
+    # resource tracker 는 인터프리터 종료 시 경고/traceback 을 stderr 로 내므로 별도 프로세스로 확인합니다.
+    script = textwrap.dedent("""
+        import numpy as np
+        from app.services import hrv_parallel
+
+        if __name__ == "__main__":
+            peaks = np.cumsum(np.random.RandomState(0).randint(18, 24, size=2000))
+            times = np.datetime64("2024-01-01", "ns") + (peaks * 40).astype("timedelta64[ms]")
+            bounds = [(i, i + 200) for i in range(0, 2000, 200)]
+            for _ in range(2):
+                hrv_parallel.compute_segments(peaks, times, bounds, 25)
+            hrv_parallel.shutdown_hrv_pool()
+    """)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "HRV_PROCESS_WORKERS": "2", "PYTHONPATH": root}
+    result = subprocess.run([sys.executable, "-c", script], cwd=root, env=env,
+                            capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    assert "Traceback" not in result.stderr
+    assert "resource_tracker" not in result.stderr
@@ -0,0 +1,100 @@
+import json
+import warnings
+
+import neurokit2 as nk
+import numpy as np
+import pandas as pd
+
+from app.services.hrv_analyzer import _find_prominent_peaks
+from app.services.hrv_features import segment_features
+from app.services.hrv_stream import StreamingHRV
+
+FS = 25
+
+
+def _batch_segments(ppg, timestamps):
+    # compute_hrv_and_features_from_firebase 의 일괄 계산과 같은 세그먼트 분할
+    idx = _find_prominent_peaks(nk.ppg_clean(ppg, sampling_rate=FS))
+    peak_times = timestamps.values[idx]
+    segments, i = [], 0
+    while i < len(peak_times):
+        start, end_ts = i, peak_times[i] + pd.Timedelta(minutes=2)
+        while i < len(peak_times) and peak_times[i] < end_ts:
+            i += 1
+        if i - start >= 2:
+            segments.append(segment_features(idx[start:i], peak_times[start:i], FS))
+    return segments
+
+
+def test_streaming_hrv_emits_segments_matching_batch(tmp_path):
+    ppg = nk.ppg_simulate(duration=7 * 60 + 17, sampling_rate=FS, heart_rate=70,
+                          frequency_modulation=0.3, random_state=3)
+    timestamps = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(len(ppg)) * 40, unit="ms")
+    persist_path = str(tmp_path / "hrv_segments.jsonl")
+
+    stream = StreamingHRV(fs=FS, persist_path=persist_path)
+    emitted = 0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for i in range(0, len(ppg), FS):
+            emitted += len(stream.add_samples(timestamps[i:i + FS].astype(str), ppg[i:i + FS]))
+        # 진행 중에 닫힌 세그먼트는 이미 계산되어 있고, 버퍼는 세그먼트 하나 + margin 정도만 유지
+        assert emitted == 3
+        assert len(stream._ppg) < 3 * 60 * FS
+        segments = stream.finalize()
+        expected = _batch_segments(ppg, timestamps)
+
+    assert len(segments) == len(expected) == 4
+    for got, want in zip(segments, expected):
+        for domain in ("time", "freq", "nonlinear"):
+            for name, value in want[domain].items():
+                np.testing.assert_allclose(got[domain][name], value, rtol=1e-9, err_msg=f"{domain}.{name}")
+    with open(persist_path) as f:
+        assert len([json.loads(line) for line in f]) == 4
+
+
+def test_finish_resumes_from_segments_persisted_by_another_process(tmp_path):
+    from app.services.hrv_analyzer import _segments_after
+    from app.services.hrv_stream import load_stream_segments
+
+    ppg = nk.ppg_simulate(duration=7 * 60 + 17, sampling_rate=FS, heart_rate=70,
+                          frequency_modulation=0.3, random_state=3)
+    timestamps = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(len(ppg)) * 40, unit="ms")
+    stream = StreamingHRV(fs=FS, persist_path=str(tmp_path / "hrv_segments.jsonl"))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        # 스트림은 5분까지만 받고 (유휴로 닫히거나 다른 프로세스에서 종료) 나머지는 종료 시 이어서 계산
+        for i in range(0, 5 * 60 * FS, FS):
+            stream.add_samples(timestamps[i:i + FS].astype(str), ppg[i:i + FS])
+        persisted = load_stream_segments(str(tmp_path))
+        assert len(persisted) == 2
+        tail = _segments_after(persisted[-1]["Segment Start"], timestamps.values, ppg, FS)
+        expected = _batch_segments(ppg, timestamps)
+
+    segments = persisted + tail
+    assert len(segments) == len(expected) == 4
+    for got, want in zip(segments, expected):
+        np.testing.assert_allclose(got["time"]["mean_nni"], want["time"]["mean_nni"], rtol=1e-6)
+        np.testing.assert_allclose(got["time"]["rmssd"], want["time"]["rmssd"], rtol=1e-6)
+
+
+def test_idle_stream_is_closed_and_located_for_resume(tmp_path, monkeypatch):
+    from app.core import session_store
+    from app.core.session_store import MemorySessionStore
+    from app.services import hrv_stream
+
+    monkeypatch.setattr(session_store, "_store", MemorySessionStore())
+    active = hrv_stream.ACTIVE_STREAMS.value()
+    stream = hrv_stream.start_hrv_stream("s1", str(tmp_path))
+    assert hrv_stream.ACTIVE_STREAMS.value() == active + 1
+    assert hrv_stream.close_idle_hrv_streams(max_idle=60) == 0
+
+    stream.last_activity -= 120
+    assert hrv_stream.close_idle_hrv_streams(max_idle=60) == 1
+    assert hrv_stream.pop_hrv_stream("s1") is None
+    assert hrv_stream.ACTIVE_STREAMS.value() == active
+
+    (tmp_path / hrv_stream.SEGMENTS_FILE).write_text(json.dumps({
+        "segment_start": "2024-01-01 00:00:00", "time": {"mean_nni": 800.0}, "freq": {}, "nonlinear": {}}) + "\n")
+    assert len(hrv_stream.stream_segments_for_resume("s1", str(tmp_path))) == 1
+    assert hrv_stream.stream_segments_for_resume("unknown", str(tmp_path)) == []
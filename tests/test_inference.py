@@ -0,0 +1,208 @@
+import numpy as np
+import torch
+
+from app.ml.inference import batched_edge_index, predict_segments
+from app.ml.pipeline import MultimodalFatigueModel
+
+# 실제 모델과 같은 구조, 작은 입력 크기 (S=2 윈도우, T=4 프레임, N=60 노드)
+S, T, N = 2, 4, 60
+
+
+def _model_and_inputs(num_segments):
+    torch.manual_seed(0)
+    model = MultimodalFatigueModel().eval()
+    edge_index = torch.tensor([[2, 3, 10, 58], [3, 2, 58, 10]])
+    faces = torch.randn(num_segments, S, T, N, 3)
+    hrv = np.random.RandomState(0).randn(num_segments, 39).astype(np.float32)
+    return model, edge_index, faces, hrv
+
+
+def test_batched_edge_index_offsets_each_sample():
+    edge_index = torch.tensor([[0, 1], [1, 0]])
+    out = batched_edge_index(edge_index, 3, 10)
+    assert out.tolist() == [[0, 1, 10, 11, 20, 21], [1, 0, 11, 10, 21, 20]]
+
+
+def test_predict_segments_matches_per_segment_loop():
+    model, edge_index, faces, hrv = _model_and_inputs(5)
+
+    expected = []
+    with torch.no_grad():
+        for i in range(5):
+            wear = torch.tensor(hrv[i]).view(1, 1, 39).repeat(1, S, 1)
+            pred, _ = model(faces[i].unsqueeze(0), wear, edge_index)
+            expected.append(pred.item())
+
+    for micro_batch_size in (1, 2, 5):
+        got = predict_segments(model, edge_index, lambda i: faces[i], hrv, micro_batch_size=micro_batch_size)
+        np.testing.assert_allclose(got, expected, rtol=1e-5, atol=1e-6)
+
+
+class _StaticRegistry:
+    def __init__(self, model, edge_index):
+        self.model, self.edge_index = model, edge_index
+
+    def get(self):
+        return self.model, self.edge_index
+
+
+def test_scheduler_merges_concurrent_requests_into_one_batch():
+    import asyncio
+    import threading
+    from app.ml.inference_scheduler import BATCH_SIZE, InferenceScheduler
+
+    model, edge_index, faces, hrv = _model_and_inputs(4)
+    expected = predict_segments(model, edge_index, lambda i: faces[i], hrv, micro_batch_size=1)
+    scheduler = InferenceScheduler(_StaticRegistry(model, edge_index), max_batch_size=4, max_wait=0.5)
+    before = BATCH_SIZE.count()
+
+    async def run():
+        await scheduler.start()
+        try:
+            return await asyncio.gather(*(scheduler.predict(faces[i], torch.tensor(hrv[i])) for i in range(4)))
+        finally:
+            await scheduler.stop()
+
+    got = asyncio.run(run())
+    np.testing.assert_allclose(got, expected, rtol=1e-5, atol=1e-6)
+    assert BATCH_SIZE.count() - before == 1
+
+    # 워커 스레드에서 동기 API 로 제출
+    async def run_threadsafe():
+        await scheduler.start()
+        try:
+            result = {}
+            t = threading.Thread(target=lambda: result.update(
+                preds=scheduler.predict_segments_threadsafe(lambda i: faces[i], hrv)))
+            t.start()
+            await asyncio.get_running_loop().run_in_executor(None, t.join)
+            return result["preds"]
+        finally:
+            await scheduler.stop()
+
+    np.testing.assert_allclose(asyncio.run(run_threadsafe()), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_scheduler_stop_fails_queued_and_in_flight_requests():
+    import asyncio
+    import threading
+    from app.ml.inference_scheduler import InferenceScheduler
+
+    model, edge_index, faces, hrv = _model_and_inputs(1)
+    started, release = threading.Event(), threading.Event()
+
+    class _BlockingRegistry(_StaticRegistry):
+        def get(self):
+            started.set()
+            release.wait(5)
+            return super().get()
+
+    scheduler = InferenceScheduler(_BlockingRegistry(model, edge_index), max_batch_size=1, max_wait=0,
+                                   max_queue_size=1)
+
+    async def run():
+        await scheduler.start()
+        assert scheduler._queue.maxsize == 1
+        # 1번은 forward 중, 2번은 대기열, 3번은 대기열 자리를 기다리는 상태에서 종료합니다.
+        tasks = [asyncio.ensure_future(scheduler.predict(faces[0], torch.tensor(hrv[0]))) for _ in range(3)]
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        await asyncio.sleep(0.05)
+        threading.Timer(0.2, release.set).start()
+        await scheduler.stop()
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 5)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results), results
+
+
+def test_window_embeddings_plus_scoring_match_full_forward():
+    from app.ml.inference import embed_windows, score_segments
+
+    model, edge_index, faces, hrv = _model_and_inputs(3)
+    expected = predict_segments(model, edge_index, lambda i: faces[i], hrv, micro_batch_size=1)
+
+    windows = faces.reshape(3 * S, T, N, 3)
+    lead = torch.arange(3 * S) % S == 0
+    hF = embed_windows(model, edge_index, windows, lead).view(3, S, -1)
+    got = score_segments(model, hF, torch.tensor(hrv)).tolist()
+    np.testing.assert_allclose(got, expected, rtol=1e-5, atol=1e-6)
+
+
+def test_online_embedder_reuses_cached_windows_and_fills_missing(tmp_path):
+    from app.ml.inference import embed_windows
+    from app.ml.online_embedding import OnlineWindowEmbedder, WINDOW_SIZE, WINDOWS_EMBEDDED_TOTAL
+
+    model, edge_index, _, _ = _model_and_inputs(1)
+    registry = _StaticRegistry(model, edge_index)
+    registry.embedding_version = "v1"
+    frames = np.random.RandomState(1).rand(3 * WINDOW_SIZE - 10, N, 3).astype(np.float32)
+    padded = np.concatenate([frames, np.zeros((10, N, 3), dtype=np.float32)])
+    expected = embed_windows(model, edge_index, torch.from_numpy(padded).view(3, WINDOW_SIZE, N, 3),
+                             torch.tensor([True, False, False]))
+
+    embedder = OnlineWindowEmbedder(registry)
+    embedder._embed_and_store("s1", str(tmp_path), [(1, False)], padded[None, WINDOW_SIZE:2 * WINDOW_SIZE], "online")
+    before = WINDOWS_EMBEDDED_TOTAL.value(when="finish")
+    got = embedder.session_embeddings("s1", str(tmp_path), frames, [0], seq_len=3)
+    assert WINDOWS_EMBEDDED_TOTAL.value(when="finish") - before == 2
+    torch.testing.assert_close(got[0], expected, rtol=1e-5, atol=1e-6)
+
+    # 재분석: 새 프로세스(메모리 캐시 없음)에서도 디스크 캐시로 ST-GCN 없이 같은 결과
+    embedder.shutdown()
+    embedder = OnlineWindowEmbedder(registry)
+    again = embedder.session_embeddings("s1", str(tmp_path), frames, [0], seq_len=3)
+    assert WINDOWS_EMBEDDED_TOTAL.value(when="finish") - before == 2
+    torch.testing.assert_close(again, got)
+
+    # stride 를 바꾸면 새 시작 윈도우(lead)만 계산
+    embedder.session_embeddings("s1", str(tmp_path), frames, [0, 1], seq_len=2)
+    assert WINDOWS_EMBEDDED_TOTAL.value(when="finish") - before == 3
+    embedder.shutdown()
+
+
+def test_online_embedder_memory_is_released(tmp_path, monkeypatch):
+    import time
+    from app.ml import online_embedding
+    from app.ml.online_embedding import OnlineWindowEmbedder, WINDOW_SIZE
+
+    model, edge_index, _, _ = _model_and_inputs(1)
+    registry = _StaticRegistry(model, edge_index)
+    registry.embedding_version = "v1"
+    window = np.zeros((1, WINDOW_SIZE, N, 3), dtype=np.float32)
+    embedder = OnlineWindowEmbedder(registry)
+    monkeypatch.setattr(embedder, "_embed_from_store", lambda *args: None)
+    try:
+        embedder.submit("s1", str(tmp_path), 0)
+        embedder._embed_and_store("s1", str(tmp_path), [(0, True)], window, "online")
+        assert "s1" in embedder._cache
+        # drop() 이후에 끝난 온라인 임베딩은 메모리에 다시 올리지 않습니다.
+        monkeypatch.setattr(online_embedding, "_embedder", embedder)
+        online_embedding.drop_session_embeddings("s1")
+        embedder._embed_and_store("s1", str(tmp_path), [(1, False)], window, "online")
+        assert embedder._cache == {} and embedder._pending == {}
+
+        # drop() 이 오지 않은 세션은 SESSION_INACTIVE_TTL_SECONDS 동안 제출이 없으면 비웁니다.
+        embedder.submit("s2", str(tmp_path), 0)
+        embedder._embed_and_store("s2", str(tmp_path), [(0, True)], window, "online")
+        monkeypatch.setattr(online_embedding.Settings, "SESSION_INACTIVE_TTL_SECONDS", 0)
+        time.sleep(0.01)
+        embedder.submit("s3", str(tmp_path), 0)
+        assert "s2" not in embedder._cache and list(embedder._pending) == ["s3"]
+    finally:
+        embedder.shutdown()
+
+
+def test_failed_analysis_drops_session_embeddings(monkeypatch):
+    import pytest
+    from app.services import drowsiness_pipeline
+
+    dropped = []
+
+    def fail(*args):
+        raise RuntimeError("landmark timeout")
+
+    monkeypatch.setattr(drowsiness_pipeline, "_run_stages", fail)
+    monkeypatch.setattr(drowsiness_pipeline, "drop_session_embeddings", dropped.append)
+    with pytest.raises(RuntimeError):
+        drowsiness_pipeline.run_drowsiness_analysis(None, "s1", "u1", 1)
+    assert dropped == ["s1"]
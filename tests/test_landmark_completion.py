@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.services.landmark_completion import (
+    LandmarkCloseTimeout, mark_landmarks_closed, mark_landmarks_open, read_landmark_state,
+    wait_for_landmarks_closed
+)
+from app.utils.landmark_store import LandmarkStoreWriter
+
+
+def _write_frames(session_dir, n=10):
+    writer = LandmarkStoreWriter(session_dir)
+    writer.append(np.arange(n, dtype=np.float64), np.zeros((n, 478, 3), dtype=np.float32))
+    writer.close()
+
+
+def test_close_wakes_waiter_immediately(tmp_path):
+    session_dir = str(tmp_path / "s1")
+    os.makedirs(session_dir)
+    mark_landmarks_open("s1", session_dir)
+    _write_frames(session_dir)
+
+    closer = threading.Timer(0.2, mark_landmarks_closed, args=("s1", session_dir, 10))
+    closer.start()
+    started = time.monotonic()
+    # 파일은 방금 수정됐지만 quiet_period 를 기다리지 않고 닫힘 기록으로 바로 깨어납니다.
+    assert wait_for_landmarks_closed("s1", session_dir, timeout=5, quiet_period=60, poll_interval=5) == "closed"
+    assert time.monotonic() - started < 2
+    assert read_landmark_state(session_dir)["frames"] == 10
+
+
+def test_reconnect_keeps_session_open_until_last_close(tmp_path):
+    session_dir = str(tmp_path / "s2")
+    os.makedirs(session_dir)
+    mark_landmarks_open("s2", session_dir)
+    mark_landmarks_open("s2", session_dir)
+    mark_landmarks_closed("s2", session_dir, 5)
+    assert read_landmark_state(session_dir)["state"] == "open"
+    with pytest.raises(LandmarkCloseTimeout):
+        wait_for_landmarks_closed("s2", session_dir, timeout=0.2, quiet_period=0, poll_interval=0.05)
+    mark_landmarks_closed("s2", session_dir, 10)
+    assert wait_for_landmarks_closed("s2", session_dir, timeout=1) == "closed"
+
+
+def test_waiter_does_not_spin_after_close_and_reconnect(tmp_path, monkeypatch):
+    from app.services import landmark_completion
+
+    session_dir = str(tmp_path / "s4")
+    os.makedirs(session_dir)
+    mark_landmarks_open("s4", session_dir)
+    reads, reconnected = [], threading.Event()
+    read_state = landmark_completion.read_landmark_state
+
+    def counting_read(d):
+        reads.append(d)
+        if len(reads) == 2:
+            # 닫힘 알림으로 깨어난 대기자가 상태를 읽기 전에 재연결이 먼저 일어난 경우를 재현합니다.
+            reconnected.wait(5)
+        return read_state(d)
+
+    monkeypatch.setattr(landmark_completion, "read_landmark_state", counting_read)
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(
+        wait_for_landmarks_closed("s4", session_dir, timeout=5, quiet_period=60, poll_interval=5)))
+    waiter.start()
+    time.sleep(0.1)
+    # 닫힘 알림 직후 같은 세션으로 재연결: 대기자는 새 연결이 닫힐 때까지 다시 기다려야 합니다.
+    mark_landmarks_closed("s4", session_dir, 10)
+    mark_landmarks_open("s4", session_dir)
+    reconnected.set()
+    time.sleep(0.5)
+    mark_landmarks_closed("s4", session_dir, 20)
+    waiter.join(5)
+
+    assert result == ["closed"]
+    assert len(reads) < 10
+
+
+def test_legacy_session_without_state_uses_quiet_period(tmp_path):
+    session_dir = str(tmp_path / "s3")
+    _write_frames(session_dir)
+    assert wait_for_landmarks_closed("s3", session_dir, timeout=1, quiet_period=0) == "quiet"
+
+
+def test_defaults_read_settings_at_call_time(tmp_path, monkeypatch):
+    from app.services import landmark_completion
+
+    session_dir = str(tmp_path / "s5")
+    os.makedirs(session_dir)
+    mark_landmarks_open("s5", session_dir)
+    monkeypatch.setattr(landmark_completion.Settings, "LANDMARK_CLOSE_TIMEOUT_SECONDS", 0.2)
+    started = time.monotonic()
+    with pytest.raises(LandmarkCloseTimeout):
+        wait_for_landmarks_closed("s5", session_dir, poll_interval=0.05)
+    assert time.monotonic() - started < 2
+    mark_landmarks_closed("s5", session_dir, 0)
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from app.utils.landmark_store import (
+    LandmarkStoreWriter, open_landmark_store, convert_csv_session, has_landmark_store
+)
+from app.utils.drowsiness_data_utils import (
+    landmark_window, make_shard_and_pt, merge_landmark_csvs, open_shard_windows
+)
+from app.ml.data_loader import SessionSequenceDataset
+
+
+def _frames(n, seed=0):
+    return np.random.RandomState(seed).rand(n, 478, 3).astype(np.float32)
+
+
+def test_writer_appends_and_reads_back_as_memmap(tmp_path):
+    frames = _frames(7)
+    with LandmarkStoreWriter(str(tmp_path)) as writer:
+        writer.append(np.arange(4, dtype=np.float64), frames[:4])
+        writer.append(np.arange(4, 7, dtype=np.float64), frames[4:])
+
+    timestamps, stored = open_landmark_store(str(tmp_path))
+    assert isinstance(stored, np.memmap)
+    assert timestamps.tolist() == list(range(7))
+    np.testing.assert_array_equal(stored, frames)
+
+
+def test_convert_csv_session_matches_legacy_merge(tmp_path):
+    session_dir = tmp_path / "sess"
+    session_dir.mkdir()
+    frames = _frames(10)
+    for i, part in enumerate((frames[:6], frames[6:]), start=1):
+        rows = np.column_stack([np.arange(len(part)), part.reshape(len(part), -1)])
+        pd.DataFrame(rows).to_csv(session_dir / f"landmarks_{i:03}.csv", header=False, index=False)
+
+    legacy = merge_landmark_csvs("sess", str(tmp_path))
+    assert convert_csv_session(str(session_dir)) == 10
+    assert has_landmark_store(str(session_dir))
+
+    merged = merge_landmark_csvs("sess", str(tmp_path))
+    assert isinstance(merged, np.memmap)
+    np.testing.assert_allclose(merged, legacy, rtol=1e-6)
+
+
+def test_convert_csv_session_parses_iso_timestamps(tmp_path):
+    from app.services.websocket_service import parse_timestamp_ms
+
+    frames = _frames(4)
+    raw = ["2024-01-01T09:00:00.000", "2024-01-01T09:00:00.033+09:00", "1704067200066", "2024-01-01 09:00:00.100"]
+    rows = pd.DataFrame(frames.reshape(4, -1))
+    rows.insert(0, "timestamp", raw)
+    rows.to_csv(tmp_path / "landmarks_001.csv", header=False, index=False)
+
+    assert convert_csv_session(str(tmp_path)) == 4
+    timestamps, stored = open_landmark_store(str(tmp_path))
+    assert not np.isnan(timestamps).any()
+    np.testing.assert_allclose(timestamps, [parse_timestamp_ms(v) for v in raw])
+    np.testing.assert_allclose(stored, frames, rtol=1e-6)
+
+
+def test_writer_reopened_counts_existing_frames(tmp_path):
+    with LandmarkStoreWriter(str(tmp_path)) as writer:
+        writer.append(np.arange(5, dtype=np.float64), _frames(5))
+    with LandmarkStoreWriter(str(tmp_path)) as writer:
+        assert writer.frames_written == 5
+        writer.append(np.arange(2, dtype=np.float64), _frames(2))
+        assert writer.frames_written == 7
+
+
+def test_shards_are_memmap_views_matching_windows(tmp_path):
+    session_dir = tmp_path / "sess"
+    frames = _frames(25)
+    with LandmarkStoreWriter(str(session_dir)) as writer:
+        writer.append(np.arange(25, dtype=np.float64), frames)
+
+    meta_path = make_shard_and_pt("sess", base_dir=str(tmp_path), shard_size=10)
+    windows = open_shard_windows(meta_path)
+    assert tuple(windows.shape) == (3, 10, 478, 3)
+    for w in range(3):
+        np.testing.assert_array_equal(windows[w].numpy(), landmark_window(frames, w, 10))
+
+    dataset = SessionSequenceDataset(str(session_dir), seq_len=2, stride=1)
+    assert len(dataset) == 2
+    face, wear, label = dataset[1]
+    assert tuple(face.shape) == (2, 10, 478, 3) and tuple(wear.shape) == (2, 39)
+    assert face.data_ptr() == dataset.windows("sess")[1].data_ptr()  # 복사 없이 샤드 뷰를 그대로 반환
+    np.testing.assert_array_equal(face.numpy(), windows[1:3].numpy())
+
+
+def test_dataset_opens_shards_lazily_and_works_with_loader_workers(tmp_path):
+    import pickle
+    from torch.utils.data import DataLoader
+
+    for i, sid in enumerate(("a", "b")):
+        with LandmarkStoreWriter(str(tmp_path / sid)) as writer:
+            writer.append(np.arange(30, dtype=np.float64), _frames(30, seed=i))
+        make_shard_and_pt(sid, base_dir=str(tmp_path), shard_size=10)
+
+    dataset = SessionSequenceDataset([str(tmp_path / "a"), str(tmp_path / "b")], seq_len=2, stride=1)
+    assert len(dataset) == 4 and dataset._windows == {}
+    expected = np.stack([dataset[i][0].numpy() for i in range(len(dataset))])
+    # 열린 memmap 은 pickle 에 포함되지 않습니다. (워커로 데이터가 복사되지 않음)
+    assert len(pickle.dumps(dataset)) < 10_000
+
+    loader = DataLoader(dataset, batch_size=2, num_workers=2)
+    faces = np.concatenate([face.numpy() for face, _, _ in loader])
+    np.testing.assert_array_equal(faces, expected)
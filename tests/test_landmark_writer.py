@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from app.services import landmark_writer
+from app.services.landmark_writer import LandmarkWriterService
+from app.utils.landmark_store import open_landmark_store
+
+
+@pytest.fixture(autouse=True)
+def no_online_embedding(monkeypatch):
+    monkeypatch.setattr(landmark_writer.Settings, "ONLINE_FACE_EMBEDDING", False)
+
+
+def _chunk(start, n=5):
+    timestamps = np.arange(start, start + n, dtype=np.float64)
+    frames = np.broadcast_to(timestamps[:, None, None], (n, 478, 3)).astype(np.float32)
+    return timestamps, frames
+
+
+def test_chunks_are_written_in_order_and_flushed_on_close(tmp_path):
+    service = LandmarkWriterService(max_pending_chunks=2)
+    session_dir = str(tmp_path / "s1")
+
+    async def run():
+        for start in range(0, 50, 5):
+            await service.append("s1", session_dir, *_chunk(start))
+        # close_session 은 남은 청크가 모두 기록되고 파일이 닫힐 때까지 기다립니다.
+        await service.close_session("s1")
+
+    try:
+        asyncio.run(run())
+        timestamps, frames = open_landmark_store(session_dir)
+        np.testing.assert_array_equal(timestamps, np.arange(50))
+        np.testing.assert_array_equal(frames[:, 0, 0], np.arange(50))
+    finally:
+        service.stop(timeout=5)
+
+
+def test_lag_metric_is_set_per_session_and_removed_on_close(tmp_path):
+    service = LandmarkWriterService()
+
+    async def run():
+        await service.append("s1", str(tmp_path / "s1"), *_chunk(0))
+        # 큐는 순서대로 처리되므로 다른 세션의 close 가 끝나면 s1 청크도 기록되어 있습니다.
+        await service.close_session("other")
+        lag = landmark_writer.WRITE_LAG_SECONDS.value(session_id="s1")
+        await service.close_session("s1")
+        return lag
+
+    try:
+        assert asyncio.run(run()) > 0
+        assert landmark_writer.WRITE_LAG_SECONDS.value(session_id="s1") == 0
+    finally:
+        service.stop(timeout=5)
+
+
+def test_full_queue_waits_without_polling(tmp_path, monkeypatch):
+    entered, release = threading.Event(), threading.Event()
+
+    class SlowWriter(landmark_writer.LandmarkStoreWriter):
+        def append(self, timestamps, frames):
+            entered.set()
+            release.wait(5)
+            super().append(timestamps, frames)
+
+    monkeypatch.setattr(landmark_writer, "LandmarkStoreWriter", SlowWriter)
+    service = LandmarkWriterService(max_pending_chunks=1)
+    session_dir = str(tmp_path / "s1")
+    backpressure = landmark_writer.BACKPRESSURE_TOTAL.value()
+
+    async def run():
+        await service.append("s1", session_dir, *_chunk(0))
+        await asyncio.get_running_loop().run_in_executor(None, entered.wait, 5)
+        await service.append("s1", session_dir, *_chunk(5))
+        # 큐가 가득 찬 상태: writer 가 자리를 비울 때까지 await 하는 동안 이벤트 루프는 계속 돕니다.
+        blocked = asyncio.ensure_future(service.append("s1", session_dir, *_chunk(10)))
+        await asyncio.sleep(0.3)
+        assert not blocked.done()
+        release.set()
+        await blocked
+        waits = landmark_writer.BACKPRESSURE_TOTAL.value() - backpressure
+        await service.close_session("s1")
+        return waits
+
+    try:
+        # 기다리는 동안 put 을 반복 시도하지 않으므로 대기 1번으로 셉니다.
+        assert asyncio.run(run()) == 1
+        np.testing.assert_array_equal(open_landmark_store(session_dir)[0], np.arange(15))
+    finally:
+        release.set()
+        service.stop(timeout=5)
+
+
+def test_queue_size_reads_settings_at_construction(monkeypatch):
+    monkeypatch.setattr(landmark_writer.Settings, "LANDMARK_WRITE_QUEUE_SIZE", 3)
+    assert LandmarkWriterService()._queue.maxsize == 3
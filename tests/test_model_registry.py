@@ -0,0 +1,62 @@
+import os
+
+import torch
+
+from app.ml import model_registry
+from app.ml.model_registry import MODEL_LOADS_TOTAL, ModelRegistry
+from app.ml.pipeline import MultimodalFatigueModel
+
+
+def _write_checkpoint(path, seed, mtime):
+    torch.manual_seed(seed)
+    torch.save({"model": MultimodalFatigueModel().state_dict()}, path)
+    os.utime(path, (mtime, mtime))
+
+
+def _setup(tmp_path):
+    model_path, edge_path = str(tmp_path / "model.pt"), str(tmp_path / "edge_index.pt")
+    _write_checkpoint(model_path, seed=0, mtime=1_000_000)
+    torch.save(torch.tensor([[0, 1], [1, 0]]), edge_path)
+    return model_path, edge_path
+
+
+def test_get_loads_once_per_process(tmp_path, monkeypatch):
+    model_path, edge_path = _setup(tmp_path)
+    monkeypatch.setattr(model_registry, "_registry", None)
+    monkeypatch.setattr(model_registry.Settings, "FATIGUE_MODEL_PATH", model_path)
+    monkeypatch.setattr(model_registry.Settings, "FATIGUE_EDGE_INDEX_PATH", edge_path)
+    lazy = MODEL_LOADS_TOTAL.value(reason="lazy")
+
+    registry = model_registry.get_model_registry()
+    assert model_registry.get_model_registry() is registry
+    model, edge_index = registry.get()
+    assert registry.get() == (model, edge_index)
+    assert MODEL_LOADS_TOTAL.value(reason="lazy") == lazy + 1
+    assert not model.training and not any(p.requires_grad for p in model.parameters())
+
+
+def test_checkpoint_change_hot_reloads_and_failed_reload_keeps_model(tmp_path):
+    model_path, edge_path = _setup(tmp_path)
+    registry = ModelRegistry(model_path, edge_path)
+    old_model, _ = registry.get()
+    old_version = registry.version
+    reloads = MODEL_LOADS_TOTAL.value(reason="reload")
+
+    _write_checkpoint(model_path, seed=1, mtime=1_000_100)
+    new_model, _ = registry.get()
+    assert new_model is not old_model and registry.version != old_version
+    assert any(not torch.equal(a, b) for a, b in zip(new_model.parameters(), old_model.parameters()))
+    assert MODEL_LOADS_TOTAL.value(reason="reload") == reloads + 1
+
+    # 쓰는 도중이거나 깨진 체크포인트: 기존 모델을 유지하고, 같은 mtime 으로는 다시 시도하지 않습니다.
+    with open(model_path, "wb") as f:
+        f.write(b"not a checkpoint")
+    os.utime(model_path, (1_000_200, 1_000_200))
+    assert registry.get()[0] is new_model
+    assert registry.get()[0] is new_model
+    assert MODEL_LOADS_TOTAL.value(reason="reload") == reloads + 1
+
+    # 다음 변경 때는 다시 로드합니다.
+    _write_checkpoint(model_path, seed=2, mtime=1_000_300)
+    assert registry.get()[0] is not new_model
+    assert MODEL_LOADS_TOTAL.value(reason="reload") == reloads + 2
@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+from app.core import session_store
+from app.core.session_store import MemorySessionStore
+from app.services import ppg_completion
+from app.services.ppg_completion import PPGUploadTimeout, wait_for_ppg_upload
+
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    store = MemorySessionStore()
+    monkeypatch.setattr(session_store, "_store", store)
+    return store
+
+
+def test_marker_wakes_waiter_immediately(store):
+    store.reference("s1/PPG_Data").set({"k1": {"ppg": 1}})
+    marker = threading.Timer(0.2, store.reference("s1/pairing/upload_complete").set, args=(True,))
+    marker.start()
+    started = time.monotonic()
+    # 마커 리스너가 바로 깨우므로 poll_interval / quiet_period 를 기다리지 않습니다.
+    assert wait_for_ppg_upload("s1", timeout=5, quiet_period=60, poll_interval=5) == "marker"
+    assert time.monotonic() - started < 2
+
+
+def test_quiet_fallback_without_marker(store):
+    store.reference("s1/PPG_Data").set({"k1": {"ppg": 1}})
+    appender = threading.Timer(0.1, store.reference("s1/PPG_Data/k2").set, args=({"ppg": 2},))
+    appender.start()
+    started = time.monotonic()
+    assert wait_for_ppg_upload("s1", timeout=5, quiet_period=0.3, poll_interval=0.05) == "quiet"
+    # 새 키(k2)가 들어온 뒤부터 다시 quiet_period 를 잽니다.
+    assert time.monotonic() - started >= 0.4
+
+
+def test_timeout_reads_settings_at_call_time(store, monkeypatch):
+    monkeypatch.setattr(ppg_completion.Settings, "PPG_UPLOAD_TIMEOUT_SECONDS", 0.3)
+    started = time.monotonic()
+    with pytest.raises(PPGUploadTimeout):
+        wait_for_ppg_upload("s1", poll_interval=0.05)
+    assert time.monotonic() - started < 2
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from app.core import session_store
+from app.core.session_store import MemorySessionStore
+from app.services import ppg_sync
+
+
+def _records(start, n):
+    t0 = pd.Timestamp("2024-01-01T00:00:00Z")
+    return {f"k{i:06d}": {"timestamp": (t0 + pd.Timedelta(milliseconds=40 * i)).isoformat(),
+                          "ppgGreen": float(i), "isError": i % 7 == 3}
+            for i in range(start, start + n)}
+
+
+def test_sync_ppg_fetches_only_new_records(tmp_path, monkeypatch):
+    store = MemorySessionStore()
+    monkeypatch.setattr(session_store, "_store", store)
+    ppg_ref = store.reference("s1/PPG_Data")
+    ppg_ref.set(_records(0, 23))
+    session_dir = str(tmp_path)
+
+    assert ppg_sync.sync_ppg("s1", session_dir, page_size=10) == 23
+    ppg_ref.update(_records(23, 12))
+    assert ppg_sync.sync_ppg("s1", session_dir, page_size=10) == 12
+    assert ppg_sync.sync_ppg("s1", session_dir, page_size=10) == 0
+    assert ppg_sync.has_local_ppg(session_dir)
+
+    timestamps, ppg = ppg_sync.load_ppg(session_dir)
+    expected = [i for i in range(35) if i % 7 != 3]
+    np.testing.assert_array_equal(ppg, np.array(expected, dtype=np.float64))
+    expected_ts = (np.datetime64("2024-01-01T00:00:00", "ns")
+                   + np.array(expected, dtype=np.int64) * np.timedelta64(40, "ms"))
+    np.testing.assert_array_equal(timestamps, expected_ts)
+
+    all_ts, all_ppg = ppg_sync.load_ppg(session_dir, include_errors=True)
+    assert len(all_ts) == len(all_ppg) == 35
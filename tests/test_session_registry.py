@@ -0,0 +1,69 @@
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core import session_store
+from app.core.session_store import MemorySessionStore
+from app.services import session_registry
+
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    store = MemorySessionStore()
+    monkeypatch.setattr(session_store, "_store", store)
+    monkeypatch.setattr(session_registry.Settings, "NODE_ID", "node-a")
+    monkeypatch.setattr(session_registry.Settings, "NODE_URL", "http://node-a:8000")
+    monkeypatch.setattr(session_registry.Settings, "SHARED_SESSION_DATA", False)
+    return store
+
+
+def test_owner_registration_and_locality(monkeypatch):
+    assert session_registry.get_session_owner("s1") is None
+    assert session_registry.is_local_owner(None)
+
+    session_registry.register_session_owner("s1")
+    owner = session_registry.get_session_owner("s1")
+    assert owner["node_id"] == "node-a" and owner["url"] == "http://node-a:8000"
+    assert session_registry.is_local_owner(owner)
+
+    monkeypatch.setattr(session_registry.Settings, "NODE_ID", "node-b")
+    assert not session_registry.is_local_owner(owner)
+    # 공유 스토리지를 쓰면 어느 노드에서든 처리합니다.
+    monkeypatch.setattr(session_registry.Settings, "SHARED_SESSION_DATA", True)
+    assert session_registry.is_local_owner(owner)
+
+
+def test_forward_to_owner(monkeypatch):
+    sent = {}
+
+    def fake_post(url, json, headers, timeout):
+        sent.update(url=url, json=json, headers=headers)
+        return httpx.Response(202, json={"job_id": "j1"})
+
+    monkeypatch.setattr(session_registry.httpx, "post", fake_post)
+    owner = {"node_id": "node-b", "url": "http://node-b:8000/"}
+    response = session_registry.forward_to_owner(owner, "/api/v1/students/drowsiness/finish",
+                                                 {"session_id": "s1"}, "Bearer token")
+    assert response.status_code == 202
+    assert sent["url"] == "http://node-b:8000/api/v1/students/drowsiness/finish"
+    assert sent["headers"] == {session_registry.FORWARDED_HEADER: "node-a", "Authorization": "Bearer token"}
+
+    with pytest.raises(HTTPException) as exc:
+        session_registry.forward_to_owner({"node_id": "node-c", "url": ""}, "/finish", {})
+    assert exc.value.status_code == 503
+
+
+def test_release_session_records(store):
+    session_registry.register_session_owner("s1")
+    session_registry.register_hrv_stream_owner("s1")
+    session_registry.register_session_owner("s2")
+    store.reference("s1/pairing").set({"paired": True})
+
+    session_registry.release_session_records("s1")
+    assert session_registry.get_session_owner("s1") is None
+    assert session_registry.get_hrv_stream_owner("s1") is None
+    assert session_registry.get_session_owner("s2") is not None
+    assert store.reference("s1/pairing/paired").get() is True
+
+    session_registry.release_session_records("s1", delete_data=True)
+    assert store.reference("s1").get() is None
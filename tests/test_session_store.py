@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.session_store import MemorySessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemorySessionStore()
+        return
+    store = SQLiteSessionStore(str(tmp_path / "store.db"))
+    yield store
+    store.close()
+
+
+def test_set_get_update_delete(store):
+    ref = store.reference("s1")
+    ref.set({"pairing": {"paired": False, "auth_code": "012345", "video_id": 3}, "PPG_Data": {}})
+    assert ref.get() == {"pairing": {"paired": False, "auth_code": "012345", "video_id": 3}}
+    assert ref.child("PPG_Data").get() is None
+
+    ref.child("pairing").update({"paired": True, "stop": False})
+    assert store.reference("s1/pairing/paired").get() is True
+    assert store.reference("s1/pairing").get()["stop"] is False
+
+    store.reference("auth_code_index/012345").set("s1")
+    assert store.reference("auth_code_index/012345").get() == "s1"
+    store.reference("auth_code_index/012345").delete()
+    assert store.reference("auth_code_index/012345").get() is None
+    assert store.reference("auth_code_index").get() is None
+
+    # 리프 값이 있던 경로 아래에 쓰면 dict 로 바뀝니다.
+    store.reference("s1/pairing/stop/reason").set("done")
+    assert store.reference("s1/pairing/stop").get() == {"reason": "done"}
+
+
+def test_order_by_key_queries(store):
+    ref = store.reference("s1/PPG_Data")
+    ref.set({f"k{i:02d}": {"ppgGreen": i} for i in range(10)})
+    assert list(ref.order_by_key().limit_to_last(1).get()) == ["k09"]
+    assert list(ref.order_by_key().start_at("k07").get()) == ["k07", "k08", "k09"]
+    assert list(ref.order_by_key().start_at("k03").limit_to_first(2).get()) == ["k03", "k04"]
+    assert list(ref.order_by_key().end_at("k01").get()) == ["k00", "k01"]
+
+
+def test_listen_delivers_initial_value_and_changes(store):
+    events, got = [], threading.Event()
+
+    def on_event(event):
+        events.append((event.event_type, event.path, event.data))
+        if len(events) == 3:
+            got.set()
+
+    store.reference("s1/pairing").set({"stop": False})
+    registration = store.reference("s1/pairing/upload_complete").listen(on_event)
+    store.reference("s1/PPG_Data").update({"k00": {"ppgGreen": 1}})   # 다른 경로 → 이벤트 없음
+    store.reference("s1/pairing").update({"upload_complete": True})
+    store.reference("s1/pairing/upload_complete").set(False)
+    assert got.wait(5)
+    registration.close()
+    assert events == [("put", "/", None), ("put", "/", True), ("put", "/", False)]
+
+
+def test_async_reference_multi_path_update(store, monkeypatch):
+    from app.core import session_store
+
+    monkeypatch.setattr(session_store, "_store", store)
+
+    async def scenario():
+        await session_store.async_reference().update({
+            "s1/pairing": {"paired": False, "auth_code": "012345"},
+            "auth_code_index/012345": "s1",
+        })
+        assert await session_store.async_reference("auth_code_index/012345").get() == "s1"
+        # 값이 None 인 경로는 삭제됩니다.
+        await session_store.async_reference().update({"s1/pairing/paired": True, "auth_code_index/012345": None})
+        return await session_store.async_reference("s1").get(), await session_store.async_reference("auth_code_index").get()
+
+    session, index = asyncio.run(scenario())
+    assert session == {"pairing": {"paired": True, "auth_code": "012345"}}
+    assert index is None
+
+
+def test_transaction_aborts_on_exception(store):
+    ref = store.reference("auth_code_index/012345")
+    assert ref.transaction(lambda current: {"session_id": "s1"}) == {"session_id": "s1"}
+
+    def _taken(current):
+        raise RuntimeError("taken")
+
+    with pytest.raises(RuntimeError):
+        ref.transaction(_taken)
+    assert ref.get() == {"session_id": "s1"}
+    assert ref.transaction(lambda current: None) is None
+    assert store.reference("auth_code_index").get() is None
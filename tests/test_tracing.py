@@ -0,0 +1,37 @@
+import pytest
+
+from app.core import tracing
+from app.core.metrics import render_prometheus
+
+
+def test_span_records_duration_items_and_rss():
+    before = tracing.STAGE_SECONDS.count(pipeline="test", stage="load")
+    with tracing.span("load", pipeline="test", session_id="s1") as current:
+        current.set(items=1500)
+    assert current.seconds is not None and current.seconds >= 0
+    assert tracing.STAGE_SECONDS.count(pipeline="test", stage="load") == before + 1
+    assert tracing.STAGE_ITEMS.count(pipeline="test", stage="load") >= 1
+    assert tracing.STAGE_RSS_BYTES.value(pipeline="test", stage="load") > 0
+    assert 'pipeline_stage_seconds_count{pipeline="test",stage="load"}' in render_prometheus()
+
+
+def test_stage_spans_close_previous_stage_and_count_failures():
+    failures = tracing.STAGE_FAILURES_TOTAL.value(pipeline="test", stage="second")
+    with pytest.raises(RuntimeError):
+        with tracing.StageSpans(pipeline="test", session_id="s1") as spans:
+            first = spans.enter("first")
+            spans.enter("second", items=3)
+            assert first.seconds is not None
+            raise RuntimeError("boom")
+    assert tracing.STAGE_FAILURES_TOTAL.value(pipeline="test", stage="first") == 0
+    assert tracing.STAGE_FAILURES_TOTAL.value(pipeline="test", stage="second") == failures + 1
+
+
+def test_span_with_opentelemetry_enabled(monkeypatch):
+    pytest.importorskip("opentelemetry")
+    monkeypatch.setattr(tracing.Settings, "OTEL_TRACING", True)
+    monkeypatch.setattr(tracing, "_otel_checked", False)
+    monkeypatch.setattr(tracing, "_otel_tracer", None)
+    with tracing.span("otel", pipeline="test") as current:
+        current.set(items=1, note="ok")
+    assert tracing._otel_tracer is not None
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from app.services.websocket_service import (
+    LandmarkRingBuffer, LandmarkFrameError,
+    encode_binary_frames, decode_binary_frames, decode_json_frame
+)
+
+
+def _frames(n, seed=0):
+    return np.random.RandomState(seed).rand(n, 478, 3).astype(np.float32)
+
+
+def test_binary_roundtrip_float32_and_float16():
+    frames = _frames(3)
+    ts, decoded = decode_binary_frames(encode_binary_frames(1000.0, frames, frame_interval_ms=33.3))
+    np.testing.assert_allclose(ts, [1000.0, 1033.3, 1066.6], rtol=1e-6)
+    np.testing.assert_array_equal(decoded, frames)
+
+    ts, decoded = decode_binary_frames(encode_binary_frames(5.0, frames, dtype=1))
+    assert decoded.dtype == np.float16
+    np.testing.assert_allclose(decoded, frames, atol=1e-3)
+
+
+def test_binary_rejects_truncated_payload():
+    payload = encode_binary_frames(0.0, _frames(2))
+    with pytest.raises(LandmarkFrameError):
+        decode_binary_frames(payload[:-4])
+
+
+def test_json_frame_matches_binary_layout():
+    frame = _frames(1)[0]
+    ts, decoded = decode_json_frame({"timestamp": 1234, "frame": frame.tolist()})
+    assert ts.tolist() == [1234.0]
+    np.testing.assert_array_equal(decoded[0], frame)
+
+
+def test_ring_buffer_wraps_and_preserves_order():
+    buf = LandmarkRingBuffer(capacity=4)
+    frames = _frames(6)
+    ts = np.arange(6, dtype=np.float64)
+
+    assert buf.append(ts[:3], frames[:3]) == 3
+    out_ts, out_frames = buf.pop(2)
+    assert out_ts.tolist() == [0.0, 1.0]
+    # 남은 1개 + 3개 = 4개, 경계를 넘어 저장됨
+    assert buf.append(ts[3:], frames[3:]) == 3
+    assert buf.count == 4
+    out_ts, out_frames = buf.pop()
+    assert out_ts.tolist() == [2.0, 3.0, 4.0, 5.0]
+    np.testing.assert_array_equal(out_frames, frames[2:6])